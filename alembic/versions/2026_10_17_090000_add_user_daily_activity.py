@@ -0,0 +1,97 @@
+"""add user_daily_activity rollup table
+
+Revision ID: add_user_daily_activity
+Revises: 204b6506dac2
+Create Date: 2026-10-17 09:00:00
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "add_user_daily_activity"
+down_revision: Union[str, None] = "204b6506dac2"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "user_daily_activity",
+        sa.Column("activity_id", sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.user_id", ondelete="CASCADE"), nullable=False),
+        sa.Column("day_key", sa.Integer(), nullable=False),
+        sa.Column("week_key", sa.Integer(), nullable=False),
+        sa.Column("month_key", sa.Integer(), nullable=False),
+        sa.Column("focus_minutes", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("break_minutes", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("session_count", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("completed_tasks", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("achieved_goals", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("created_at", sa.Float(), nullable=False),
+        sa.Column("updated_at", sa.Float(), nullable=False),
+        sa.UniqueConstraint("user_id", "day_key", name="uq_user_daily_activity_user_day"),
+    )
+    op.create_index("idx_user_daily_activity_user_week", "user_daily_activity", ["user_id", "week_key"])
+    op.create_index("idx_user_daily_activity_user_month", "user_daily_activity", ["user_id", "month_key"])
+
+    # Backfill từ dữ liệu hiện có (session_date có thể là milliseconds)
+    op.execute(
+        """
+        INSERT INTO user_daily_activity (
+            user_id, day_key, week_key, month_key,
+            focus_minutes, break_minutes, session_count, completed_tasks, achieved_goals,
+            created_at, updated_at
+        )
+        SELECT
+            a.user_id,
+            a.day_key::int,
+            (EXTRACT(isoyear FROM timezone('UTC', to_timestamp(a.day_key * 86400))) * 100
+                + EXTRACT(week FROM timezone('UTC', to_timestamp(a.day_key * 86400))))::int,
+            (EXTRACT(year FROM timezone('UTC', to_timestamp(a.day_key * 86400))) * 100
+                + EXTRACT(month FROM timezone('UTC', to_timestamp(a.day_key * 86400))))::int,
+            SUM(a.focus_minutes)::int,
+            SUM(a.break_minutes)::int,
+            SUM(a.session_count)::int,
+            SUM(a.completed_tasks)::int,
+            SUM(a.achieved_goals)::int,
+            EXTRACT(epoch FROM now()),
+            EXTRACT(epoch FROM now())
+        FROM (
+            SELECT
+                user_id,
+                floor(CASE WHEN session_date > 1e10 THEN session_date / 1000 ELSE session_date END / 86400) AS day_key,
+                CASE WHEN session_type = 'FOCUS_SESSION' THEN COALESCE(duration_minutes, 0) ELSE 0 END AS focus_minutes,
+                CASE WHEN session_type IN ('SHORT_BREAK', 'LONG_BREAK') THEN COALESCE(duration_minutes, 0) ELSE 0 END AS break_minutes,
+                CASE WHEN session_type = 'FOCUS_SESSION' THEN 1 ELSE 0 END AS session_count,
+                0 AS completed_tasks,
+                0 AS achieved_goals
+            FROM sessions
+            WHERE status = 'COMPLETED' AND session_date IS NOT NULL
+            UNION ALL
+            SELECT
+                user_id,
+                floor(CASE WHEN completed_at > 1e10 THEN completed_at / 1000 ELSE completed_at END / 86400),
+                0, 0, 0, 1, 0
+            FROM tasks
+            WHERE is_completed = 1 AND completed_at IS NOT NULL
+            UNION ALL
+            SELECT
+                user_id,
+                floor(CASE WHEN achieved_at > 1e10 THEN achieved_at / 1000 ELSE achieved_at END / 86400),
+                0, 0, 0, 0, 1
+            FROM goals
+            WHERE is_achieved = 1 AND achieved_at IS NOT NULL
+        ) AS a
+        GROUP BY a.user_id, a.day_key
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("idx_user_daily_activity_user_month", table_name="user_daily_activity")
+    op.drop_index("idx_user_daily_activity_user_week", table_name="user_daily_activity")
+    op.drop_table("user_daily_activity")
@@ -0,0 +1,80 @@
+"""add user_streaks streak state table
+
+Revision ID: add_user_streaks
+Revises: add_user_daily_activity
+Create Date: 2026-10-17 10:00:00
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "add_user_streaks"
+down_revision: Union[str, None] = "add_user_daily_activity"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "user_streaks",
+        sa.Column("user_streak_id", sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.user_id", ondelete="CASCADE"), nullable=False),
+        sa.Column("current_streak", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("best_streak", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("last_active_day", sa.Integer(), nullable=True),
+        sa.Column("total_active_days", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("created_at", sa.Float(), nullable=False),
+        sa.Column("updated_at", sa.Float(), nullable=False),
+        sa.UniqueConstraint("user_id", name="uq_user_streaks_user"),
+    )
+
+    # Backfill từ streak_records (gaps-and-islands trên các ngày có activity)
+    op.execute(
+        """
+        INSERT INTO user_streaks (
+            user_id, current_streak, best_streak, last_active_day, total_active_days,
+            created_at, updated_at
+        )
+        SELECT
+            r.user_id,
+            MAX(CASE WHEN r.last_day = r.last_active_day THEN r.length ELSE 0 END)::int,
+            MAX(r.length)::int,
+            MAX(r.last_active_day)::int,
+            SUM(r.length)::int,
+            EXTRACT(epoch FROM now()),
+            EXTRACT(epoch FROM now())
+        FROM (
+            SELECT
+                runs.user_id,
+                runs.length,
+                runs.last_day,
+                MAX(runs.last_day) OVER (PARTITION BY runs.user_id) AS last_active_day
+            FROM (
+                SELECT i.user_id, COUNT(*) AS length, MAX(i.day) AS last_day
+                FROM (
+                    SELECT
+                        d.user_id,
+                        d.day,
+                        d.day - ROW_NUMBER() OVER (PARTITION BY d.user_id ORDER BY d.day) AS island
+                    FROM (
+                        SELECT DISTINCT
+                            user_id,
+                            floor(CASE WHEN streak_date > 1e10 THEN streak_date / 1000 ELSE streak_date END / 86400) AS day
+                        FROM streak_records
+                        WHERE has_activity = 1 AND streak_date IS NOT NULL
+                    ) AS d
+                ) AS i
+                GROUP BY i.user_id, i.island
+            ) AS runs
+        ) AS r
+        GROUP BY r.user_id
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("user_streaks")
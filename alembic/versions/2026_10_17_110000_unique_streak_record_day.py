@@ -0,0 +1,100 @@
+"""add streak_records.streak_day, merge duplicate days and make (user_id, streak_day) unique
+
+Revision ID: unique_streak_record_day
+Revises: add_user_streaks
+Create Date: 2026-10-17 11:00:00
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "unique_streak_record_day"
+down_revision: Union[str, None] = "add_user_streaks"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+BATCH_SIZE = 10000
+USER_BATCH_SIZE = 1000
+
+
+def _id_range(bind, column: str) -> tuple:
+    row = bind.execute(sa.text(f"SELECT MIN({column}), MAX({column}) FROM streak_records")).first()
+    return row[0], row[1]
+
+
+def upgrade() -> None:
+    op.add_column("streak_records", sa.Column("streak_day", sa.Integer(), nullable=True))
+
+    # Mỗi batch commit riêng để không giữ lock trên toàn bảng trong suốt migration
+    with op.get_context().autocommit_block():
+        bind = op.get_bind()
+
+        # 1. Backfill streak_day theo từng khoảng streak_id
+        low, high = _id_range(bind, "streak_id")
+        if low is not None:
+            for start in range(low, high + 1, BATCH_SIZE):
+                bind.execute(
+                    sa.text(
+                        """
+                        UPDATE streak_records
+                        SET streak_day = floor(
+                            CASE WHEN streak_date > 1e10 THEN streak_date / 1000 ELSE streak_date END / 86400
+                        )::int
+                        WHERE streak_id >= :start AND streak_id < :end AND streak_date IS NOT NULL
+                        """
+                    ),
+                    {"start": start, "end": start + BATCH_SIZE},
+                )
+
+        # 2. Merge các records trùng ngày theo từng khoảng user_id: giữ record có streak_id lớn nhất,
+        #    cộng dồn session_count/focus_time, has_activity = 1 nếu bất kỳ record nào có activity
+        low, high = _id_range(bind, "user_id")
+        if low is not None:
+            for start in range(low, high + 1, USER_BATCH_SIZE):
+                bind.execute(
+                    sa.text(
+                        """
+                        WITH groups AS (
+                            SELECT
+                                user_id,
+                                streak_day,
+                                MAX(streak_id) AS keep_id,
+                                SUM(COALESCE(session_count, 0)) AS session_count,
+                                SUM(COALESCE(focus_time, 0)) AS focus_time,
+                                MAX(COALESCE(has_activity, 0)) AS has_activity
+                            FROM streak_records
+                            WHERE streak_day IS NOT NULL AND user_id >= :start AND user_id < :end
+                            GROUP BY user_id, streak_day
+                            HAVING COUNT(*) > 1
+                        ), merged AS (
+                            UPDATE streak_records AS r
+                            SET session_count = g.session_count,
+                                focus_time = g.focus_time,
+                                has_activity = g.has_activity,
+                                streak_date = g.streak_day * 86400,
+                                updated_at = EXTRACT(epoch FROM now())
+                            FROM groups AS g
+                            WHERE r.streak_id = g.keep_id
+                            RETURNING r.streak_id
+                        )
+                        DELETE FROM streak_records AS r
+                        USING groups AS g
+                        WHERE r.user_id = g.user_id
+                            AND r.streak_day = g.streak_day
+                            AND r.streak_id <> g.keep_id
+                        """
+                    ),
+                    {"start": start, "end": start + USER_BATCH_SIZE},
+                )
+
+    op.create_unique_constraint("uq_streak_records_user_day", "streak_records", ["user_id", "streak_day"])
+
+
+def downgrade() -> None:
+    op.drop_constraint("uq_streak_records_user_day", "streak_records", type_="unique")
+    op.drop_column("streak_records", "streak_day")
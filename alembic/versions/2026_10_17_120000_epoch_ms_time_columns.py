@@ -0,0 +1,49 @@
+"""convert session/task/goal time columns to BIGINT epoch milliseconds
+
+Revision ID: epoch_ms_time_columns
+Revises: unique_streak_record_day
+Create Date: 2026-10-17 12:00:00
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "epoch_ms_time_columns"
+down_revision: Union[str, None] = "unique_streak_record_day"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Các cột trước đây lưu lẫn seconds (tasks, goals) và milliseconds (sessions)
+EPOCH_MS_COLUMNS = {
+    "sessions": ["session_date", "start_time", "end_time"],
+    "session_pauses": ["pause_start", "pause_end"],
+    "tasks": ["task_date", "completed_at"],
+    "goals": ["goal_date", "achieved_at"],
+}
+
+
+def upgrade() -> None:
+    # Một câu ALTER TABLE cho mỗi bảng => mỗi bảng chỉ bị rewrite một lần
+    for table, columns in EPOCH_MS_COLUMNS.items():
+        op.execute(
+            f"ALTER TABLE {table} "
+            + ", ".join(
+                f"ALTER COLUMN {column} TYPE BIGINT USING "
+                f"round(CASE WHEN {column} > 1e10 THEN {column} ELSE {column} * 1000 END)::bigint"
+                for column in columns
+            )
+        )
+
+
+def downgrade() -> None:
+    # Giữ nguyên đơn vị milliseconds, chỉ đổi kiểu cột
+    for table, columns in EPOCH_MS_COLUMNS.items():
+        op.execute(
+            f"ALTER TABLE {table} "
+            + ", ".join(f"ALTER COLUMN {column} TYPE DOUBLE PRECISION" for column in columns)
+        )
@@ -0,0 +1,83 @@
+"""add users.timezone and local day/week/month keys on sessions, tasks, goals
+
+Revision ID: user_timezone_local_keys
+Revises: epoch_ms_time_columns
+Create Date: 2026-10-17 13:00:00
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "user_timezone_local_keys"
+down_revision: Union[str, None] = "epoch_ms_time_columns"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+BATCH_SIZE = 10000
+
+# (bảng, primary key, cột epoch milliseconds dùng để tính local keys)
+LOCAL_KEY_TABLES = [
+    ("sessions", "session_id", "session_date"),
+    ("tasks", "task_id", "task_date"),
+    ("goals", "goal_id", "goal_date"),
+]
+
+LOCAL_KEY_INDEXES = [
+    ("idx_sessions_user_local_day", "sessions", ["user_id", "local_day"]),
+    ("idx_tasks_user_local_day", "tasks", ["user_id", "local_day"]),
+    ("idx_tasks_user_local_week", "tasks", ["user_id", "local_week"]),
+    ("idx_tasks_user_local_month", "tasks", ["user_id", "local_month"]),
+    ("idx_goals_user_local_day", "goals", ["user_id", "local_day"]),
+]
+
+
+def upgrade() -> None:
+    op.add_column(
+        "users",
+        sa.Column("timezone", sa.String(), nullable=False, server_default="UTC"),
+    )
+    for table, _, _ in LOCAL_KEY_TABLES:
+        op.add_column(table, sa.Column("local_day", sa.Integer(), nullable=True))
+        op.add_column(table, sa.Column("local_week", sa.Integer(), nullable=True))
+        op.add_column(table, sa.Column("local_month", sa.Integer(), nullable=True))
+
+    # Mọi user hiện có đều là UTC => local keys là ngày UTC; mỗi batch commit riêng
+    with op.get_context().autocommit_block():
+        bind = op.get_bind()
+        for table, pk, column in LOCAL_KEY_TABLES:
+            low, high = bind.execute(sa.text(f"SELECT MIN({pk}), MAX({pk}) FROM {table}")).first()
+            if low is None:
+                continue
+            for start in range(low, high + 1, BATCH_SIZE):
+                bind.execute(
+                    sa.text(
+                        f"""
+                        UPDATE {table}
+                        SET local_day = floor({column} / 86400000.0)::int,
+                            local_week = (EXTRACT(isoyear FROM timezone('UTC', to_timestamp({column} / 1000.0))) * 100
+                                + EXTRACT(week FROM timezone('UTC', to_timestamp({column} / 1000.0))))::int,
+                            local_month = (EXTRACT(year FROM timezone('UTC', to_timestamp({column} / 1000.0))) * 100
+                                + EXTRACT(month FROM timezone('UTC', to_timestamp({column} / 1000.0))))::int
+                        WHERE {pk} >= :start AND {pk} < :end AND {column} IS NOT NULL
+                        """
+                    ),
+                    {"start": start, "end": start + BATCH_SIZE},
+                )
+
+    for name, table, columns in LOCAL_KEY_INDEXES:
+        op.create_index(name, table, columns)
+
+
+def downgrade() -> None:
+    for name, table, _ in reversed(LOCAL_KEY_INDEXES):
+        op.drop_index(name, table_name=table)
+    for table, _, _ in LOCAL_KEY_TABLES:
+        op.drop_column(table, "local_month")
+        op.drop_column(table, "local_week")
+        op.drop_column(table, "local_day")
+    op.drop_column("users", "timezone")
@@ -0,0 +1,54 @@
+"""add partial/covering indexes for per-user activity aggregates (CONCURRENTLY)
+
+Revision ID: partial_activity_indexes
+Revises: user_timezone_local_keys
+Create Date: 2026-10-17 14:00:00
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "partial_activity_indexes"
+down_revision: Union[str, None] = "user_timezone_local_keys"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# (tên index, bảng, cột, INCLUDE, điều kiện partial)
+PARTIAL_INDEXES = [
+    (
+        "idx_sessions_user_local_day_completed",
+        "sessions",
+        ["user_id", "local_day"],
+        ["session_type", "duration_minutes"],
+        "status = 'COMPLETED'",
+    ),
+    ("idx_tasks_user_completed_at", "tasks", ["user_id", "completed_at"], None, "is_completed = 1"),
+    ("idx_goals_user_achieved_at", "goals", ["user_id", "achieved_at"], None, "is_achieved = 1"),
+]
+
+
+def upgrade() -> None:
+    # CREATE INDEX CONCURRENTLY không chạy được trong transaction và không lock ghi trên bảng.
+    # Nếu một lần build bị huỷ giữa chừng, index INVALID còn lại phải được drop trước khi chạy lại.
+    with op.get_context().autocommit_block():
+        for name, table, columns, include, where in PARTIAL_INDEXES:
+            op.create_index(
+                name,
+                table,
+                columns,
+                postgresql_include=include or [],
+                postgresql_where=sa.text(where),
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _, _, _ in reversed(PARTIAL_INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,43 @@
+"""add sessions.client_uuid idempotency key for offline sync
+
+Revision ID: session_client_uuid
+Revises: partial_activity_indexes
+Create Date: 2026-10-17 15:00:00
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "session_client_uuid"
+down_revision: Union[str, None] = "partial_activity_indexes"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Cột nullable không có default => chỉ đổi metadata, không rewrite bảng
+    op.add_column("sessions", sa.Column("client_uuid", sa.String(length=64), nullable=True))
+
+    # Build unique index CONCURRENTLY rồi gắn thành constraint (không lock ghi trong lúc build)
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "uq_sessions_user_client_uuid",
+            "sessions",
+            ["user_id", "client_uuid"],
+            unique=True,
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+    op.execute(
+        "ALTER TABLE sessions ADD CONSTRAINT uq_sessions_user_client_uuid "
+        "UNIQUE USING INDEX uq_sessions_user_client_uuid"
+    )
+
+
+def downgrade() -> None:
+    op.drop_constraint("uq_sessions_user_client_uuid", "sessions", type_="unique")
+    op.drop_column("sessions", "client_uuid")
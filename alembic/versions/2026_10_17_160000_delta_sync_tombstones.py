@@ -0,0 +1,60 @@
+"""add sync_tombstones and (owner, updated_at) indexes for delta sync
+
+Revision ID: delta_sync_tombstones
+Revises: session_client_uuid
+Create Date: 2026-10-17 16:00:00
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "delta_sync_tombstones"
+down_revision: Union[str, None] = "session_client_uuid"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# (tên index, bảng, cột) - keyset (updated_at, id) theo owner của row
+UPDATED_AT_INDEXES = [
+    ("idx_sessions_user_updated_at", "sessions", ["user_id", "updated_at", "session_id"]),
+    ("idx_session_pauses_session_updated_at", "session_pauses", ["session_id", "updated_at"]),
+    ("idx_tasks_user_updated_at", "tasks", ["user_id", "updated_at", "task_id"]),
+    ("idx_task_sessions_task_updated_at", "task_sessions", ["task_id", "updated_at"]),
+    ("idx_goals_user_updated_at", "goals", ["user_id", "updated_at", "goal_id"]),
+    ("idx_user_settings_user_updated_at", "user_settings", ["user_id", "updated_at", "setting_id"]),
+]
+
+
+def upgrade() -> None:
+    op.create_table(
+        "sync_tombstones",
+        sa.Column("tombstone_id", sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.user_id", ondelete="CASCADE"), nullable=False),
+        sa.Column("entity_type", sa.String(), nullable=False),
+        sa.Column("entity_id", sa.Integer(), nullable=False),
+        sa.Column("deleted_at", sa.Float(), nullable=False),
+        sa.Column("created_at", sa.Float(), nullable=False),
+        sa.Column("updated_at", sa.Float(), nullable=False),
+    )
+    op.create_index(
+        "idx_sync_tombstones_user_deleted_at",
+        "sync_tombstones",
+        ["user_id", "deleted_at", "tombstone_id"],
+    )
+
+    # Các bảng đã có dữ liệu: build index CONCURRENTLY để không lock ghi
+    with op.get_context().autocommit_block():
+        for name, table, columns in UPDATED_AT_INDEXES:
+            op.create_index(name, table, columns, postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _ in reversed(UPDATED_AT_INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
+    op.drop_index("idx_sync_tombstones_user_deleted_at", table_name="sync_tombstones")
+    op.drop_table("sync_tombstones")
@@ -0,0 +1,45 @@
+"""add outbox_events for post-commit domain event handlers
+
+Revision ID: outbox_events
+Revises: delta_sync_tombstones
+Create Date: 2026-10-17 17:00:00
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "outbox_events"
+down_revision: Union[str, None] = "delta_sync_tombstones"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "outbox_events",
+        sa.Column("outbox_id", sa.BigInteger(), primary_key=True, autoincrement=True),
+        sa.Column("event_name", sa.String(), nullable=False),
+        sa.Column("handler", sa.String(), nullable=False),
+        sa.Column("payload", sa.JSON(), nullable=False),
+        sa.Column("available_at", sa.Float(), nullable=False),
+        sa.Column("attempts", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("last_error", sa.Text(), nullable=True),
+        sa.Column("failed_at", sa.Float(), nullable=True),
+        sa.Column("created_at", sa.Float(), nullable=False),
+        sa.Column("updated_at", sa.Float(), nullable=False),
+    )
+    op.create_index(
+        "idx_outbox_events_pending",
+        "outbox_events",
+        ["available_at", "outbox_id"],
+        postgresql_where=sa.text("failed_at IS NULL"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("idx_outbox_events_pending", table_name="outbox_events")
+    op.drop_table("outbox_events")
@@ -0,0 +1,48 @@
+"""add (owner, column, id) indexes for sortable list columns
+
+Revision ID: sortable_column_indexes
+Revises: outbox_events
+Create Date: 2026-10-17 18:00:00
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "sortable_column_indexes"
+down_revision: Union[str, None] = "outbox_events"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# (tên index, bảng, cột) - ORDER BY cột, id LIMIT n đọc thẳng theo index
+SORT_INDEXES = [
+    ("idx_sessions_user_date_id", "sessions", ["user_id", "session_date", "session_id"]),
+    ("idx_tasks_user_date_id", "tasks", ["user_id", "task_date", "task_id"]),
+    ("idx_tasks_user_order_index", "tasks", ["user_id", "order_index", "task_id"]),
+    ("idx_shop_price", "shop", ["price", "shop_id"]),
+]
+
+# Index cũ là prefix của index mới => thừa
+REPLACED_INDEXES = [
+    ("idx_sessions_user_date", "sessions", ["user_id", "session_date"]),
+    ("idx_tasks_user_date", "tasks", ["user_id", "task_date"]),
+]
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, columns in SORT_INDEXES:
+            op.create_index(name, table, columns, postgresql_concurrently=True, if_not_exists=True)
+        for name, table, _ in REPLACED_INDEXES:
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, columns in REPLACED_INDEXES:
+            op.create_index(name, table, columns, postgresql_concurrently=True, if_not_exists=True)
+        for name, table, _ in reversed(SORT_INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
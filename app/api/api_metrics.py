@@ -0,0 +1,45 @@
+from typing import Any
+
+from fastapi import APIRouter, Depends, status
+
+from app.schemas.sche_response import DataResponse
+from app.services.srv_statistics import StatisticsCacheService
+from app.utils import event_bus
+from app.utils.exception_handler import CustomException
+from app.utils.login_manager import MetricsTokenRequired
+
+# Endpoints vận hành, không thuộc API của user: cần header X-Metrics-Token (METRICS_TOKEN)
+router = APIRouter(prefix=f"/metrics", dependencies=[Depends(MetricsTokenRequired())])
+
+
+@router.get(
+    "/statistics-cache",
+    response_model=DataResponse[dict],
+    status_code=status.HTTP_200_OK,
+)
+def get_statistics_cache_metrics() -> Any:
+    """
+    Số lần hit/miss của read-through cache cho /statistics/daily và /statistics/monthly
+    """
+    try:
+        return DataResponse(
+            http_code=status.HTTP_200_OK,
+            data=StatisticsCacheService.get_cache_metrics()
+        )
+    except Exception as e:
+        raise CustomException(exception=e)
+
+
+@router.get(
+    "/events",
+    response_model=DataResponse[dict],
+    status_code=status.HTTP_200_OK,
+)
+def get_event_metrics() -> Any:
+    """
+    Backlog/lag của outbox (side effects khi session/task/goal hoàn thành) và latency của từng handler
+    """
+    try:
+        return DataResponse(http_code=status.HTTP_200_OK, data=event_bus.get_metrics())
+    except Exception as e:
+        raise CustomException(exception=e)
@@ -1,6 +1,6 @@
 from typing import Any, List
 from fastapi import APIRouter, Depends, status
-from app.utils.exception_handler import CustomException, ExceptionType
+from app.utils.exception_handler import CustomException
 from app.schemas.sche_response import DataResponse
 from app.schemas.sche_base import PaginationParams, SortParams
 from app.schemas.sche_goal import (
@@ -9,8 +9,8 @@ from app.schemas.sche_goal import (
     GoalBaseResponse,
 )
 from app.services.srv_goal import GoalService
-from app.utils.login_manager import AuthenticateUserEntityRequired
-from app.models.model_user_entity import UserEntity
+from app.core.security import Principal
+from app.utils.login_manager import AuthenticatePrincipalRequired
 
 router = APIRouter(prefix=f"/goals")
 
@@ -23,14 +23,13 @@ goal_service: GoalService = GoalService()
     status_code=status.HTTP_200_OK,
 )
 def get_all(
-    current_user: UserEntity = Depends(AuthenticateUserEntityRequired())
+    current_user: Principal = Depends(AuthenticatePrincipalRequired())
 ) -> Any:
     try:
-        from fastapi_sqlalchemy import db
         from app.models.model_goal import GoalEntity
         from app.utils.paging import paginate
         from app.schemas.sche_base import SortParams
-        query = db.session.query(GoalEntity).filter(GoalEntity.user_id == current_user.user_id)
+        query = goal_service.owned_query(current_user.user_id)
         data, metadata = paginate(
             model=GoalEntity,
             query=query,
@@ -50,13 +49,12 @@ def get_all(
 def get_by_filter(
     sort_params: SortParams = Depends(),
     pagination_params: PaginationParams = Depends(),
-    current_user: UserEntity = Depends(AuthenticateUserEntityRequired()),
+    current_user: Principal = Depends(AuthenticatePrincipalRequired()),
 ) -> Any:
     try:
-        from fastapi_sqlalchemy import db
         from app.models.model_goal import GoalEntity
         from app.utils.paging import paginate
-        query = db.session.query(GoalEntity).filter(GoalEntity.user_id == current_user.user_id)
+        query = goal_service.owned_query(current_user.user_id)
         data, metadata = paginate(
             model=GoalEntity,
             query=query,
@@ -75,7 +73,7 @@ def get_by_filter(
 )
 def create(
     goal_data: GoalCreateRequest,
-    current_user: UserEntity = Depends(AuthenticateUserEntityRequired()),
+    current_user: Principal = Depends(AuthenticatePrincipalRequired()),
 ) -> Any:
     try:
         goal_dict = goal_data.model_dump()
@@ -93,12 +91,10 @@ def create(
 )
 def get_by_id(
     goal_id: int,
-    current_user: UserEntity = Depends(AuthenticateUserEntityRequired()),
+    current_user: Principal = Depends(AuthenticatePrincipalRequired()),
 ) -> Any:
     try:
-        goal = goal_service.get_by_id(goal_id)
-        if goal.user_id != current_user.user_id:
-            raise CustomException(exception=ExceptionType.FORBIDDEN)
+        goal = goal_service.get_by_id(goal_id, owner_id=current_user.user_id)
         return DataResponse(http_code=status.HTTP_200_OK, data=goal)
     except Exception as e:
         raise CustomException(exception=e)
@@ -112,13 +108,12 @@ def get_by_id(
 def update_by_id(
     goal_id: int,
     goal_data: GoalUpdateRequest,
-    current_user: UserEntity = Depends(AuthenticateUserEntityRequired()),
+    current_user: Principal = Depends(AuthenticatePrincipalRequired()),
 ) -> Any:
     try:
-        goal = goal_service.get_by_id(goal_id)
-        if goal.user_id != current_user.user_id:
-            raise CustomException(exception=ExceptionType.FORBIDDEN)
-        updated_goal = goal_service.update_by_id(goal_id, data=goal_data.model_dump(exclude_unset=True))
+        updated_goal = goal_service.update_by_id(
+            goal_id, data=goal_data.model_dump(exclude_unset=True), owner_id=current_user.user_id
+        )
         return DataResponse(http_code=status.HTTP_200_OK, data=updated_goal)
     except Exception as e:
         raise CustomException(exception=e)
@@ -132,13 +127,12 @@ def update_by_id(
 def partial_update_by_id(
     goal_id: int,
     goal_data: GoalUpdateRequest,
-    current_user: UserEntity = Depends(AuthenticateUserEntityRequired()),
+    current_user: Principal = Depends(AuthenticatePrincipalRequired()),
 ) -> Any:
     try:
-        goal = goal_service.get_by_id(goal_id)
-        if goal.user_id != current_user.user_id:
-            raise CustomException(exception=ExceptionType.FORBIDDEN)
-        updated_goal = goal_service.partial_update_by_id(goal_id, data=goal_data.model_dump(exclude_unset=True))
+        updated_goal = goal_service.partial_update_by_id(
+            goal_id, data=goal_data.model_dump(exclude_unset=True), owner_id=current_user.user_id
+        )
         return DataResponse(http_code=status.HTTP_200_OK, data=updated_goal)
     except Exception as e:
         raise CustomException(exception=e)
@@ -150,13 +144,10 @@ def partial_update_by_id(
 )
 def delete_by_id(
     goal_id: int,
-    current_user: UserEntity = Depends(AuthenticateUserEntityRequired()),
+    current_user: Principal = Depends(AuthenticatePrincipalRequired()),
 ) -> None:
     try:
-        goal = goal_service.get_by_id(goal_id)
-        if goal.user_id != current_user.user_id:
-            raise CustomException(exception=ExceptionType.FORBIDDEN)
-        goal_service.delete_by_id(goal_id)
+        goal_service.delete_by_id(goal_id, owner_id=current_user.user_id)
     except Exception as e:
         raise CustomException(exception=e)
 
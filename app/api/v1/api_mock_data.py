@@ -30,26 +30,26 @@ def generate_shop_mock_data(
     Tạo fake data cho bảng shop
     """
     try:
-        from app.models.model_shop import ShopEntity
+        from app.services.srv_shop import ShopService
         
         shop_types = ["theme", "avatar", "pack", "item", "background", "icon"]
-        shop_items = []
-        
-        for _ in range(count):
-            shop_item = ShopEntity(
-                name=fake.catch_phrase(),
-                price=round(random.uniform(1.99, 99.99), 2),
-                type=random.choice(shop_types),
-            )
-            db.session.add(shop_item)
-            shop_items.append({
+        rows = [
+            {
+                "name": fake.catch_phrase(),
+                "price": round(random.uniform(1.99, 99.99), 2),
+                "type": random.choice(shop_types),
+            }
+            for _ in range(count)
+        ]
+        shop_items = [
+            {
                 "shop_id": shop_item.shop_id,
                 "name": shop_item.name,
                 "price": shop_item.price,
                 "type": shop_item.type,
-            })
-        
-        db.session.commit()
+            }
+            for shop_item in ShopService().create_many(rows)
+        ]
         
         return DataResponse(
             http_code=status.HTTP_201_CREATED,
@@ -78,6 +78,7 @@ def generate_shop_purchases_mock_data(
     """
     try:
         from app.models.model_shop import ShopEntity, ShopPurchaseEntity
+        from app.services.srv_shop import ShopPurchaseService
         
         # Get all shop items
         shop_items = db.session.query(ShopEntity).all()
@@ -103,28 +104,26 @@ def generate_shop_purchases_mock_data(
         # Random select shops to purchase
         shops_to_purchase = random.sample(available_shops, count)
         
-        purchases = []
         now = time_utils.timestamp_now()
-        
-        for shop in shops_to_purchase:
-            # Random purchase time in the past 30 days
-            days_ago = random.randint(0, 30)
-            purchased_at = now - (days_ago * 24 * 60 * 60)
-            
-            purchase = ShopPurchaseEntity(
-                user_id=current_user.user_id,
-                shop_id=shop.shop_id,
-                purchased_at=purchased_at,
-            )
-            db.session.add(purchase)
-            purchases.append({
-                "purchase_id": purchase.purchase_id,
+        rows = [
+            {
+                "user_id": current_user.user_id,
                 "shop_id": shop.shop_id,
-                "shop_name": shop.name,
-                "purchased_at": purchased_at,
-            })
-        
-        db.session.commit()
+                # Random purchase time in the past 30 days
+                "purchased_at": now - (random.randint(0, 30) * 24 * 60 * 60),
+            }
+            for shop in shops_to_purchase
+        ]
+        shop_names = {shop.shop_id: shop.name for shop in shops_to_purchase}
+        purchases = [
+            {
+                "purchase_id": purchase.purchase_id,
+                "shop_id": purchase.shop_id,
+                "shop_name": shop_names[purchase.shop_id],
+                "purchased_at": purchase.purchased_at,
+            }
+            for purchase in ShopPurchaseService().create_many(rows)
+        ]
         
         return DataResponse(
             http_code=status.HTTP_201_CREATED,
@@ -153,9 +152,10 @@ def generate_tasks_mock_data(
     """
     try:
         from app.models.model_task import TaskEntity
+        from app.services.srv_task import TaskService
         
         priorities = [TaskEntity.PRIORITY_HIGH, TaskEntity.PRIORITY_MEDIUM, TaskEntity.PRIORITY_LOW]
-        tasks = []
+        rows = []
         now = time_utils.timestamp_now()
         
         for _ in range(count):
@@ -168,28 +168,29 @@ def generate_tasks_mock_data(
             if is_completed:
                 completed_at = task_date + random.randint(0, 8 * 60 * 60)  # Completed within 8 hours
             
-            task = TaskEntity(
-                user_id=current_user.user_id,
-                title=fake.sentence(nb_words=4),
-                description=fake.text(max_nb_chars=200),
-                priority=random.choice(priorities),
-                task_date=task_date,
-                is_completed=is_completed,
-                completed_at=completed_at,
-                total_time_spent=random.randint(0, 480) if is_completed else 0,  # 0-8 hours in minutes
-                estimated_sessions=random.randint(1, 5),
-                actual_sessions=random.randint(0, 5) if is_completed else 0,
-                order_index=random.randint(0, 100),
-            )
-            db.session.add(task)
-            tasks.append({
+            rows.append({
+                "user_id": current_user.user_id,
+                "title": fake.sentence(nb_words=4),
+                "description": fake.text(max_nb_chars=200),
+                "priority": random.choice(priorities),
+                "task_date": task_date,
+                "is_completed": is_completed,
+                "completed_at": completed_at,
+                "total_time_spent": random.randint(0, 480) if is_completed else 0,  # 0-8 hours in minutes
+                "estimated_sessions": random.randint(1, 5),
+                "actual_sessions": random.randint(0, 5) if is_completed else 0,
+                "order_index": random.randint(0, 100),
+            })
+        
+        tasks = [
+            {
                 "task_id": task.task_id,
                 "title": task.title,
                 "priority": task.priority,
                 "is_completed": task.is_completed,
-            })
-        
-        db.session.commit()
+            }
+            for task in TaskService().create_many(rows)
+        ]
         
         return DataResponse(
             http_code=status.HTTP_201_CREATED,
@@ -218,6 +219,7 @@ def generate_sessions_mock_data(
     """
     try:
         from app.models.model_session import SessionEntity
+        from app.services.srv_session import SessionService
         
         session_types = [
             SessionEntity.TYPE_FOCUS_SESSION,
@@ -229,7 +231,7 @@ def generate_sessions_mock_data(
             SessionEntity.STATUS_CANCELLED,
         ]
         
-        sessions = []
+        rows = []
         now = time_utils.timestamp_now()
         
         for _ in range(count):
@@ -245,25 +247,25 @@ def generate_sessions_mock_data(
             start_time = session_date + random.randint(0, 12 * 60 * 60)  # Random time in the day
             end_time = start_time + (duration_minutes * 60)
             
-            session = SessionEntity(
-                user_id=current_user.user_id,
-                session_date=session_date,
-                start_time=start_time,
-                end_time=end_time,
-                duration_minutes=duration_minutes,
-                session_type=session_type,
-                status=random.choice(statuses),
-                notes=fake.sentence(nb_words=6) if random.choice([True, False]) else None,
-            )
-            db.session.add(session)
-            sessions.append({
+            rows.append({
+                "user_id": current_user.user_id,
+                "session_date": session_date,
+                "start_time": start_time,
+                "end_time": end_time,
+                "duration_minutes": duration_minutes,
+                "session_type": session_type,
+                "status": random.choice(statuses),
+            })
+        
+        sessions = [
+            {
                 "session_id": session.session_id,
                 "session_type": session.session_type,
                 "duration_minutes": session.duration_minutes,
                 "status": session.status,
-            })
-        
-        db.session.commit()
+            }
+            for session in SessionService().create_many(rows)
+        ]
         
         return DataResponse(
             http_code=status.HTTP_201_CREATED,
@@ -291,9 +293,9 @@ def generate_goals_mock_data(
     Tạo fake data cho bảng goals (cho user hiện tại)
     """
     try:
-        from app.models.model_goal import GoalEntity
+        from app.services.srv_goal import GoalService
         
-        goals = []
+        rows = []
         now = time_utils.timestamp_now()
         
         for _ in range(count):
@@ -307,25 +309,26 @@ def generate_goals_mock_data(
             is_achieved = 1 if completed_sessions >= target_sessions else 0
             achieved_at = goal_date + random.randint(0, 12 * 60 * 60) if is_achieved else None
             
-            goal = GoalEntity(
-                user_id=current_user.user_id,
-                goal_date=goal_date,
-                target_sessions=target_sessions,
-                completed_sessions=completed_sessions,
-                completion_percentage=completion_percentage,
-                is_achieved=is_achieved,
-                achieved_at=achieved_at,
-            )
-            db.session.add(goal)
-            goals.append({
+            rows.append({
+                "user_id": current_user.user_id,
+                "goal_date": goal_date,
+                "target_sessions": target_sessions,
+                "completed_sessions": completed_sessions,
+                "completion_percentage": completion_percentage,
+                "is_achieved": is_achieved,
+                "achieved_at": achieved_at,
+            })
+        
+        goals = [
+            {
                 "goal_id": goal.goal_id,
                 "goal_date": goal.goal_date,
                 "target_sessions": goal.target_sessions,
                 "completed_sessions": goal.completed_sessions,
                 "is_achieved": goal.is_achieved,
-            })
-        
-        db.session.commit()
+            }
+            for goal in GoalService().create_many(rows)
+        ]
         
         return DataResponse(
             http_code=status.HTTP_201_CREATED,
@@ -353,9 +356,10 @@ def generate_users_mock_data(
     Tạo fake data cho bảng users
     """
     try:
-        from app.models.model_user_entity import UserEntity
+        from app.services.srv_user_entity import UserEntityService
         
-        users = []
+        rows = []
+        has_passwords = []
         now = time_utils.timestamp_now()
         
         for _ in range(count):
@@ -366,23 +370,25 @@ def generate_users_mock_data(
             has_password = random.choice([True, False])
             hashed_password = get_password_hash("password123") if has_password else None
             
-            user = UserEntity(
-                email=email,
-                display_name=display_name,
-                profile_picture_url=fake.image_url() if random.choice([True, False]) else None,
-                hashed_password=hashed_password,
-                last_login=now - random.randint(0, 7 * 24 * 60 * 60),  # Last login in past 7 days
-                is_anonymous=0,
-            )
-            db.session.add(user)
-            users.append({
+            rows.append({
+                "email": email,
+                "display_name": display_name,
+                "profile_picture_url": fake.image_url() if random.choice([True, False]) else None,
+                "hashed_password": hashed_password,
+                "last_login": now - random.randint(0, 7 * 24 * 60 * 60),  # Last login in past 7 days
+                "is_anonymous": 0,
+            })
+            has_passwords.append(has_password)
+        
+        users = [
+            {
                 "user_id": user.user_id,
                 "email": user.email,
                 "display_name": user.display_name,
                 "has_password": has_password,
-            })
-        
-        db.session.commit()
+            }
+            for user, has_password in zip(UserEntityService().create_many(rows), has_passwords)
+        ]
         
         return DataResponse(
             http_code=status.HTTP_201_CREATED,
@@ -1,6 +1,6 @@
 from typing import Any, List
 from fastapi import APIRouter, Depends, status
-from app.utils.exception_handler import CustomException, ExceptionType
+from app.utils.exception_handler import CustomException
 from app.schemas.sche_response import DataResponse
 from app.schemas.sche_base import PaginationParams, SortParams
 from app.schemas.sche_session import (
@@ -10,10 +10,15 @@ from app.schemas.sche_session import (
     SessionPauseCreateRequest,
     SessionPauseUpdateRequest,
     SessionPauseBaseResponse,
+    SessionSyncRequest,
+    SessionSyncResponse,
+    SessionStartRequest,
+    SessionTransitionRequest,
+    SessionTransitionResponse,
 )
 from app.services.srv_session import SessionService, SessionPauseService
-from app.utils.login_manager import AuthenticateUserEntityRequired
-from app.models.model_user_entity import UserEntity
+from app.core.security import Principal
+from app.utils.login_manager import AuthenticatePrincipalRequired
 
 router = APIRouter(prefix=f"/sessions")
 
@@ -28,14 +33,13 @@ session_pause_service: SessionPauseService = SessionPauseService()
     status_code=status.HTTP_200_OK,
 )
 def get_all(
-    current_user: UserEntity = Depends(AuthenticateUserEntityRequired())
+    current_user: Principal = Depends(AuthenticatePrincipalRequired())
 ) -> Any:
     try:
-        from fastapi_sqlalchemy import db
         from app.models.model_session import SessionEntity
         from app.utils.paging import paginate
         from app.schemas.sche_base import SortParams
-        query = db.session.query(SessionEntity).filter(SessionEntity.user_id == current_user.user_id)
+        query = session_service.owned_query(current_user.user_id)
         data, metadata = paginate(
             model=SessionEntity,
             query=query,
@@ -55,13 +59,12 @@ def get_all(
 def get_by_filter(
     sort_params: SortParams = Depends(),
     pagination_params: PaginationParams = Depends(),
-    current_user: UserEntity = Depends(AuthenticateUserEntityRequired()),
+    current_user: Principal = Depends(AuthenticatePrincipalRequired()),
 ) -> Any:
     try:
-        from fastapi_sqlalchemy import db
         from app.models.model_session import SessionEntity
         from app.utils.paging import paginate
-        query = db.session.query(SessionEntity).filter(SessionEntity.user_id == current_user.user_id)
+        query = session_service.owned_query(current_user.user_id)
         data, metadata = paginate(
             model=SessionEntity,
             query=query,
@@ -80,7 +83,7 @@ def get_by_filter(
 )
 def create(
     session_data: SessionCreateRequest,
-    current_user: UserEntity = Depends(AuthenticateUserEntityRequired()),
+    current_user: Principal = Depends(AuthenticatePrincipalRequired()),
 ) -> Any:
     try:
         session_dict = session_data.model_dump()
@@ -91,6 +94,133 @@ def create(
         raise CustomException(exception=e)
 
 
+@router.post(
+    "/sync",
+    response_model=DataResponse[SessionSyncResponse],
+    status_code=status.HTTP_200_OK,
+)
+def sync_sessions(
+    sync_data: SessionSyncRequest,
+    current_user: Principal = Depends(AuthenticatePrincipalRequired()),
+) -> Any:
+    """
+    Đồng bộ nhiều sessions (kèm pauses và task links) từ client trong một request/transaction
+    client_uuid là idempotency key: gửi lại cùng client_uuid sẽ không tạo session mới mà trả về ID đã có
+    """
+    try:
+        items = session_service.sync_batch(
+            current_user.user_id,
+            [item.model_dump() for item in sync_data.sessions],
+        )
+        created_count = sum(1 for item in items if item["created"])
+        return DataResponse(
+            http_code=status.HTTP_200_OK,
+            data=SessionSyncResponse(
+                created_count=created_count,
+                duplicate_count=len(items) - created_count,
+                items=items,
+            ),
+        )
+    except Exception as e:
+        raise CustomException(exception=e)
+
+
+@router.post(
+    "/start",
+    response_model=DataResponse[SessionBaseResponse],
+    status_code=status.HTTP_201_CREATED,
+)
+def start_session(
+    start_data: SessionStartRequest,
+    current_user: Principal = Depends(AuthenticatePrincipalRequired()),
+) -> Any:
+    """
+    Bắt đầu một session mới (status IN_PROGRESS, start_time do server ghi nếu không truyền "at")
+    """
+    try:
+        new_session = session_service.start(current_user.user_id, start_data.model_dump())
+        return DataResponse(http_code=status.HTTP_201_CREATED, data=new_session)
+    except Exception as e:
+        raise CustomException(exception=e)
+
+
+def _transition(session_id: int, action: str, transition_data: SessionTransitionRequest, current_user: Principal) -> Any:
+    try:
+        session, pause = session_service.transition(
+            current_user.user_id, session_id, action, transition_data.at
+        )
+        return DataResponse(
+            http_code=status.HTTP_200_OK,
+            data=SessionTransitionResponse.model_validate({"session": session, "pause": pause}, from_attributes=True),
+        )
+    except Exception as e:
+        raise CustomException(exception=e)
+
+
+@router.post(
+    "/{session_id}/pause",
+    response_model=DataResponse[SessionTransitionResponse],
+    status_code=status.HTTP_200_OK,
+)
+def pause_session(
+    session_id: int,
+    transition_data: SessionTransitionRequest = SessionTransitionRequest(),
+    current_user: Principal = Depends(AuthenticatePrincipalRequired()),
+) -> Any:
+    """
+    IN_PROGRESS -> PAUSED: tạo pause mới và tăng pause_count
+    """
+    return _transition(session_id, "pause", transition_data, current_user)
+
+
+@router.post(
+    "/{session_id}/resume",
+    response_model=DataResponse[SessionTransitionResponse],
+    status_code=status.HTTP_200_OK,
+)
+def resume_session(
+    session_id: int,
+    transition_data: SessionTransitionRequest = SessionTransitionRequest(),
+    current_user: Principal = Depends(AuthenticatePrincipalRequired()),
+) -> Any:
+    """
+    PAUSED -> IN_PROGRESS: đóng pause đang mở và cộng vào total_pause_duration
+    """
+    return _transition(session_id, "resume", transition_data, current_user)
+
+
+@router.post(
+    "/{session_id}/complete",
+    response_model=DataResponse[SessionTransitionResponse],
+    status_code=status.HTTP_200_OK,
+)
+def complete_session(
+    session_id: int,
+    transition_data: SessionTransitionRequest = SessionTransitionRequest(),
+    current_user: Principal = Depends(AuthenticatePrincipalRequired()),
+) -> Any:
+    """
+    IN_PROGRESS/PAUSED -> COMPLETED: đóng pause đang mở, ghi end_time và actual_duration_minutes
+    """
+    return _transition(session_id, "complete", transition_data, current_user)
+
+
+@router.post(
+    "/{session_id}/cancel",
+    response_model=DataResponse[SessionTransitionResponse],
+    status_code=status.HTTP_200_OK,
+)
+def cancel_session(
+    session_id: int,
+    transition_data: SessionTransitionRequest = SessionTransitionRequest(),
+    current_user: Principal = Depends(AuthenticatePrincipalRequired()),
+) -> Any:
+    """
+    IN_PROGRESS/PAUSED -> CANCELLED: đóng pause đang mở, ghi end_time và actual_duration_minutes
+    """
+    return _transition(session_id, "cancel", transition_data, current_user)
+
+
 @router.get(
     "/{session_id}",
     response_model=DataResponse[SessionBaseResponse],
@@ -98,12 +228,10 @@ def create(
 )
 def get_by_id(
     session_id: int,
-    current_user: UserEntity = Depends(AuthenticateUserEntityRequired()),
+    current_user: Principal = Depends(AuthenticatePrincipalRequired()),
 ) -> Any:
     try:
-        session = session_service.get_by_id(session_id)
-        if session.user_id != current_user.user_id:
-            raise CustomException(exception=ExceptionType.FORBIDDEN)
+        session = session_service.get_by_id(session_id, owner_id=current_user.user_id)
         return DataResponse(http_code=status.HTTP_200_OK, data=session)
     except Exception as e:
         raise CustomException(exception=e)
@@ -117,13 +245,12 @@ def get_by_id(
 def update_by_id(
     session_id: int,
     session_data: SessionUpdateRequest,
-    current_user: UserEntity = Depends(AuthenticateUserEntityRequired()),
+    current_user: Principal = Depends(AuthenticatePrincipalRequired()),
 ) -> Any:
     try:
-        session = session_service.get_by_id(session_id)
-        if session.user_id != current_user.user_id:
-            raise CustomException(exception=ExceptionType.FORBIDDEN)
-        updated_session = session_service.update_by_id(session_id, data=session_data.model_dump(exclude_unset=True))
+        updated_session = session_service.update_by_id(
+            session_id, data=session_data.model_dump(exclude_unset=True), owner_id=current_user.user_id
+        )
         return DataResponse(http_code=status.HTTP_200_OK, data=updated_session)
     except Exception as e:
         raise CustomException(exception=e)
@@ -137,13 +264,12 @@ def update_by_id(
 def partial_update_by_id(
     session_id: int,
     session_data: SessionUpdateRequest,
-    current_user: UserEntity = Depends(AuthenticateUserEntityRequired()),
+    current_user: Principal = Depends(AuthenticatePrincipalRequired()),
 ) -> Any:
     try:
-        session = session_service.get_by_id(session_id)
-        if session.user_id != current_user.user_id:
-            raise CustomException(exception=ExceptionType.FORBIDDEN)
-        updated_session = session_service.partial_update_by_id(session_id, data=session_data.model_dump(exclude_unset=True))
+        updated_session = session_service.partial_update_by_id(
+            session_id, data=session_data.model_dump(exclude_unset=True), owner_id=current_user.user_id
+        )
         return DataResponse(http_code=status.HTTP_200_OK, data=updated_session)
     except Exception as e:
         raise CustomException(exception=e)
@@ -155,13 +281,10 @@ def partial_update_by_id(
 )
 def delete_by_id(
     session_id: int,
-    current_user: UserEntity = Depends(AuthenticateUserEntityRequired()),
+    current_user: Principal = Depends(AuthenticatePrincipalRequired()),
 ) -> None:
     try:
-        session = session_service.get_by_id(session_id)
-        if session.user_id != current_user.user_id:
-            raise CustomException(exception=ExceptionType.FORBIDDEN)
-        session_service.delete_by_id(session_id)
+        session_service.delete_by_id(session_id, owner_id=current_user.user_id)
     except Exception as e:
         raise CustomException(exception=e)
 
@@ -173,17 +296,14 @@ def delete_by_id(
     status_code=status.HTTP_200_OK,
 )
 def get_all_pauses(
-    current_user: UserEntity = Depends(AuthenticateUserEntityRequired()),
+    current_user: Principal = Depends(AuthenticatePrincipalRequired()),
 ) -> Any:
     try:
-        from fastapi_sqlalchemy import db
-        from app.models.model_session import SessionPauseEntity, SessionEntity
+        from app.models.model_session import SessionPauseEntity
         from app.utils.paging import paginate
         from app.schemas.sche_base import SortParams
         # Filter by user_id through session
-        query = db.session.query(SessionPauseEntity).join(
-            SessionEntity, SessionPauseEntity.session_id == SessionEntity.session_id
-        ).filter(SessionEntity.user_id == current_user.user_id)
+        query = session_pause_service.owned_query(current_user.user_id)
         data, metadata = paginate(
             model=SessionPauseEntity,
             query=query,
@@ -203,16 +323,13 @@ def get_all_pauses(
 def get_pauses_by_filter(
     sort_params: SortParams = Depends(),
     pagination_params: PaginationParams = Depends(),
-    current_user: UserEntity = Depends(AuthenticateUserEntityRequired()),
+    current_user: Principal = Depends(AuthenticatePrincipalRequired()),
 ) -> Any:
     try:
-        from fastapi_sqlalchemy import db
-        from app.models.model_session import SessionPauseEntity, SessionEntity
+        from app.models.model_session import SessionPauseEntity
         from app.utils.paging import paginate
         # Filter by user_id through session
-        query = db.session.query(SessionPauseEntity).join(
-            SessionEntity, SessionPauseEntity.session_id == SessionEntity.session_id
-        ).filter(SessionEntity.user_id == current_user.user_id)
+        query = session_pause_service.owned_query(current_user.user_id)
         data, metadata = paginate(
             model=SessionPauseEntity,
             query=query,
@@ -231,20 +348,11 @@ def get_pauses_by_filter(
 )
 def create_pause(
     pause_data: SessionPauseCreateRequest,
-    current_user: UserEntity = Depends(AuthenticateUserEntityRequired()),
+    current_user: Principal = Depends(AuthenticatePrincipalRequired()),
 ) -> Any:
     try:
-        from fastapi_sqlalchemy import db
-        from app.models.model_session import SessionEntity
-        # Verify session belongs to current user
-        session = db.session.query(SessionEntity).filter(
-            SessionEntity.session_id == pause_data.session_id
-        ).first()
-        if not session:
-            raise CustomException(exception=ExceptionType.NOT_FOUND)
-        if session.user_id != current_user.user_id:
-            raise CustomException(exception=ExceptionType.FORBIDDEN)
-        new_pause = session_pause_service.create(data=pause_data.model_dump())
+        # Session phải thuộc current user
+        new_pause = session_pause_service.create_owned(pause_data.model_dump(), current_user.user_id)
         return DataResponse(http_code=status.HTTP_201_CREATED, data=new_pause)
     except Exception as e:
         raise CustomException(exception=e)
@@ -257,18 +365,10 @@ def create_pause(
 )
 def get_pause_by_id(
     pause_id: int,
-    current_user: UserEntity = Depends(AuthenticateUserEntityRequired()),
+    current_user: Principal = Depends(AuthenticatePrincipalRequired()),
 ) -> Any:
     try:
-        from fastapi_sqlalchemy import db
-        from app.models.model_session import SessionEntity
-        pause = session_pause_service.get_by_id(pause_id)
-        # Verify session belongs to current user
-        session = db.session.query(SessionEntity).filter(
-            SessionEntity.session_id == pause.session_id
-        ).first()
-        if session.user_id != current_user.user_id:
-            raise CustomException(exception=ExceptionType.FORBIDDEN)
+        pause = session_pause_service.get_by_id(pause_id, owner_id=current_user.user_id)
         return DataResponse(http_code=status.HTTP_200_OK, data=pause)
     except Exception as e:
         raise CustomException(exception=e)
@@ -282,20 +382,11 @@ def get_pause_by_id(
 def update_pause_by_id(
     pause_id: int,
     pause_data: SessionPauseUpdateRequest,
-    current_user: UserEntity = Depends(AuthenticateUserEntityRequired()),
+    current_user: Principal = Depends(AuthenticatePrincipalRequired()),
 ) -> Any:
     try:
-        from fastapi_sqlalchemy import db
-        from app.models.model_session import SessionEntity
-        pause = session_pause_service.get_by_id(pause_id)
-        # Verify session belongs to current user
-        session = db.session.query(SessionEntity).filter(
-            SessionEntity.session_id == pause.session_id
-        ).first()
-        if session.user_id != current_user.user_id:
-            raise CustomException(exception=ExceptionType.FORBIDDEN)
         updated_pause = session_pause_service.update_by_id(
-            pause_id, data=pause_data.model_dump(exclude_unset=True)
+            pause_id, data=pause_data.model_dump(exclude_unset=True), owner_id=current_user.user_id
         )
         return DataResponse(http_code=status.HTTP_200_OK, data=updated_pause)
     except Exception as e:
@@ -310,20 +401,11 @@ def update_pause_by_id(
 def partial_update_pause_by_id(
     pause_id: int,
     pause_data: SessionPauseUpdateRequest,
-    current_user: UserEntity = Depends(AuthenticateUserEntityRequired()),
+    current_user: Principal = Depends(AuthenticatePrincipalRequired()),
 ) -> Any:
     try:
-        from fastapi_sqlalchemy import db
-        from app.models.model_session import SessionEntity
-        pause = session_pause_service.get_by_id(pause_id)
-        # Verify session belongs to current user
-        session = db.session.query(SessionEntity).filter(
-            SessionEntity.session_id == pause.session_id
-        ).first()
-        if session.user_id != current_user.user_id:
-            raise CustomException(exception=ExceptionType.FORBIDDEN)
         updated_pause = session_pause_service.partial_update_by_id(
-            pause_id, data=pause_data.model_dump(exclude_unset=True)
+            pause_id, data=pause_data.model_dump(exclude_unset=True), owner_id=current_user.user_id
         )
         return DataResponse(http_code=status.HTTP_200_OK, data=updated_pause)
     except Exception as e:
@@ -336,19 +418,10 @@ def partial_update_pause_by_id(
 )
 def delete_pause_by_id(
     pause_id: int,
-    current_user: UserEntity = Depends(AuthenticateUserEntityRequired()),
+    current_user: Principal = Depends(AuthenticatePrincipalRequired()),
 ) -> None:
     try:
-        from fastapi_sqlalchemy import db
-        from app.models.model_session import SessionEntity
-        pause = session_pause_service.get_by_id(pause_id)
-        # Verify session belongs to current user
-        session = db.session.query(SessionEntity).filter(
-            SessionEntity.session_id == pause.session_id
-        ).first()
-        if session.user_id != current_user.user_id:
-            raise CustomException(exception=ExceptionType.FORBIDDEN)
-        session_pause_service.delete_by_id(pause_id)
+        session_pause_service.delete_by_id(pause_id, owner_id=current_user.user_id)
     except Exception as e:
         raise CustomException(exception=e)
 
@@ -1,6 +1,6 @@
 from typing import Any, List
 from fastapi import APIRouter, Depends, status
-from app.utils.exception_handler import CustomException, ExceptionType
+from app.utils.exception_handler import CustomException
 from app.schemas.sche_response import DataResponse
 from app.schemas.sche_base import PaginationParams, SortParams
 from app.schemas.sche_setting import (
@@ -12,8 +12,8 @@ from app.schemas.sche_setting import (
     DefaultSettingBaseResponse,
 )
 from app.services.srv_setting import UserSettingService, DefaultSettingService
-from app.utils.login_manager import AuthenticateUserEntityRequired
-from app.models.model_user_entity import UserEntity
+from app.core.security import Principal
+from app.utils.login_manager import AuthenticatePrincipalRequired
 
 router = APIRouter(prefix=f"/settings")
 
@@ -28,14 +28,13 @@ default_setting_service: DefaultSettingService = DefaultSettingService()
     status_code=status.HTTP_200_OK,
 )
 def get_all_user_settings(
-    current_user: UserEntity = Depends(AuthenticateUserEntityRequired())
+    current_user: Principal = Depends(AuthenticatePrincipalRequired())
 ) -> Any:
     try:
-        from fastapi_sqlalchemy import db
         from app.models.model_setting import UserSettingEntity
         from app.utils.paging import paginate
         from app.schemas.sche_base import SortParams
-        query = db.session.query(UserSettingEntity).filter(UserSettingEntity.user_id == current_user.user_id)
+        query = user_setting_service.owned_query(current_user.user_id)
         data, metadata = paginate(
             model=UserSettingEntity,
             query=query,
@@ -55,13 +54,12 @@ def get_all_user_settings(
 def get_user_settings_by_filter(
     sort_params: SortParams = Depends(),
     pagination_params: PaginationParams = Depends(),
-    current_user: UserEntity = Depends(AuthenticateUserEntityRequired()),
+    current_user: Principal = Depends(AuthenticatePrincipalRequired()),
 ) -> Any:
     try:
-        from fastapi_sqlalchemy import db
         from app.models.model_setting import UserSettingEntity
         from app.utils.paging import paginate
-        query = db.session.query(UserSettingEntity).filter(UserSettingEntity.user_id == current_user.user_id)
+        query = user_setting_service.owned_query(current_user.user_id)
         data, metadata = paginate(
             model=UserSettingEntity,
             query=query,
@@ -80,7 +78,7 @@ def get_user_settings_by_filter(
 )
 def create_user_setting(
     setting_data: UserSettingCreateRequest,
-    current_user: UserEntity = Depends(AuthenticateUserEntityRequired()),
+    current_user: Principal = Depends(AuthenticatePrincipalRequired()),
 ) -> Any:
     try:
         setting_dict = setting_data.model_dump()
@@ -98,12 +96,10 @@ def create_user_setting(
 )
 def get_user_setting_by_id(
     setting_id: int,
-    current_user: UserEntity = Depends(AuthenticateUserEntityRequired()),
+    current_user: Principal = Depends(AuthenticatePrincipalRequired()),
 ) -> Any:
     try:
-        setting = user_setting_service.get_by_id(setting_id)
-        if setting.user_id != current_user.user_id:
-            raise CustomException(exception=ExceptionType.FORBIDDEN)
+        setting = user_setting_service.get_by_id(setting_id, owner_id=current_user.user_id)
         return DataResponse(http_code=status.HTTP_200_OK, data=setting)
     except Exception as e:
         raise CustomException(exception=e)
@@ -117,13 +113,12 @@ def get_user_setting_by_id(
 def update_user_setting_by_id(
     setting_id: int,
     setting_data: UserSettingUpdateRequest,
-    current_user: UserEntity = Depends(AuthenticateUserEntityRequired()),
+    current_user: Principal = Depends(AuthenticatePrincipalRequired()),
 ) -> Any:
     try:
-        setting = user_setting_service.get_by_id(setting_id)
-        if setting.user_id != current_user.user_id:
-            raise CustomException(exception=ExceptionType.FORBIDDEN)
-        updated_setting = user_setting_service.update_by_id(setting_id, data=setting_data.model_dump(exclude_unset=True))
+        updated_setting = user_setting_service.update_by_id(
+            setting_id, data=setting_data.model_dump(exclude_unset=True), owner_id=current_user.user_id
+        )
         return DataResponse(http_code=status.HTTP_200_OK, data=updated_setting)
     except Exception as e:
         raise CustomException(exception=e)
@@ -137,13 +132,12 @@ def update_user_setting_by_id(
 def partial_update_user_setting_by_id(
     setting_id: int,
     setting_data: UserSettingUpdateRequest,
-    current_user: UserEntity = Depends(AuthenticateUserEntityRequired()),
+    current_user: Principal = Depends(AuthenticatePrincipalRequired()),
 ) -> Any:
     try:
-        setting = user_setting_service.get_by_id(setting_id)
-        if setting.user_id != current_user.user_id:
-            raise CustomException(exception=ExceptionType.FORBIDDEN)
-        updated_setting = user_setting_service.partial_update_by_id(setting_id, data=setting_data.model_dump(exclude_unset=True))
+        updated_setting = user_setting_service.partial_update_by_id(
+            setting_id, data=setting_data.model_dump(exclude_unset=True), owner_id=current_user.user_id
+        )
         return DataResponse(http_code=status.HTTP_200_OK, data=updated_setting)
     except Exception as e:
         raise CustomException(exception=e)
@@ -155,13 +149,10 @@ def partial_update_user_setting_by_id(
 )
 def delete_user_setting_by_id(
     setting_id: int,
-    current_user: UserEntity = Depends(AuthenticateUserEntityRequired()),
+    current_user: Principal = Depends(AuthenticatePrincipalRequired()),
 ) -> None:
     try:
-        setting = user_setting_service.get_by_id(setting_id)
-        if setting.user_id != current_user.user_id:
-            raise CustomException(exception=ExceptionType.FORBIDDEN)
-        user_setting_service.delete_by_id(setting_id)
+        user_setting_service.delete_by_id(setting_id, owner_id=current_user.user_id)
     except Exception as e:
         raise CustomException(exception=e)
 
@@ -174,7 +165,7 @@ def delete_user_setting_by_id(
     status_code=status.HTTP_200_OK,
 )
 def get_all_default_settings(
-    current_user: UserEntity = Depends(AuthenticateUserEntityRequired()),
+    current_user: Principal = Depends(AuthenticatePrincipalRequired()),
 ) -> Any:
     try:
         data, metadata = default_setting_service.get_all()
@@ -191,7 +182,7 @@ def get_all_default_settings(
 def get_default_settings_by_filter(
     sort_params: SortParams = Depends(),
     pagination_params: PaginationParams = Depends(),
-    current_user: UserEntity = Depends(AuthenticateUserEntityRequired()),
+    current_user: Principal = Depends(AuthenticatePrincipalRequired()),
 ) -> Any:
     try:
         data, metadata = default_setting_service.get_by_filter(
@@ -209,7 +200,7 @@ def get_default_settings_by_filter(
 )
 def create_default_setting(
     setting_data: DefaultSettingCreateRequest,
-    current_user: UserEntity = Depends(AuthenticateUserEntityRequired()),
+    current_user: Principal = Depends(AuthenticatePrincipalRequired()),
 ) -> Any:
     try:
         new_setting = default_setting_service.create(data=setting_data.model_dump())
@@ -225,7 +216,7 @@ def create_default_setting(
 )
 def get_default_setting_by_id(
     default_setting_id: int,
-    current_user: UserEntity = Depends(AuthenticateUserEntityRequired()),
+    current_user: Principal = Depends(AuthenticatePrincipalRequired()),
 ) -> Any:
     try:
         setting = default_setting_service.get_by_id(default_setting_id)
@@ -242,7 +233,7 @@ def get_default_setting_by_id(
 def update_default_setting_by_id(
     default_setting_id: int,
     setting_data: DefaultSettingUpdateRequest,
-    current_user: UserEntity = Depends(AuthenticateUserEntityRequired()),
+    current_user: Principal = Depends(AuthenticatePrincipalRequired()),
 ) -> Any:
     try:
         updated_setting = default_setting_service.update_by_id(
@@ -261,7 +252,7 @@ def update_default_setting_by_id(
 def partial_update_default_setting_by_id(
     default_setting_id: int,
     setting_data: DefaultSettingUpdateRequest,
-    current_user: UserEntity = Depends(AuthenticateUserEntityRequired()),
+    current_user: Principal = Depends(AuthenticatePrincipalRequired()),
 ) -> Any:
     try:
         updated_setting = default_setting_service.partial_update_by_id(
@@ -278,7 +269,7 @@ def partial_update_default_setting_by_id(
 )
 def delete_default_setting_by_id(
     default_setting_id: int,
-    current_user: UserEntity = Depends(AuthenticateUserEntityRequired()),
+    current_user: Principal = Depends(AuthenticatePrincipalRequired()),
 ) -> None:
     try:
         default_setting_service.delete_by_id(default_setting_id)
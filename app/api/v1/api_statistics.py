@@ -12,8 +12,11 @@ from app.schemas.sche_statistics import (
     StreakRecordBaseResponse,
     DailyStatisticsResponse,
     MonthlyStatisticsResponse,
+    RangeStatisticsResponse,
+    StatisticsBucket,
 )
-from app.services.srv_statistics import StatisticsCacheService, StreakRecordService
+from app.services.srv_statistics import StatisticsCacheService, StreakRecordService, UserStreakService
+from app.services.srv_rollup import ActivityRollupService
 from app.utils.login_manager import AuthenticateUserEntityRequired
 from app.models.model_user_entity import UserEntity
 from pydantic import BaseModel, Field
@@ -245,6 +248,60 @@ def get_monthly_statistics(
         raise CustomException(exception=e)
 
 
+@router.get(
+    "/range",
+    response_model=DataResponse[RangeStatisticsResponse],
+    status_code=status.HTTP_200_OK,
+)
+def get_range_statistics(
+    start_date: float = Query(..., description="Timestamp ngày bắt đầu (Unix timestamp - float)"),
+    end_date: float = Query(..., description="Timestamp ngày kết thúc (Unix timestamp - float)"),
+    bucket: StatisticsBucket = Query(StatisticsBucket.DAY, description="Gom theo day, week hoặc month"),
+    current_user: UserEntity = Depends(AuthenticateUserEntityRequired()),
+) -> Any:
+    """
+    Lấy chuỗi statistics theo ngày/tuần/tháng trong một khoảng thời gian (một query), kể cả bucket rỗng
+    """
+    try:
+        stats = StatisticsCacheService.get_range_statistics(
+            user_id=current_user.user_id,
+            start_date=start_date,
+            end_date=end_date,
+            bucket=bucket.value
+        )
+        return DataResponse(
+            http_code=status.HTTP_200_OK,
+            data=RangeStatisticsResponse(**stats)
+        )
+    except Exception as e:
+        raise CustomException(exception=e)
+
+
+@router.post(
+    "/rollup/rebuild",
+    response_model=DataResponse[dict],
+    status_code=status.HTTP_200_OK,
+)
+def rebuild_activity_rollup(
+    current_user: UserEntity = Depends(AuthenticateUserEntityRequired()),
+) -> Any:
+    """
+    Tính lại bảng tổng hợp hoạt động theo ngày (user_daily_activity) của user từ sessions, tasks, goals
+    """
+    try:
+        rows = ActivityRollupService.rebuild(user_id=current_user.user_id)
+        StatisticsCacheService.invalidate_user(current_user.user_id)
+        return DataResponse(
+            http_code=status.HTTP_200_OK,
+            data={
+                "message": f"Đã rebuild {rows} ngày hoạt động",
+                "rows": rows,
+            }
+        )
+    except Exception as e:
+        raise CustomException(exception=e)
+
+
 # Streak endpoints - Summary và Current Streak
 class StreakSummaryResponse(BaseModel):
     """Response cho streak summary của user"""
@@ -263,83 +320,14 @@ def get_streak_summary(
 ) -> Any:
     """
     Lấy thông tin streak summary của user (current_streak, best_streak, total_active_days)
-    Tính toán trực tiếp từ streak_records
+    Đọc một row từ user_streaks (được cập nhật khi streak_records thay đổi)
     """
     try:
-        from fastapi_sqlalchemy import db
-        from app.models.model_statistics import StreakRecordEntity
-        from datetime import datetime, timezone, timedelta
-        
-        # Lấy tất cả streak records có activity, sắp xếp theo ngày giảm dần
-        all_records = db.session.query(StreakRecordEntity).filter(
-            StreakRecordEntity.user_id == current_user.user_id,
-            StreakRecordEntity.has_activity == 1
-        ).order_by(StreakRecordEntity.streak_date.desc()).all()
-        
-        total_active_days = len(all_records)
-        
-        if not all_records:
-            return DataResponse(
-                http_code=status.HTTP_200_OK,
-                data=StreakSummaryResponse(
-                    current_streak=0,
-                    best_streak=0,
-                    total_active_days=0
-                )
-            )
-        
-        # Tính current_streak: Đếm số ngày liên tiếp từ hôm nay về trước
-        current_streak = 0
-        today = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
-        
-        # Tạo dict để lookup nhanh: date_timestamp -> True
-        active_dates = {}
-        for record in all_records:
-            record_date = datetime.fromtimestamp(record.streak_date, tz=timezone.utc).replace(
-                hour=0, minute=0, second=0, microsecond=0
-            )
-            active_dates[record_date.timestamp()] = True
-        
-        # Kiểm tra từ hôm nay về trước, đếm số ngày liên tiếp có activity
-        check_date = today
-        while check_date.timestamp() in active_dates:
-            current_streak += 1
-            check_date = check_date - timedelta(days=1)
-        
-        # Tính best_streak: Tìm chuỗi ngày dài nhất
-        best_streak = 0
-        if all_records:
-            # Sắp xếp lại theo ngày tăng dần để tính best streak
-            sorted_records = sorted(all_records, key=lambda x: x.streak_date)
-            
-            current_sequence = 1
-            best_sequence = 1
-            
-            for i in range(1, len(sorted_records)):
-                prev_date = datetime.fromtimestamp(sorted_records[i-1].streak_date, tz=timezone.utc).replace(
-                    hour=0, minute=0, second=0, microsecond=0
-                )
-                curr_date = datetime.fromtimestamp(sorted_records[i].streak_date, tz=timezone.utc).replace(
-                    hour=0, minute=0, second=0, microsecond=0
-                )
-                
-                # Kiểm tra xem có liên tiếp không (chênh lệch 1 ngày)
-                days_diff = (curr_date - prev_date).days
-                
-                if days_diff == 1:
-                    # Liên tiếp
-                    current_sequence += 1
-                    best_sequence = max(best_sequence, current_sequence)
-                else:
-                    # Không liên tiếp, reset sequence
-                    current_sequence = 1
-            
-            best_streak = best_sequence
-        
+        state = UserStreakService.get_states([current_user.user_id])[current_user.user_id]
         summary = StreakSummaryResponse(
-            current_streak=current_streak,
-            best_streak=best_streak,
-            total_active_days=total_active_days
+            current_streak=state["current_streak"],
+            best_streak=state["best_streak"],
+            total_active_days=state["total_active_days"]
         )
         
         return DataResponse(http_code=status.HTTP_200_OK, data=summary)
@@ -347,6 +335,28 @@ def get_streak_summary(
         return CustomException(exception=e)
 
 
+@router.post(
+    "/streak/rebuild",
+    response_model=DataResponse[StreakSummaryResponse],
+    status_code=status.HTTP_200_OK,
+)
+def rebuild_streak_state(
+    current_user: UserEntity = Depends(AuthenticateUserEntityRequired()),
+) -> Any:
+    """
+    Tính lại streak state (user_streaks) của user từ toàn bộ streak_records
+    """
+    try:
+        UserStreakService.rebuild(user_id=current_user.user_id)
+        state = UserStreakService.get_states([current_user.user_id])[current_user.user_id]
+        return DataResponse(
+            http_code=status.HTTP_200_OK,
+            data=StreakSummaryResponse(**state)
+        )
+    except Exception as e:
+        raise CustomException(exception=e)
+
+
 @router.get(
     "/streak/current",
     response_model=DataResponse[StatisticsCacheBaseResponse],
@@ -446,51 +456,17 @@ def create_streak_record(
     current_user: UserEntity = Depends(AuthenticateUserEntityRequired()),
 ) -> Any:
     """
-    Tạo hoặc cập nhật streak record cho một ngày (upsert)
-    So sánh theo ngày, không phải timestamp chính xác
+    Tạo hoặc cập nhật streak record cho một ngày (upsert theo user_id + streak_day)
+    Nếu ngày đã có record thì cộng dồn session_count/focus_time
     """
     try:
-        from fastapi_sqlalchemy import db
-        from app.models.model_statistics import StreakRecordEntity
-        from sqlalchemy import and_, func
-        from datetime import datetime, timezone, timedelta
-        
-        # Add user_id from JWT token
-        streak_dict = streak_data.model_dump()
-        streak_dict["user_id"] = current_user.user_id
-        
-        # Normalize streak_date về 00:00:00 của ngày đó để so sánh
-        input_date = datetime.fromtimestamp(streak_dict["streak_date"], tz=timezone.utc)
-        normalized_date = input_date.replace(hour=0, minute=0, second=0, microsecond=0)
-        normalized_timestamp = normalized_date.timestamp()
-        
-        # Tính khoảng thời gian của ngày (từ 00:00:00 đến 23:59:59)
-        start_of_day = normalized_timestamp
-        end_of_day = (normalized_date + timedelta(days=1) - timedelta(seconds=1)).timestamp()
-        
-        # Tìm record trong cùng ngày (bất kỳ timestamp nào trong ngày đó)
-        existing = db.session.query(StreakRecordEntity).filter(
-            and_(
-                StreakRecordEntity.user_id == current_user.user_id,
-                StreakRecordEntity.streak_date >= start_of_day,
-                StreakRecordEntity.streak_date <= end_of_day
-            )
-        ).first()
-        
-        # Cập nhật streak_date về normalized timestamp để đảm bảo consistency
-        streak_dict["streak_date"] = normalized_timestamp
-        
-        if existing:
-            # Nếu đã có thì update
-            updated_streak = streak_record_service.update_by_id(
-                existing.streak_id, 
-                data=streak_dict
-            )
-            return DataResponse(http_code=status.HTTP_200_OK, data=updated_streak)
-        else:
-            # Nếu chưa có thì tạo mới
-            new_streak = streak_record_service.create(data=streak_dict)
-            return DataResponse(http_code=status.HTTP_201_CREATED, data=new_streak)
+        record, created = streak_record_service.upsert_day(
+            current_user.user_id,
+            streak_data.model_dump()
+        )
+        if created:
+            return DataResponse(http_code=status.HTTP_201_CREATED, data=record)
+        return DataResponse(http_code=status.HTTP_200_OK, data=record)
     except Exception as e:
         raise CustomException(exception=e)
 
@@ -510,24 +486,11 @@ def get_streak_record_by_date(
     try:
         from fastapi_sqlalchemy import db
         from app.models.model_statistics import StreakRecordEntity
-        from sqlalchemy import and_
-        from datetime import datetime, timezone, timedelta
-        
-        # Normalize date về 00:00:00 của ngày đó
-        input_date = datetime.fromtimestamp(date, tz=timezone.utc)
-        normalized_date = input_date.replace(hour=0, minute=0, second=0, microsecond=0)
-        normalized_timestamp = normalized_date.timestamp()
-        
-        # Tính khoảng thời gian của ngày
-        start_of_day = normalized_timestamp
-        end_of_day = (normalized_date + timedelta(days=1) - timedelta(seconds=1)).timestamp()
+        from app.utils import time_utils
         
         streak = db.session.query(StreakRecordEntity).filter(
-            and_(
-                StreakRecordEntity.user_id == current_user.user_id,
-                StreakRecordEntity.streak_date >= start_of_day,
-                StreakRecordEntity.streak_date <= end_of_day
-            )
+            StreakRecordEntity.user_id == current_user.user_id,
+            StreakRecordEntity.streak_day == time_utils.local_day_key(date, current_user.timezone)
         ).first()
         
         if not streak:
@@ -620,88 +583,3 @@ def delete_streak_record_by_id(
     except Exception as e:
         raise CustomException(exception=e)
 
-
-@router.post(
-    "/streak/cleanup-duplicates",
-    response_model=DataResponse[dict],
-    status_code=status.HTTP_200_OK,
-)
-def cleanup_duplicate_streak_records(
-    current_user: UserEntity = Depends(AuthenticateUserEntityRequired()),
-) -> Any:
-    """
-    Cleanup duplicate streak records - merge các records trong cùng một ngày thành 1 record
-    Giữ lại record có streak_id lớn nhất (mới nhất) và merge dữ liệu
-    """
-    try:
-        from fastapi_sqlalchemy import db
-        from app.models.model_statistics import StreakRecordEntity
-        from datetime import datetime, timezone, timedelta
-        from sqlalchemy import and_
-        
-        # Lấy tất cả records của user
-        all_records = db.session.query(StreakRecordEntity).filter(
-            StreakRecordEntity.user_id == current_user.user_id
-        ).order_by(StreakRecordEntity.streak_date.desc()).all()
-        
-        # Group records theo ngày
-        records_by_date = {}
-        for record in all_records:
-            record_date = datetime.fromtimestamp(record.streak_date, tz=timezone.utc)
-            normalized_date = record_date.replace(hour=0, minute=0, second=0, microsecond=0)
-            date_key = normalized_date.timestamp()
-            
-            if date_key not in records_by_date:
-                records_by_date[date_key] = []
-            records_by_date[date_key].append(record)
-        
-        deleted_count = 0
-        merged_count = 0
-        
-        # Xử lý từng nhóm
-        for date_key, records in records_by_date.items():
-            if len(records) > 1:
-                # Có duplicates, merge lại
-                # Sắp xếp theo streak_id giảm dần (mới nhất trước)
-                records.sort(key=lambda x: x.streak_id, reverse=True)
-                
-                # Record đầu tiên (mới nhất) sẽ được giữ lại và merge dữ liệu
-                keep_record = records[0]
-                
-                # Merge dữ liệu từ các records khác
-                total_session_count = 0
-                total_focus_time = 0
-                has_any_activity = 0
-                
-                for record in records:
-                    total_session_count += record.session_count or 0
-                    total_focus_time += record.focus_time or 0
-                    if record.has_activity == 1:
-                        has_any_activity = 1
-                
-                # Cập nhật record được giữ lại
-                keep_record.streak_date = date_key  # Normalize về 00:00:00
-                keep_record.session_count = total_session_count
-                keep_record.focus_time = total_focus_time
-                keep_record.has_activity = has_any_activity
-                
-                # Xóa các records còn lại
-                for record in records[1:]:
-                    db.session.delete(record)
-                    deleted_count += 1
-                
-                merged_count += 1
-        
-        db.session.commit()
-        
-        return DataResponse(
-            http_code=status.HTTP_200_OK,
-            data={
-                "message": f"Đã cleanup {merged_count} nhóm duplicate, xóa {deleted_count} records",
-                "merged_groups": merged_count,
-                "deleted_records": deleted_count
-            }
-        )
-    except Exception as e:
-        db.session.rollback()
-        return CustomException(exception=e)
@@ -0,0 +1,30 @@
+from typing import Any, Optional
+from fastapi import APIRouter, Depends, Query, status
+from app.utils.exception_handler import CustomException
+from app.schemas.sche_response import DataResponse
+from app.schemas.sche_sync import DeltaSyncResponse
+from app.services.srv_sync import SyncService, DEFAULT_SYNC_LIMIT, MAX_SYNC_LIMIT
+from app.utils.login_manager import AuthenticateUserEntityRequired
+from app.models.model_user_entity import UserEntity
+
+router = APIRouter(prefix=f"/sync")
+
+
+@router.get(
+    "/changes",
+    response_model=DataResponse[DeltaSyncResponse],
+    status_code=status.HTTP_200_OK,
+)
+def get_changes(
+    cursor: Optional[str] = Query(None, description="Cursor từ lần sync trước; bỏ trống để lấy toàn bộ dữ liệu"),
+    limit: int = Query(DEFAULT_SYNC_LIMIT, ge=1, le=MAX_SYNC_LIMIT, description="Số rows tối đa mỗi loại entity"),
+    current_user: UserEntity = Depends(AuthenticateUserEntityRequired())
+) -> Any:
+    """
+    Lấy các thay đổi (tạo/sửa/xoá) của user kể từ cursor. Lặp lại khi has_more = true.
+    """
+    try:
+        data = SyncService.get_changes(current_user.user_id, cursor, limit)
+        return DataResponse(http_code=status.HTTP_200_OK, data=data)
+    except Exception as e:
+        raise CustomException(exception=e)
@@ -1,7 +1,6 @@
 from typing import Any, List, Optional
 from fastapi import APIRouter, Depends, status, Query
-from datetime import datetime, timedelta, timezone
-from app.utils.exception_handler import CustomException, ExceptionType
+from app.utils.exception_handler import CustomException
 from app.schemas.sche_response import DataResponse
 from app.schemas.sche_base import PaginationParams, SortParams
 from app.schemas.sche_task import (
@@ -13,8 +12,10 @@ from app.schemas.sche_task import (
     TaskSessionBaseResponse,
 )
 from app.services.srv_task import TaskService, TaskSessionService
-from app.utils.login_manager import AuthenticateUserEntityRequired
-from app.models.model_user_entity import UserEntity
+from app.services.srv_user_timezone import UserTimezoneService
+from app.core.security import Principal
+from app.utils.login_manager import AuthenticatePrincipalRequired
+from app.utils import time_utils
 
 router = APIRouter(prefix=f"/tasks")
 
@@ -33,7 +34,7 @@ def get_all(
     date: Optional[float] = Query(None, description="Timestamp của ngày cần lọc (nếu không có sẽ dùng ngày hiện tại, chỉ dùng khi có filter_type)"),
     sort_params: SortParams = Depends(),
     pagination_params: PaginationParams = Depends(),
-    current_user: UserEntity = Depends(AuthenticateUserEntityRequired()),
+    current_user: Principal = Depends(AuthenticatePrincipalRequired()),
 ) -> Any:
     """
     Lấy danh sách tất cả tasks với các tùy chọn:
@@ -41,12 +42,10 @@ def get_all(
     - Lọc theo ngày/tuần/tháng (nếu có filter_type)
     """
     try:
-        from fastapi_sqlalchemy import db
         from app.models.model_task import TaskEntity
         from app.utils.paging import paginate
         
-        # Filter by user_id
-        query = db.session.query(TaskEntity).filter(TaskEntity.user_id == current_user.user_id)
+        query = task_service.owned_query(current_user.user_id)
         
         # Nếu có filter_type thì áp dụng date filter
         if filter_type:
@@ -57,43 +56,21 @@ def get_all(
                     message="filter_type phải là 'day', 'week', hoặc 'month'"
                 )
             
-            # Xác định ngày cần lọc
+            # Xác định ngày cần lọc theo timezone của user
+            timezone = UserTimezoneService.get_timezone(current_user.user_id)
             if date is None:
                 # Dùng ngày hiện tại
-                target_date = datetime.now(timezone.utc)
+                target_day = time_utils.local_today(timezone)
             else:
-                target_date = datetime.fromtimestamp(date, tz=timezone.utc)
+                target_day = time_utils.local_day_key(date, timezone)
             
-            # Tính toán khoảng thời gian dựa trên filter_type
+            # Lọc theo key ngày/tuần (thứ 2 - chủ nhật)/tháng đã tính sẵn khi ghi task (có index theo user_id)
             if filter_type == 'day':
-                # Lọc theo ngày: từ 00:00:00 đến 23:59:59 của ngày đó
-                start_datetime = target_date.replace(hour=0, minute=0, second=0, microsecond=0)
-                end_datetime = target_date.replace(hour=23, minute=59, second=59, microsecond=999999)
+                query = query.filter(TaskEntity.local_day == target_day)
             elif filter_type == 'week':
-                # Lọc theo tuần: từ thứ 2 đến chủ nhật của tuần chứa ngày đó
-                # Tìm thứ 2 của tuần (Monday = 0)
-                days_since_monday = target_date.weekday()
-                start_datetime = (target_date - timedelta(days=days_since_monday)).replace(hour=0, minute=0, second=0, microsecond=0)
-                end_datetime = (start_datetime + timedelta(days=6)).replace(hour=23, minute=59, second=59, microsecond=999999)
+                query = query.filter(TaskEntity.local_week == time_utils.week_key(target_day))
             else:  # month
-                # Lọc theo tháng: từ ngày 1 đến ngày cuối cùng của tháng
-                start_datetime = target_date.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-                # Tìm ngày cuối cùng của tháng
-                if target_date.month == 12:
-                    next_month = start_datetime.replace(year=target_date.year + 1, month=1)
-                else:
-                    next_month = start_datetime.replace(month=target_date.month + 1)
-                end_datetime = (next_month - timedelta(days=1)).replace(hour=23, minute=59, second=59, microsecond=999999)
-            
-            # Chuyển đổi sang timestamp
-            start_timestamp = start_datetime.timestamp()
-            end_timestamp = end_datetime.timestamp()
-            
-            # Thêm filter theo khoảng thời gian
-            query = query.filter(
-                TaskEntity.task_date >= start_timestamp,
-                TaskEntity.task_date <= end_timestamp
-            )
+                query = query.filter(TaskEntity.local_month == time_utils.month_key(target_day))
         
         data, metadata = paginate(
             model=TaskEntity,
@@ -114,7 +91,7 @@ def get_all(
 )
 def create(
     task_data: TaskCreateRequest,
-    current_user: UserEntity = Depends(AuthenticateUserEntityRequired()),
+    current_user: Principal = Depends(AuthenticatePrincipalRequired()),
 ) -> Any:
     try:
         # Add user_id from JWT token
@@ -133,13 +110,10 @@ def create(
 )
 def get_by_id(
     task_id: int,
-    current_user: UserEntity = Depends(AuthenticateUserEntityRequired()),
+    current_user: Principal = Depends(AuthenticatePrincipalRequired()),
 ) -> Any:
     try:
-        task = task_service.get_by_id(task_id)
-        # Verify task belongs to current user
-        if task.user_id != current_user.user_id:
-            raise CustomException(exception=ExceptionType.FORBIDDEN)
+        task = task_service.get_by_id(task_id, owner_id=current_user.user_id)
         return DataResponse(http_code=status.HTTP_200_OK, data=task)
     except Exception as e:
         raise CustomException(exception=e)
@@ -153,14 +127,12 @@ def get_by_id(
 def update_by_id(
     task_id: int,
     task_data: TaskUpdateRequest,
-    current_user: UserEntity = Depends(AuthenticateUserEntityRequired()),
+    current_user: Principal = Depends(AuthenticatePrincipalRequired()),
 ) -> Any:
     try:
-        task = task_service.get_by_id(task_id)
-        # Verify task belongs to current user
-        if task.user_id != current_user.user_id:
-            raise CustomException(exception=ExceptionType.FORBIDDEN)
-        updated_task = task_service.update_by_id(task_id, data=task_data.model_dump(exclude_unset=True))
+        updated_task = task_service.update_by_id(
+            task_id, data=task_data.model_dump(exclude_unset=True), owner_id=current_user.user_id
+        )
         return DataResponse(http_code=status.HTTP_200_OK, data=updated_task)
     except Exception as e:
         raise CustomException(exception=e)
@@ -174,14 +146,12 @@ def update_by_id(
 def partial_update_by_id(
     task_id: int,
     task_data: TaskUpdateRequest,
-    current_user: UserEntity = Depends(AuthenticateUserEntityRequired()),
+    current_user: Principal = Depends(AuthenticatePrincipalRequired()),
 ) -> Any:
     try:
-        task = task_service.get_by_id(task_id)
-        # Verify task belongs to current user
-        if task.user_id != current_user.user_id:
-            raise CustomException(exception=ExceptionType.FORBIDDEN)
-        updated_task = task_service.partial_update_by_id(task_id, data=task_data.model_dump(exclude_unset=True))
+        updated_task = task_service.partial_update_by_id(
+            task_id, data=task_data.model_dump(exclude_unset=True), owner_id=current_user.user_id
+        )
         return DataResponse(http_code=status.HTTP_200_OK, data=updated_task)
     except Exception as e:
         raise CustomException(exception=e)
@@ -193,14 +163,10 @@ def partial_update_by_id(
 )
 def delete_by_id(
     task_id: int,
-    current_user: UserEntity = Depends(AuthenticateUserEntityRequired()),
+    current_user: Principal = Depends(AuthenticatePrincipalRequired()),
 ) -> None:
     try:
-        task = task_service.get_by_id(task_id)
-        # Verify task belongs to current user
-        if task.user_id != current_user.user_id:
-            raise CustomException(exception=ExceptionType.FORBIDDEN)
-        task_service.delete_by_id(task_id)
+        task_service.delete_by_id(task_id, owner_id=current_user.user_id)
     except Exception as e:
         raise CustomException(exception=e)
 
@@ -212,17 +178,14 @@ def delete_by_id(
     status_code=status.HTTP_200_OK,
 )
 def get_all_task_sessions(
-    current_user: UserEntity = Depends(AuthenticateUserEntityRequired()),
+    current_user: Principal = Depends(AuthenticatePrincipalRequired()),
 ) -> Any:
     try:
-        from fastapi_sqlalchemy import db
-        from app.models.model_task import TaskSessionEntity, TaskEntity
+        from app.models.model_task import TaskSessionEntity
         from app.utils.paging import paginate
         from app.schemas.sche_base import SortParams
         # Filter by user_id through task
-        query = db.session.query(TaskSessionEntity).join(
-            TaskEntity, TaskSessionEntity.task_id == TaskEntity.task_id
-        ).filter(TaskEntity.user_id == current_user.user_id)
+        query = task_session_service.owned_query(current_user.user_id)
         data, metadata = paginate(
             model=TaskSessionEntity,
             query=query,
@@ -242,16 +205,13 @@ def get_all_task_sessions(
 def get_task_sessions_by_filter(
     sort_params: SortParams = Depends(),
     pagination_params: PaginationParams = Depends(),
-    current_user: UserEntity = Depends(AuthenticateUserEntityRequired()),
+    current_user: Principal = Depends(AuthenticatePrincipalRequired()),
 ) -> Any:
     try:
-        from fastapi_sqlalchemy import db
-        from app.models.model_task import TaskSessionEntity, TaskEntity
+        from app.models.model_task import TaskSessionEntity
         from app.utils.paging import paginate
         # Filter by user_id through task
-        query = db.session.query(TaskSessionEntity).join(
-            TaskEntity, TaskSessionEntity.task_id == TaskEntity.task_id
-        ).filter(TaskEntity.user_id == current_user.user_id)
+        query = task_session_service.owned_query(current_user.user_id)
         data, metadata = paginate(
             model=TaskSessionEntity,
             query=query,
@@ -270,20 +230,11 @@ def get_task_sessions_by_filter(
 )
 def create_task_session(
     task_session_data: TaskSessionCreateRequest,
-    current_user: UserEntity = Depends(AuthenticateUserEntityRequired()),
+    current_user: Principal = Depends(AuthenticatePrincipalRequired()),
 ) -> Any:
     try:
-        from fastapi_sqlalchemy import db
-        from app.models.model_task import TaskEntity
-        # Verify task belongs to current user
-        task = db.session.query(TaskEntity).filter(
-            TaskEntity.task_id == task_session_data.task_id
-        ).first()
-        if not task:
-            raise CustomException(exception=ExceptionType.NOT_FOUND)
-        if task.user_id != current_user.user_id:
-            raise CustomException(exception=ExceptionType.FORBIDDEN)
-        new_task_session = task_session_service.create(data=task_session_data.model_dump())
+        # Task phải thuộc current user
+        new_task_session = task_session_service.create_owned(task_session_data.model_dump(), current_user.user_id)
         return DataResponse(http_code=status.HTTP_201_CREATED, data=new_task_session)
     except Exception as e:
         raise CustomException(exception=e)
@@ -296,18 +247,10 @@ def create_task_session(
 )
 def get_task_session_by_id(
     task_session_id: int,
-    current_user: UserEntity = Depends(AuthenticateUserEntityRequired()),
+    current_user: Principal = Depends(AuthenticatePrincipalRequired()),
 ) -> Any:
     try:
-        from fastapi_sqlalchemy import db
-        from app.models.model_task import TaskEntity
-        task_session = task_session_service.get_by_id(task_session_id)
-        # Verify task belongs to current user
-        task = db.session.query(TaskEntity).filter(
-            TaskEntity.task_id == task_session.task_id
-        ).first()
-        if task.user_id != current_user.user_id:
-            raise CustomException(exception=ExceptionType.FORBIDDEN)
+        task_session = task_session_service.get_by_id(task_session_id, owner_id=current_user.user_id)
         return DataResponse(http_code=status.HTTP_200_OK, data=task_session)
     except Exception as e:
         raise CustomException(exception=e)
@@ -321,20 +264,11 @@ def get_task_session_by_id(
 def update_task_session_by_id(
     task_session_id: int,
     task_session_data: TaskSessionUpdateRequest,
-    current_user: UserEntity = Depends(AuthenticateUserEntityRequired()),
+    current_user: Principal = Depends(AuthenticatePrincipalRequired()),
 ) -> Any:
     try:
-        from fastapi_sqlalchemy import db
-        from app.models.model_task import TaskEntity
-        task_session = task_session_service.get_by_id(task_session_id)
-        # Verify task belongs to current user
-        task = db.session.query(TaskEntity).filter(
-            TaskEntity.task_id == task_session.task_id
-        ).first()
-        if task.user_id != current_user.user_id:
-            raise CustomException(exception=ExceptionType.FORBIDDEN)
         updated_task_session = task_session_service.update_by_id(
-            task_session_id, data=task_session_data.model_dump(exclude_unset=True)
+            task_session_id, data=task_session_data.model_dump(exclude_unset=True), owner_id=current_user.user_id
         )
         return DataResponse(http_code=status.HTTP_200_OK, data=updated_task_session)
     except Exception as e:
@@ -349,20 +283,11 @@ def update_task_session_by_id(
 def partial_update_task_session_by_id(
     task_session_id: int,
     task_session_data: TaskSessionUpdateRequest,
-    current_user: UserEntity = Depends(AuthenticateUserEntityRequired()),
+    current_user: Principal = Depends(AuthenticatePrincipalRequired()),
 ) -> Any:
     try:
-        from fastapi_sqlalchemy import db
-        from app.models.model_task import TaskEntity
-        task_session = task_session_service.get_by_id(task_session_id)
-        # Verify task belongs to current user
-        task = db.session.query(TaskEntity).filter(
-            TaskEntity.task_id == task_session.task_id
-        ).first()
-        if task.user_id != current_user.user_id:
-            raise CustomException(exception=ExceptionType.FORBIDDEN)
         updated_task_session = task_session_service.partial_update_by_id(
-            task_session_id, data=task_session_data.model_dump(exclude_unset=True)
+            task_session_id, data=task_session_data.model_dump(exclude_unset=True), owner_id=current_user.user_id
         )
         return DataResponse(http_code=status.HTTP_200_OK, data=updated_task_session)
     except Exception as e:
@@ -375,19 +300,10 @@ def partial_update_task_session_by_id(
 )
 def delete_task_session_by_id(
     task_session_id: int,
-    current_user: UserEntity = Depends(AuthenticateUserEntityRequired()),
+    current_user: Principal = Depends(AuthenticatePrincipalRequired()),
 ) -> None:
     try:
-        from fastapi_sqlalchemy import db
-        from app.models.model_task import TaskEntity
-        task_session = task_session_service.get_by_id(task_session_id)
-        # Verify task belongs to current user
-        task = db.session.query(TaskEntity).filter(
-            TaskEntity.task_id == task_session.task_id
-        ).first()
-        if task.user_id != current_user.user_id:
-            raise CustomException(exception=ExceptionType.FORBIDDEN)
-        task_session_service.delete_by_id(task_session_id)
+        task_session_service.delete_by_id(task_session_id, owner_id=current_user.user_id)
     except Exception as e:
         raise CustomException(exception=e)
 
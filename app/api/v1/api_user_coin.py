@@ -8,8 +8,8 @@ from app.schemas.sche_user_coin import (
     UserCoinBaseResponse,
 )
 from app.services.srv_user_coin import UserCoinService
-from app.utils.login_manager import AuthenticateUserEntityRequired
-from app.models.model_user_entity import UserEntity
+from app.core.security import Principal
+from app.utils.login_manager import AuthenticatePrincipalRequired
 
 router = APIRouter(prefix="/user-coin")
 
@@ -22,7 +22,7 @@ user_coin_service: UserCoinService = UserCoinService()
     status_code=status.HTTP_200_OK,
 )
 def get_my_coin(
-    current_user: UserEntity = Depends(AuthenticateUserEntityRequired()),
+    current_user: Principal = Depends(AuthenticatePrincipalRequired()),
 ) -> Any:
     """
     Lấy coin của user hiện tại (tự động tạo nếu chưa có)
@@ -42,7 +42,7 @@ def get_my_coin(
 )
 def create_coin(
     coin_data: UserCoinCreateRequest,
-    current_user: UserEntity = Depends(AuthenticateUserEntityRequired()),
+    current_user: Principal = Depends(AuthenticatePrincipalRequired()),
 ) -> Any:
     """
     Tạo coin record mới cho user (nếu chưa có)
@@ -76,7 +76,7 @@ def create_coin(
 )
 def update_coin(
     coin_data: UserCoinUpdateRequest,
-    current_user: UserEntity = Depends(AuthenticateUserEntityRequired()),
+    current_user: Principal = Depends(AuthenticatePrincipalRequired()),
 ) -> Any:
     """
     Cập nhật số coin của user hiện tại
@@ -104,7 +104,7 @@ def update_coin(
 )
 def add_coin(
     amount: int = Query(..., ge=1, description="Số coin cần thêm (>= 1)"),
-    current_user: UserEntity = Depends(AuthenticateUserEntityRequired()),
+    current_user: Principal = Depends(AuthenticatePrincipalRequired()),
 ) -> Any:
     """
     Thêm coin cho user
@@ -126,7 +126,7 @@ def add_coin(
 )
 def subtract_coin(
     amount: int = Query(..., ge=1, description="Số coin cần trừ (>= 1)"),
-    current_user: UserEntity = Depends(AuthenticateUserEntityRequired()),
+    current_user: Principal = Depends(AuthenticatePrincipalRequired()),
 ) -> Any:
     """
     Trừ coin của user (kiểm tra đủ coin trước khi trừ)
@@ -23,13 +23,34 @@ class Settings(BaseSettings):
     DEBUG: bool = os.environ.get("DEBUG", "False").lower() == "true"
     KEYCLOAK_SERVER_URL: Optional[str] = os.environ.get("KEYCLOAK_SERVER_URL", None)
     KEYCLOAK_REALM: Optional[str] = os.environ.get("KEYCLOAK_REALM", None)
+    # iss của access token Keycloak khi URL public khác KEYCLOAK_SERVER_URL (mặc định: <KEYCLOAK_SERVER_URL>/realms/<KEYCLOAK_REALM>)
+    KEYCLOAK_ISSUER: Optional[str] = os.environ.get("KEYCLOAK_ISSUER", None)
     KEYCLOAK_CLIENT_ID: Optional[str] = os.environ.get("KEYCLOAK_CLIENT_ID", None)
     KEYCLOAK_CLIENT_SECRET: Optional[str] = os.environ.get("KEYCLOAK_CLIENT_SECRET", None)
     KEYCLOAK_VERIFY: Optional[bool] = os.environ.get("KEYCLOAK_VERIFY", "False").lower() == "true"
     GOOGLE_CLIENT_ID: Optional[str] = os.environ.get("GOOGLE_CLIENT_ID", None)
+    # JWKS verify Google ID token (đổi sang stub JWKS server khi test/load test)
+    GOOGLE_JWKS_URL: str = os.environ.get("GOOGLE_JWKS_URL", "https://www.googleapis.com/oauth2/v3/certs")
     FIREBASE_PROJECT_ID: Optional[str] = os.environ.get("FIREBASE_PROJECT_ID", None)
     FIREBASE_CREDENTIALS_PATH: Optional[str] = os.environ.get("FIREBASE_CREDENTIALS_PATH", None)
+    # File JSON {kid: PEM} thay cho certificates của Google khi verify Firebase ID token (test/load test offline)
+    FIREBASE_PUBLIC_KEYS_PATH: Optional[str] = os.environ.get("FIREBASE_PUBLIC_KEYS_PATH", None)
+    # Số web worker processes trên mỗi host (gunicorn/uvicorn --workers cũng đọc biến này, xem entrypoint.sh)
+    WEB_CONCURRENCY: int = max(1, int(os.environ.get("WEB_CONCURRENCY", 1)))
+    # bcrypt cost (đổi cost: hash cũ được rehash khi user login) và process pool chạy bcrypt.
+    # Mỗi web worker có pool riêng: mặc định chia CPUs / hàng đợi của host cho WEB_CONCURRENCY workers
+    PASSWORD_BCRYPT_ROUNDS: int = int(os.environ.get("PASSWORD_BCRYPT_ROUNDS", 12))
+    PASSWORD_HASH_WORKERS: int = int(os.environ.get("PASSWORD_HASH_WORKERS", max(1, (os.cpu_count() or 1) // WEB_CONCURRENCY)))
+    # Số lần hash/verify (của một web worker) được chờ thêm khi mọi workers đều bận, vượt quá => 503
+    PASSWORD_HASH_MAX_QUEUE: int = int(os.environ.get("PASSWORD_HASH_MAX_QUEUE", max(1, 64 // WEB_CONCURRENCY)))
     REFRESH_TOKEN_EXPIRE_SECONDS: int = 60 * 60 * 24 * 30  # Refresh token expired after 30 days
+    # Coin thưởng khi hoàn thành focus session / task, đạt goal (0 = tắt)
+    SESSION_COMPLETED_COIN_REWARD: int = int(os.environ.get("SESSION_COMPLETED_COIN_REWARD", 0))
+    TASK_COMPLETED_COIN_REWARD: int = int(os.environ.get("TASK_COMPLETED_COIN_REWARD", 0))
+    GOAL_ACHIEVED_COIN_REWARD: int = int(os.environ.get("GOAL_ACHIEVED_COIN_REWARD", 0))
+    OUTBOX_CONSUMER_IN_PROCESS: bool = os.environ.get("OUTBOX_CONSUMER_IN_PROCESS", "True").lower() == "true"
+    # Header X-Metrics-Token của các endpoints /metrics (vận hành); không set thì các endpoints này bị tắt
+    METRICS_TOKEN: Optional[str] = os.environ.get("METRICS_TOKEN", None)
 
 
 settings = Settings()
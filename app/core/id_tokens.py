@@ -0,0 +1,348 @@
+import hashlib
+import json
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+
+import jwt
+import requests
+from cachetools import TLRUCache
+from cryptography.hazmat.primitives.serialization import load_pem_public_key
+from cryptography.x509 import load_pem_x509_certificate
+
+from app.utils import metrics
+from app.utils.logging_utils import logger
+
+FIREBASE_CERTS_URL = "https://www.googleapis.com/robot/v1/metadata/x509/securetoken@system.gserviceaccount.com"
+FIREBASE_ISSUER_PREFIX = "https://securetoken.google.com/"
+GOOGLE_JWKS_URL = "https://www.googleapis.com/oauth2/v3/certs"
+GOOGLE_ISSUERS = ["accounts.google.com", "https://accounts.google.com"]
+DEFAULT_MAX_AGE_SECONDS = 60 * 60  # khi response không có Cache-Control max-age
+REFRESH_MARGIN_SECONDS = 5 * 60  # refresh trước khi keys hết hạn
+MIN_REFETCH_SECONDS = 5  # kid lạ/lỗi fetch: không fetch lại liên tục
+VERIFIED_CACHE_SIZE = 10000
+INTROSPECTION_TTL_SECONDS = 60  # kết quả gọi remote (vd: Keycloak userinfo) chỉ cache ngắn
+HTTP_TIMEOUT_SECONDS = 10
+
+KeySet = Dict[str, Any]  # kid -> public key
+# Nguồn signing keys: trả về (keys, max_age seconds)
+KeySource = Callable[[], Tuple[KeySet, float]]
+
+
+class InvalidIdTokenError(ValueError):
+    pass
+
+
+def load_public_key(key: Any) -> Any:
+    """Public key từ PEM (x509 certificate hoặc public key), object key giữ nguyên."""
+    if isinstance(key, str):
+        key = key.encode()
+    if not isinstance(key, bytes):
+        return key
+    if b"CERTIFICATE" in key:
+        return load_pem_x509_certificate(key).public_key()
+    return load_pem_public_key(key)
+
+
+def _max_age(cache_control: Optional[str]) -> float:
+    match = re.search(r"max-age=(\d+)", cache_control or "")
+    return float(match.group(1)) if match else DEFAULT_MAX_AGE_SECONDS
+
+
+def x509_certificate_source(url: str = FIREBASE_CERTS_URL) -> KeySource:
+    """Keys từ endpoint trả về {kid: x509 PEM} (Google securetoken), hết hạn theo Cache-Control max-age."""
+
+    def fetch() -> Tuple[KeySet, float]:
+        response = requests.get(url, timeout=HTTP_TIMEOUT_SECONDS)
+        response.raise_for_status()
+        keys = {kid: load_public_key(pem) for kid, pem in response.json().items()}
+        return keys, _max_age(response.headers.get("Cache-Control"))
+
+    return fetch
+
+
+def static_key_source(keys: Dict[str, Any], max_age: float = DEFAULT_MAX_AGE_SECONDS) -> KeySource:
+    """Keys cố định ({kid: PEM hoặc public key}), vd: verify token tự ký khi test/load test offline."""
+    parsed = {kid: load_public_key(key) for kid, key in keys.items()}
+    return lambda: (parsed, max_age)
+
+
+def jwks_key_source(url: str) -> KeySource:
+    """Keys từ JWKS endpoint ({"keys": [JWK]}), chỉ lấy các keys dùng để ký, hết hạn theo Cache-Control max-age."""
+
+    def fetch() -> Tuple[KeySet, float]:
+        response = requests.get(url, timeout=HTTP_TIMEOUT_SECONDS)
+        response.raise_for_status()
+        keys = {
+            jwk["kid"]: jwt.PyJWK(jwk).key
+            for jwk in response.json().get("keys", [])
+            if jwk.get("kid") and jwk.get("use", "sig") == "sig" and jwk.get("kty") == "RSA"
+        }
+        return keys, _max_age(response.headers.get("Cache-Control"))
+
+    return fetch
+
+
+def file_key_source(path: str) -> KeySource:
+    """Keys đọc từ file JSON {kid: PEM}, đọc lại mỗi lần refresh."""
+
+    def fetch() -> Tuple[KeySet, float]:
+        with open(path) as f:
+            return static_key_source(json.load(f))()
+
+    return fetch
+
+
+class KeyStore:
+    """
+    Signing keys giữ trong memory. Thread nền refresh keys trước khi hết max-age, request chỉ fetch
+    đồng bộ khi chưa có keys hoặc gặp kid lạ (key mới được rotate), tối đa một lần mỗi MIN_REFETCH_SECONDS.
+    Refresh lỗi thì giữ keys cũ và thử lại sau MIN_REFETCH_SECONDS.
+    """
+
+    def __init__(self, source: KeySource, name: str, refresh_margin: float = REFRESH_MARGIN_SECONDS):
+        self.source = source
+        self.name = name
+        self.refresh_margin = refresh_margin
+        self._keys: KeySet = {}
+        self._expires_at = 0.0
+        self._refresh_at = 0.0
+        self._fetched_at: Optional[float] = None
+        self._lock = threading.Lock()
+        self._fetch_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def refresh(self, only_if_due: bool = False) -> bool:
+        """Fetch keys từ source, trả về False nếu lỗi (giữ keys cũ)."""
+        with self._fetch_lock:
+            if only_if_due and time.monotonic() < self._refresh_at:
+                return True
+            return self._fetch()
+
+    def _fetch(self) -> bool:
+        self._fetched_at = time.monotonic()
+        try:
+            keys, max_age = self.source()
+        except Exception:
+            logger.exception("Fetch signing keys failed: %s", self.name)
+            metrics.increment(f"{self.name}.keys.fetch_error")
+            with self._lock:
+                self._refresh_at = time.monotonic() + MIN_REFETCH_SECONDS
+            return False
+        now = time.monotonic()
+        with self._lock:
+            self._keys = keys
+            self._expires_at = now + max_age
+            # max-age ngắn hơn refresh_margin: refresh ở nửa max-age
+            self._refresh_at = now + max(max_age - self.refresh_margin, max_age / 2, MIN_REFETCH_SECONDS)
+        metrics.increment(f"{self.name}.keys.fetch")
+        return True
+
+    def _lookup(self, kid: Optional[str]) -> Tuple[Any, bool]:
+        with self._lock:
+            return self._keys.get(kid), time.monotonic() >= self._expires_at
+
+    def get(self, kid: Optional[str]) -> Any:
+        """Public key của kid, InvalidIdTokenError nếu không có."""
+        self.start()
+        key, stale = self._lookup(kid)
+        if key is None or stale:
+            with self._fetch_lock:
+                # Request khác/thread nền có thể vừa fetch xong trong lúc chờ lock
+                key, stale = self._lookup(kid)
+                if (key is None or stale) and (
+                    self._fetched_at is None or time.monotonic() - self._fetched_at >= MIN_REFETCH_SECONDS
+                ):
+                    self._fetch()
+                    key, _ = self._lookup(kid)
+        if key is None:
+            raise InvalidIdTokenError(f"Không tìm thấy signing key cho kid '{kid}'")
+        return key
+
+    def run(self) -> None:
+        while not self._stopped.is_set():
+            self.refresh(only_if_due=True)
+            with self._lock:
+                wait = self._refresh_at - time.monotonic()
+            self._stopped.wait(max(wait, 0.1))
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self.run, name=f"{self.name}-keys", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+
+class VerifiedTokenCache:
+    """
+    Claims của các token đã verify thành công, key là sha256 của token, hết hạn theo claim exp
+    (và sau tối đa ttl seconds nếu có ttl, vd: kết quả introspection không có exp).
+    """
+
+    def __init__(self, name: str, maxsize: int = VERIFIED_CACHE_SIZE, ttl: Optional[float] = None):
+        self.name = name
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = TLRUCache(maxsize=maxsize, ttu=self._expires_at, timer=time.time)
+
+    def _expires_at(self, _key: str, claims: Dict[str, Any], now: float) -> float:
+        expires_at = claims.get("exp", float("inf"))
+        return min(expires_at, now + self.ttl) if self.ttl else expires_at
+
+    @staticmethod
+    def _key(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def get_or_verify(self, token: str, verify: Callable[[str], Dict[str, Any]]) -> Dict[str, Any]:
+        key = self._key(token)
+        with self._lock:
+            claims = self._entries.get(key)
+        if claims is not None:
+            metrics.increment(f"{self.name}.verified_cache.hit")
+            return dict(claims)
+
+        metrics.increment(f"{self.name}.verified_cache.miss")
+        claims = verify(token)
+        with self._lock:
+            self._entries[key] = claims
+        return dict(claims)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class IdTokenVerifier:
+    """
+    Verify JWT (RS256) của một issuer bằng signing keys trong memory, không gọi mạng trên đường request
+    (trừ khi keys chưa có/gặp kid lạ). Claims của token đã verify được cache tới exp.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        issuers: Sequence[str],
+        audience: Optional[str],
+        key_source: KeySource,
+        required_claims: Sequence[str] = ("exp", "iat", "sub", "iss"),
+    ):
+        """audience=None: không kiểm tra aud"""
+        self.name = name
+        self.issuers = list(issuers)
+        self.audience = audience
+        self.required_claims = list(required_claims)
+        self.keys = KeyStore(key_source, name)
+        self.verified = VerifiedTokenCache(name)
+
+    def accepts(self, issuer: Optional[str]) -> bool:
+        return issuer in self.issuers
+
+    def verify(self, id_token: str) -> Dict[str, Any]:
+        """Claims của token, InvalidIdTokenError nếu không hợp lệ."""
+        return self.verified.get_or_verify(id_token, self._decode)
+
+    def _decode(self, id_token: str) -> Dict[str, Any]:
+        try:
+            header = jwt.get_unverified_header(id_token)
+        except jwt.PyJWTError as e:
+            raise InvalidIdTokenError(f"{self.name} token invalid: {e}") from e
+        if header.get("alg") != "RS256":
+            raise InvalidIdTokenError(f"{self.name} token invalid: alg phải là RS256")
+
+        try:
+            claims = jwt.decode(
+                id_token,
+                self.keys.get(header.get("kid")),
+                algorithms=["RS256"],
+                audience=self.audience,
+                issuer=self.issuers,
+                options={"require": self.required_claims, "verify_aud": self.audience is not None},
+            )
+        except jwt.ExpiredSignatureError as e:
+            raise InvalidIdTokenError(f"{self.name} token expired") from e
+        except jwt.PyJWTError as e:
+            raise InvalidIdTokenError(f"{self.name} token invalid: {e}") from e
+        return self._validate(claims)
+
+    def _validate(self, claims: Dict[str, Any]) -> Dict[str, Any]:
+        """Kiểm tra thêm theo từng issuer (sau khi đã verify chữ ký và các claims chuẩn)."""
+        return claims
+
+
+class FirebaseTokenVerifier(IdTokenVerifier):
+    """
+    Firebase ID token: cùng các bước kiểm tra như firebase_admin.auth.verify_id_token
+    (không kiểm tra token bị revoke).
+    """
+
+    def __init__(self, project_id: str, key_source: Optional[KeySource] = None):
+        super().__init__(
+            "firebase",
+            [FIREBASE_ISSUER_PREFIX + project_id],
+            project_id,
+            key_source or x509_certificate_source(),
+            required_claims=("exp", "iat", "sub", "aud", "iss"),
+        )
+
+    def _validate(self, claims: Dict[str, Any]) -> Dict[str, Any]:
+        subject = claims["sub"]
+        if not isinstance(subject, str) or not subject or len(subject) > 128:
+            raise InvalidIdTokenError("firebase token invalid: sub không hợp lệ")
+        if claims.get("auth_time", 0) > time.time():
+            raise InvalidIdTokenError("firebase token invalid: auth_time ở tương lai")
+        # Giống firebase_admin: uid = sub
+        claims["uid"] = subject
+        return claims
+
+
+class GoogleTokenVerifier(IdTokenVerifier):
+    """Google ID token (thay cho google.oauth2.id_token.verify_oauth2_token)."""
+
+    def __init__(self, client_id: Optional[str], key_source: Optional[KeySource] = None):
+        super().__init__("google", GOOGLE_ISSUERS, client_id, key_source or jwks_key_source(GOOGLE_JWKS_URL))
+
+
+class KeycloakTokenVerifier(IdTokenVerifier):
+    """
+    Access token của realm Keycloak, verify bằng JWKS của realm thay cho gọi userinfo.
+    Không kiểm tra aud (giống userinfo: chấp nhận mọi access token hợp lệ của realm).
+    issuer: iss trong token (URL public của Keycloak) khi khác server_url nội bộ dùng để tải JWKS
+    (vd: tên service trong docker-compose); mặc định <server_url>/realms/<realm>.
+    """
+
+    def __init__(
+        self,
+        server_url: str,
+        realm: str,
+        key_source: Optional[KeySource] = None,
+        issuer: Optional[str] = None,
+    ):
+        realm_url = f"{server_url.rstrip('/')}/realms/{realm}"
+        super().__init__(
+            "keycloak",
+            [(issuer or realm_url).rstrip("/")],
+            None,
+            key_source or jwks_key_source(f"{realm_url}/protocol/openid-connect/certs"),
+        )
+
+    def _validate(self, claims: Dict[str, Any]) -> Dict[str, Any]:
+        if claims.get("typ", "Bearer") != "Bearer":
+            raise InvalidIdTokenError("keycloak token invalid: không phải access token")
+        return claims
+
+
+def unverified_claims(token: str) -> Optional[Dict[str, Any]]:
+    """Claims của JWT chưa verify chữ ký (vd: đọc iss để chọn verifier), None nếu token không phải JWT."""
+    try:
+        return jwt.decode(token, options={"verify_signature": False})
+    except jwt.PyJWTError:
+        return None
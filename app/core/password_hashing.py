@@ -0,0 +1,106 @@
+import multiprocessing
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Callable, Optional, Tuple
+
+import anyio.to_thread
+from passlib.context import CryptContext
+
+from app.core.config import settings
+from app.utils import metrics
+from app.utils.exception_handler import CustomException, ExceptionType
+
+# needs_update => True khi cost của hash khác PASSWORD_BCRYPT_ROUNDS (rehash khi login)
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.PASSWORD_BCRYPT_ROUNDS)
+
+
+def _hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def _verify(password: str, hashed_password: str) -> bool:
+    return pwd_context.verify(password, hashed_password)
+
+
+def _verify_and_update(password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    if not pwd_context.verify(password, hashed_password):
+        return False, None
+    if pwd_context.needs_update(hashed_password):
+        return True, pwd_context.hash(password)
+    return True, None
+
+
+def _noop(_: int) -> None:
+    pass
+
+
+class PasswordHasher:
+    """
+    Chạy bcrypt trong process pool riêng (PASSWORD_HASH_WORKERS processes) thay vì trong threadpool
+    của các sync endpoints. Tối đa workers + PASSWORD_HASH_MAX_QUEUE lần hash/verify đang chạy hoặc
+    chờ (mỗi lần giữ một thread của threadpool trong lúc chờ kết quả), vượt quá thì từ chối ngay
+    với 503 thay vì xếp hàng. Khi start, threadpool được nới thêm đúng số slots đó để các thread
+    chờ bcrypt không chiếm chỗ của các endpoints khác.
+    workers=0: chạy trực tiếp trong thread gọi (vd: scripts), vẫn giới hạn số lần chạy đồng thời.
+    """
+
+    def __init__(self, workers: int, max_queue: int):
+        self.workers = workers
+        self.slots = max(workers, 1) + max_queue
+        self._slots = threading.BoundedSemaphore(self.slots)
+        self._lock = threading.Lock()
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._reserved_threads = False
+
+    def _pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # spawn: không fork process đang chạy nhiều threads. Worker import lại module __main__,
+                # entry point (uvicorn/gunicorn CLI, app/main.py, scripts) phải có guard if __name__ == "__main__"
+                # (tests/test_password_hashing.py kiểm tra các entry points của repo)
+                self._executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+            return self._executor
+
+    def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        if not self._slots.acquire(blocking=False):
+            metrics.increment("password_hash.rejected")
+            raise CustomException(exception=ExceptionType.SERVICE_UNAVAILABLE)
+        try:
+            if not self.workers:
+                return fn(*args)
+            future: Future = self._pool().submit(fn, *args)
+            return future.result()
+        finally:
+            self._slots.release()
+
+    def hash(self, password: str) -> str:
+        return self.run(_hash, password)
+
+    def verify(self, password: str, hashed_password: str) -> bool:
+        return self.run(_verify, password, hashed_password)
+
+    def verify_and_update(self, password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """(mật khẩu đúng, hash mới nếu hash cũ cần cập nhật cost)"""
+        return self.run(_verify_and_update, password, hashed_password)
+
+    def start(self) -> None:
+        """
+        Khởi động sẵn các worker processes (spawn mất vài trăm ms mỗi process) và nới threadpool
+        của event loop hiện tại (gọi trong startup event).
+        """
+        if not self.workers:
+            return
+        if not self._reserved_threads:
+            anyio.to_thread.current_default_thread_limiter().total_tokens += self.slots
+            self._reserved_threads = True
+        for _ in self._pool().map(_noop, range(self.workers)):
+            pass
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+hasher = PasswordHasher(settings.PASSWORD_HASH_WORKERS, settings.PASSWORD_HASH_MAX_QUEUE)
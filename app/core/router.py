@@ -1,7 +1,7 @@
 import pkgutil
 from importlib import import_module
 from fastapi import APIRouter
-from app.api import  api_healthcheck, api_user_entity_auth
+from app.api import  api_healthcheck, api_metrics, api_user_entity_auth
 from app.core.config import settings
 import app.api as root_api
 
@@ -10,6 +10,7 @@ router = APIRouter()
 router.include_router(api_healthcheck.router, tags=["[Current] Health Check"])
 # router.include_router(api_auth.router, tags=["[Current] Auth"])
 router.include_router(api_user_entity_auth.router, tags=["[Current] Auth"])
+router.include_router(api_metrics.router, tags=["[Current] Metrics"])
 
 for finder, subpackage_name, is_pkg in pkgutil.iter_modules(root_api.__path__):
     if is_pkg and subpackage_name.startswith("v"):
@@ -1,19 +1,37 @@
-from typing import Tuple, Any, Optional, Dict
+import threading
+from typing import Tuple, Any, Optional, Dict, Iterable
 
 from fastapi import Request
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 import jwt
-from passlib.context import CryptContext
 import firebase_admin
-from firebase_admin import auth, credentials
+from fastapi_sqlalchemy import db
+from firebase_admin import credentials
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
 
-from app.core.config import settings
+from app.core.config import settings, keycloak_openid
+from app.core.database import engine
+from app.core.password_hashing import hasher
+from app.core.id_tokens import (
+    INTROSPECTION_TTL_SECONDS,
+    FirebaseTokenVerifier,
+    GoogleTokenVerifier,
+    InvalidIdTokenError,
+    KeycloakTokenVerifier,
+    VerifiedTokenCache,
+    file_key_source,
+    jwks_key_source,
+)
 from app.utils.exception_handler import CustomException, ExceptionType
-from app.utils import time_utils
+from app.models.model_token_revocation import TokenRevocationEntity
+from app.utils import pg_notify, time_utils
 from app.schemas.sche_auth import TokenRequest
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 ALGORITHM = "HS256"
+REFRESH_TOKEN_TYPE = "refresh"
+REVOCATION_CHANNEL = "token_revocations"  # payload: "<revoked_at>:<user_id>,<user_id>..."
 
 # Initialize Firebase Admin SDK
 _firebase_app = None
@@ -66,6 +84,24 @@ if settings.FIREBASE_PROJECT_ID:
 else:
     print("========== FIREBASE_PROJECT_ID NOT SET ==========", flush=True)
 
+# Verify Firebase ID token với certificates giữ trong memory (không cần service account credentials)
+firebase_verifier: Optional[FirebaseTokenVerifier] = None
+if settings.FIREBASE_PROJECT_ID:
+    firebase_verifier = FirebaseTokenVerifier(
+        settings.FIREBASE_PROJECT_ID,
+        key_source=file_key_source(settings.FIREBASE_PUBLIC_KEYS_PATH) if settings.FIREBASE_PUBLIC_KEYS_PATH else None,
+    )
+
+# Verify access token Keycloak/Google bằng JWKS giữ trong memory thay cho gọi userinfo/verify_oauth2_token
+keycloak_verifier: Optional[KeycloakTokenVerifier] = None
+if keycloak_openid:
+    keycloak_verifier = KeycloakTokenVerifier(
+        settings.KEYCLOAK_SERVER_URL, settings.KEYCLOAK_REALM, issuer=settings.KEYCLOAK_ISSUER
+    )
+google_verifier = GoogleTokenVerifier(settings.GOOGLE_CLIENT_ID, jwks_key_source(settings.GOOGLE_JWKS_URL))
+# Kết quả Keycloak userinfo cho token không verify được tại chỗ (không phải JWT)
+keycloak_userinfo_cache = VerifiedTokenCache("keycloak.userinfo", ttl=INTROSPECTION_TTL_SECONDS)
+
 
 def create_access_token(
     payload: TokenRequest, expires_seconds: int = None
@@ -83,11 +119,19 @@ def create_access_token(
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    return hasher.verify(plain_password, hashed_password)
+
+
+def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """
+    Verify mật khẩu, trả về (đúng/sai, hash mới). Hash mới khác None khi hash cũ dùng cost
+    khác PASSWORD_BCRYPT_ROUNDS: caller lưu lại để nâng/hạ cost dần qua các lần login.
+    """
+    return hasher.verify_and_update(plain_password, hashed_password)
 
 
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+    return hasher.hash(password)
 
 
 def verify_firebase_token(firebase_id_token: str) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
@@ -97,32 +141,19 @@ def verify_firebase_token(firebase_id_token: str) -> Tuple[Optional[Dict[str, An
     If successful, returns (decoded_token, None).
     If failed, returns (None, error_message).
     """
-    if not _firebase_app:
+    if not firebase_verifier:
         error_msg = "Firebase chưa được cấu hình. Vui lòng set FIREBASE_PROJECT_ID trong file .env"
         print("========== FIREBASE NOT CONFIGURED ==========", flush=True)
-        print(f"FIREBASE_PROJECT_ID: {settings.FIREBASE_PROJECT_ID}", flush=True)
         return None, error_msg
-    
+
     try:
-        decoded_token = auth.verify_id_token(firebase_id_token)
-        print("========== FIREBASE TOKEN VERIFIED SUCCESSFULLY ==========", flush=True)
-        return decoded_token, None
+        return firebase_verifier.verify(firebase_id_token), None
+    except InvalidIdTokenError as e:
+        print(f"========== FIREBASE TOKEN VERIFICATION FAILED: {e} ==========", flush=True)
+        return None, "Firebase ID Token không hợp lệ hoặc đã hết hạn"
     except Exception as e:
-        error_type = type(e).__name__
-        error_msg = str(e)
-        print("========== FIREBASE TOKEN VERIFICATION FAILED ==========", flush=True)
-        print(f"Error: {error_msg}", flush=True)
-        print(f"Error type: {error_type}", flush=True)
-        
-        # Check for specific error types
-        if "DefaultCredentialsError" in error_type or "credentials" in error_msg.lower():
-            detailed_error = "Firebase cần Service Account Credentials. Vui lòng: 1) Tải Service Account Key từ Firebase Console, 2) Đặt file vào thư mục backend, 3) Set FIREBASE_CREDENTIALS_PATH trong .env"
-        elif "invalid" in error_msg.lower() or "expired" in error_msg.lower():
-            detailed_error = "Firebase ID Token không hợp lệ hoặc đã hết hạn"
-        else:
-            detailed_error = f"Lỗi xác thực Firebase: {error_msg}"
-        
-        return None, detailed_error
+        print(f"========== FIREBASE TOKEN VERIFICATION FAILED: {type(e).__name__}: {e} ==========", flush=True)
+        return None, f"Lỗi xác thực Firebase: {e}"
 
 
 def create_refresh_token(
@@ -177,6 +208,129 @@ def decode_jwt(token: str) -> dict[str, Any]:
         return None
 
 
+class Principal:
+    """
+    User đã xác thực, chỉ gồm các claims của access token đã verify (không query database).
+    Dùng cho các endpoints chỉ cần user_id thay cho UserEntity.
+    """
+    __slots__ = ("user_id", "email", "expires_at")
+
+    def __init__(self, user_id: int, email: Optional[str], expires_at: float):
+        object.__setattr__(self, "user_id", user_id)
+        object.__setattr__(self, "email", email)
+        object.__setattr__(self, "expires_at", expires_at)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError("Principal is immutable")
+
+    def __delattr__(self, name: str) -> None:
+        raise AttributeError("Principal is immutable")
+
+    def __repr__(self) -> str:
+        return f"Principal(user_id={self.user_id}, email={self.email!r}, expires_at={self.expires_at})"
+
+    @classmethod
+    def from_claims(cls, claims: Dict[str, Any]) -> "Principal":
+        """Principal từ payload đã verify của access token (ValueError nếu không phải access token hợp lệ)."""
+        if claims.get("typ") == REFRESH_TOKEN_TYPE:
+            raise ValueError("refresh token cannot be used as access token")
+        return cls(int(claims["sub"]), claims.get("email"), float(claims["exp"]))
+
+
+class TokenRevocations:
+    """
+    Thu hồi token theo user: mọi token của user được cấp (auth_time) trước thời điểm thu hồi bị từ chối.
+
+    Thời điểm thu hồi được ghi vào bảng token_revocations và NOTIFY REVOCATION_CHANNEL trong transaction
+    của thay đổi (vd: xoá user). Mỗi process giữ bản sao trong bộ nhớ (mỗi user một timestamp, tự hết hạn
+    sau thời gian sống tối đa của access token): nạp lại từ bảng mỗi khi listener (re)connect và cập nhật
+    theo notifications. Khi listener không healthy thì đọc trực tiếp từ bảng.
+    """
+    _revoked: Dict[int, Tuple[float, float]] = {}  # user_id -> (revoked_at, hết hạn)
+    _lock = threading.Lock()
+
+    @staticmethod
+    def record(session: Session, user_ids: Iterable[int]) -> float:
+        """
+        Ghi thu hồi token của user_ids trong transaction hiện tại của session (có hiệu lực ở mọi process
+        sau commit). Trả về revoked_at.
+        """
+        user_ids = sorted(set(user_ids))
+        revoked_at = time_utils.timestamp_now()
+        if not user_ids:
+            return revoked_at
+        table = TokenRevocationEntity.__table__
+        stmt = pg_insert(table).values([
+            {"user_id": user_id, "revoked_at": revoked_at, "created_at": revoked_at, "updated_at": revoked_at}
+            for user_id in user_ids
+        ])
+        session.connection().execute(stmt.on_conflict_do_update(
+            index_elements=[table.c.user_id],
+            set_={"revoked_at": stmt.excluded.revoked_at, "updated_at": stmt.excluded.updated_at},
+        ))
+        for start in range(0, len(user_ids), pg_notify.MAX_IDS_PER_NOTIFY):
+            batch = user_ids[start:start + pg_notify.MAX_IDS_PER_NOTIFY]
+            pg_notify.notify(session, REVOCATION_CHANNEL, f"{revoked_at!r}:{','.join(map(str, batch))}")
+        return revoked_at
+
+    @staticmethod
+    def revoke_user(user_id: int, revoked_at: Optional[float] = None) -> None:
+        """Ghi nhận thu hồi trong process hiện tại (giữ thời điểm thu hồi muộn nhất)."""
+        revoked_at = revoked_at if revoked_at is not None else time_utils.timestamp_now()
+        with TokenRevocations._lock:
+            current = TokenRevocations._revoked.get(user_id)
+            if current is None or current[0] < revoked_at:
+                TokenRevocations._revoked[user_id] = (revoked_at, revoked_at + settings.ACCESS_TOKEN_EXPIRE_SECONDS)
+
+    @staticmethod
+    def on_notify(payload: str) -> None:
+        revoked_at, user_ids = payload.split(":", 1)
+        for user_id in pg_notify.parse_ids(user_ids):
+            TokenRevocations.revoke_user(user_id, float(revoked_at))
+
+    @staticmethod
+    def load() -> None:
+        """Nạp lại các thu hồi còn hiệu lực từ bảng (khi listener vừa kết nối)."""
+        since = time_utils.timestamp_now() - settings.ACCESS_TOKEN_EXPIRE_SECONDS
+        table = TokenRevocationEntity.__table__
+        with engine.connect() as connection:
+            rows = connection.execute(
+                select(table.c.user_id, table.c.revoked_at).where(table.c.revoked_at > since)
+            ).all()
+        revoked = {
+            row.user_id: (row.revoked_at, row.revoked_at + settings.ACCESS_TOKEN_EXPIRE_SECONDS) for row in rows
+        }
+        with TokenRevocations._lock:
+            TokenRevocations._revoked = revoked
+
+    @staticmethod
+    def _revoked_at(user_id: int) -> Optional[float]:
+        if not pg_notify.listener.healthy:
+            return db.session.execute(
+                select(TokenRevocationEntity.revoked_at).where(TokenRevocationEntity.user_id == user_id)
+            ).scalar()
+        entry = TokenRevocations._revoked.get(user_id)
+        if entry is None:
+            return None
+        revoked_at, expires_at = entry
+        if expires_at < time_utils.timestamp_now():
+            with TokenRevocations._lock:
+                if TokenRevocations._revoked.get(user_id) == entry:
+                    del TokenRevocations._revoked[user_id]
+            return None
+        return revoked_at
+
+    @staticmethod
+    def is_revoked(user_id: int, issued_at: Optional[float]) -> bool:
+        revoked_at = TokenRevocations._revoked_at(user_id)
+        if revoked_at is None:
+            return False
+        return issued_at is None or issued_at <= revoked_at
+
+
+pg_notify.listener.subscribe(REVOCATION_CHANNEL, TokenRevocations.on_notify, TokenRevocations.load)
+
+
 class JWTBearer(HTTPBearer):
     def __init__(self, auto_error: bool = True):
         super(JWTBearer, self).__init__(auto_error=auto_error)
@@ -216,12 +370,15 @@ class JWTBearer(HTTPBearer):
                     exception=ExceptionType.UNAUTHORIZED,
                     message=f"Invalid authorization scheme: {credentials.scheme}. Expected 'Bearer'."
                 )
-            if not self.verify_jwt(credentials.credentials):
+            payload = decode_jwt(credentials.credentials)
+            if not payload:
                 print("JWTBearer: JWT verification failed - token invalid or expired", flush=True)
                 raise CustomException(
                     exception=ExceptionType.UNAUTHORIZED,
                     message="Invalid or expired token. Please login again to get a new token."
                 )
+            # Claims đã verify được dùng lại trong cùng request (không decode token lần nữa)
+            request.state.token_claims = payload
             print("JWTBearer: Token verified successfully", flush=True)
             return credentials.credentials
         except CustomException as e:
@@ -10,6 +10,12 @@ from app.core.router import router
 from app.models import Base
 from app.core.database import engine
 from app.core.config import settings
+from app.core.password_hashing import hasher
+from app.core.security import firebase_verifier, keycloak_verifier
+from app.services import srv_rollup  # noqa: đăng ký handlers cập nhật rollup theo ngày
+from app.services import srv_sync  # noqa: đăng ký handlers ghi tombstones cho delta sync
+from app.services import srv_domain_events  # noqa: đăng ký domain events và side effects sau commit
+from app.utils import event_bus, pg_notify
 from app.utils.exception_handler import (
     CustomException,
     fastapi_error_handler,
@@ -57,6 +63,21 @@ def get_application() -> FastAPI:
     application.add_exception_handler(CustomException, custom_error_handler)
     application.add_exception_handler(ValidationException, validation_exception_handler)
     application.add_exception_handler(Exception, fastapi_error_handler)
+    # Outbox consumer chạy trong process web (tắt bằng OUTBOX_CONSUMER_IN_PROCESS=false khi chạy app.outbox_consumer riêng)
+    if settings.OUTBOX_CONSUMER_IN_PROCESS:
+        application.add_event_handler("startup", event_bus.consumer.start)
+        application.add_event_handler("shutdown", event_bus.consumer.stop)
+    # LISTEN các channel invalidate cache trong process (principal cache...) từ các process khác
+    application.add_event_handler("startup", pg_notify.listener.start)
+    application.add_event_handler("shutdown", pg_notify.listener.stop)
+    # Process pool chạy bcrypt (login/register) tách khỏi threadpool của các sync endpoints
+    application.add_event_handler("startup", hasher.start)
+    application.add_event_handler("shutdown", hasher.shutdown)
+    # Tải signing keys (Firebase, Keycloak) khi khởi động, refresh nền trước khi hết max-age
+    for verifier in (firebase_verifier, keycloak_verifier):
+        if verifier:
+            application.add_event_handler("startup", verifier.keys.start)
+            application.add_event_handler("shutdown", verifier.keys.stop)
 
     return application
 
@@ -9,8 +9,11 @@ from app.models.model_session import SessionEntity, SessionPauseEntity  # noqa
 from app.models.model_task import TaskEntity, TaskSessionEntity  # noqa
 from app.models.model_goal import GoalEntity  # noqa
 from app.models.model_setting import UserSettingEntity, DefaultSettingEntity  # noqa
-from app.models.model_statistics import StatisticsCacheEntity, StreakRecordEntity  # noqa
+from app.models.model_sync import SyncTombstoneEntity  # noqa
+from app.models.model_outbox import OutboxEventEntity  # noqa
+from app.models.model_statistics import StatisticsCacheEntity, StreakRecordEntity, DailyActivityEntity, UserStreakEntity  # noqa
 from app.models.model_shop import ShopEntity, ShopPurchaseEntity  # noqa
 from app.models.model_external_account import ExternalAccount  # noqa
 from app.models.model_facebook_friend import FacebookFriend  # noqa
-from app.models.model_user_coin import UserCoinEntity  # noqa
\ No newline at end of file
+from app.models.model_user_coin import UserCoinEntity  # noqa
+from app.models.model_token_revocation import TokenRevocationEntity  # noqa
\ No newline at end of file
@@ -1,7 +1,10 @@
-from datetime import datetime
-
-from sqlalchemy import Column, Integer, Float
+from sqlalchemy import BigInteger, Column, Integer, Float, event
 from sqlalchemy.ext.declarative import as_declarative, declared_attr
+from sqlalchemy.orm import Mapper
+from sqlalchemy.sql import operators
+from sqlalchemy.types import TypeDecorator
+
+from app.utils import time_utils
 
 
 @as_declarative()
@@ -18,9 +21,10 @@ class Base:
 class TimestampMixin:
     __abstract__ = True
 
-    created_at = Column(Float, default=datetime.now().timestamp, nullable=False)
+    # Truyền hàm (không phải giá trị) để mỗi lần ghi lấy thời điểm hiện tại
+    created_at = Column(Float, default=time_utils.timestamp_now, nullable=False)
     updated_at = Column(
-        Float, default=datetime.now().timestamp, onupdate=datetime.now().timestamp, nullable=False
+        Float, default=time_utils.timestamp_now, onupdate=time_utils.timestamp_now, nullable=False
     )
 
 
@@ -28,3 +32,34 @@ class BareBaseModel(TimestampMixin, Base):
     __abstract__ = True
 
     id = Column(Integer, primary_key=True, autoincrement=True)
+
+
+class EpochMilliseconds(TypeDecorator):
+    """
+    Cột thời gian dạng BIGINT epoch milliseconds.
+    Giá trị ghi vào hoặc dùng để so sánh (seconds, milliseconds, datetime) được chuẩn hoá về milliseconds.
+    """
+    impl = BigInteger
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return time_utils.to_epoch_ms(value)
+
+    def coerce_compared_value(self, op, value):
+        # Chỉ chuẩn hoá giá trị so sánh với cột (BETWEEN coerce hai đầu với and_);
+        # phép toán số học (vd: // MILLISECONDS_PER_DAY) giữ nguyên giá trị
+        if operators.is_comparison(op) or op is operators.and_:
+            return self
+        return BigInteger()
+
+
+def _normalize_epoch_ms(target, value, oldvalue, initiator):
+    return time_utils.to_epoch_ms(value)
+
+
+@event.listens_for(Mapper, "mapper_configured")
+def _register_epoch_ms_attributes(mapper, cls):
+    # Chuẩn hoá ngay khi gán attribute để object trong session luôn giữ milliseconds
+    for attr in mapper.column_attrs:
+        if any(isinstance(column.type, EpochMilliseconds) for column in attr.columns):
+            event.listen(getattr(cls, attr.key), "set", _normalize_epoch_ms, retval=True)
@@ -1,7 +1,7 @@
-from sqlalchemy import Column, Integer, Float, ForeignKey, Index, UniqueConstraint
+from sqlalchemy import Column, Integer, ForeignKey, Index, UniqueConstraint, text
 from sqlalchemy.orm import relationship
 
-from app.models.model_base import Base, TimestampMixin
+from app.models.model_base import Base, EpochMilliseconds, TimestampMixin
 
 
 class GoalEntity(TimestampMixin, Base):
@@ -12,14 +12,21 @@ class GoalEntity(TimestampMixin, Base):
     
     __tablename__ = "goals"
     
+    # Các cột được phép sort_by ở API list (goal_date: uq_goals_user_date, updated_at: idx_goals_user_updated_at)
+    SORTABLE_FIELDS = ("goal_date", "updated_at")
+    
     goal_id = Column(Integer, primary_key=True, autoincrement=True)
     user_id = Column(Integer, ForeignKey("users.user_id", ondelete="CASCADE"), nullable=False)
-    goal_date = Column(Float)  # timestamp
+    goal_date = Column(EpochMilliseconds)  # epoch milliseconds
     target_sessions = Column(Integer)
     completed_sessions = Column(Integer, default=0)
     completion_percentage = Column(Integer, default=0)
     is_achieved = Column(Integer, default=0)
-    achieved_at = Column(Float, nullable=True)  # timestamp
+    achieved_at = Column(EpochMilliseconds, nullable=True)  # epoch milliseconds
+    # Ngày/tuần/tháng của goal_date theo timezone của user, tính khi ghi
+    local_day = Column(Integer, nullable=True)  # số ngày kể từ 1970-01-01
+    local_week = Column(Integer, nullable=True)  # ISO week YYYYWW
+    local_month = Column(Integer, nullable=True)  # YYYYMM
     # created_at and updated_at are inherited from BareBaseModel
     
     # Relationships
@@ -29,6 +36,9 @@ class GoalEntity(TimestampMixin, Base):
     __table_args__ = (
         Index('idx_goals_user_id', 'user_id'),
         Index('idx_goals_goal_date', 'goal_date'),
+        Index('idx_goals_user_local_day', 'user_id', 'local_day'),
+        Index('idx_goals_user_updated_at', 'user_id', 'updated_at', 'goal_id'),
+        Index('idx_goals_user_achieved_at', 'user_id', 'achieved_at', postgresql_where=text('is_achieved = 1')),
         UniqueConstraint('user_id', 'goal_date', name='uq_goals_user_date'),
     )
 
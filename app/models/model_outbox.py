@@ -0,0 +1,32 @@
+from sqlalchemy import Column, BigInteger, Integer, String, Float, Text, JSON, Index, text
+
+from app.models.model_base import Base, TimestampMixin
+
+
+class OutboxEventEntity(TimestampMixin, Base):
+    """
+    OutboxEventEntity - Domain Event Chờ Xử Lý (Transactional Outbox)
+    Bảng: outbox_events
+    Mỗi row là một (event, handler), được ghi trong cùng transaction với thay đổi sinh ra event
+    và bị xoá trong cùng transaction với side effects của handler.
+    """
+    
+    __tablename__ = "outbox_events"
+    
+    outbox_id = Column(BigInteger, primary_key=True, autoincrement=True)
+    event_name = Column(String, nullable=False)  # session.completed, task.completed, goal.achieved
+    handler = Column(String, nullable=False)  # tên handler (qualname) sẽ xử lý row này
+    payload = Column(JSON, nullable=False)
+    available_at = Column(Float, nullable=False)  # timestamp: chưa xử lý trước thời điểm này (retry backoff)
+    attempts = Column(Integer, nullable=False, default=0)
+    last_error = Column(Text, nullable=True)
+    failed_at = Column(Float, nullable=True)  # timestamp: hết số lần retry, không xử lý nữa
+    
+    # Indexes
+    __table_args__ = (
+        # Consumer chỉ quét các rows đang chờ
+        Index(
+            'idx_outbox_events_pending', 'available_at', 'outbox_id',
+            postgresql_where=text('failed_at IS NULL'),
+        ),
+    )
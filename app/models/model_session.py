@@ -1,7 +1,7 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, Index
+from sqlalchemy import Column, Integer, String, ForeignKey, Index, UniqueConstraint, text
 from sqlalchemy.orm import relationship
 
-from app.models.model_base import Base, TimestampMixin
+from app.models.model_base import Base, EpochMilliseconds, TimestampMixin
 
 
 class SessionEntity(TimestampMixin, Base):
@@ -22,11 +22,14 @@ class SessionEntity(TimestampMixin, Base):
     STATUS_PAUSED = "PAUSED"
     STATUS_CANCELLED = "CANCELLED"
     
+    # Các cột được phép sort_by ở API list (mỗi cột có index (user_id, cột, session_id))
+    SORTABLE_FIELDS = ("session_date", "updated_at")
+    
     session_id = Column(Integer, primary_key=True, autoincrement=True)
     user_id = Column(Integer, ForeignKey("users.user_id", ondelete="CASCADE"), nullable=False)
-    session_date = Column(Float)  # timestamp
-    start_time = Column(Float)  # timestamp
-    end_time = Column(Float)  # timestamp
+    session_date = Column(EpochMilliseconds)  # epoch milliseconds
+    start_time = Column(EpochMilliseconds)  # epoch milliseconds
+    end_time = Column(EpochMilliseconds)  # epoch milliseconds
     duration_minutes = Column(Integer)
     actual_duration_minutes = Column(Integer, nullable=True)
     session_type = Column(String, index=True)
@@ -35,6 +38,11 @@ class SessionEntity(TimestampMixin, Base):
     is_completed = Column(Integer, default=0)
     pause_count = Column(Integer, default=0)
     total_pause_duration = Column(Integer, default=0)
+    client_uuid = Column(String(64), nullable=True)  # ID do client sinh khi sync offline (idempotency key)
+    # Ngày/tuần/tháng của session_date theo timezone của user, tính khi ghi
+    local_day = Column(Integer, nullable=True)  # số ngày kể từ 1970-01-01
+    local_week = Column(Integer, nullable=True)  # ISO week YYYYWW
+    local_month = Column(Integer, nullable=True)  # YYYYMM
     
     # Relationships
     user = relationship("UserEntity", back_populates="sessions")
@@ -45,9 +53,18 @@ class SessionEntity(TimestampMixin, Base):
     __table_args__ = (
         Index('idx_sessions_user_id', 'user_id'),
         Index('idx_sessions_session_date', 'session_date'),
-        Index('idx_sessions_user_date', 'user_id', 'session_date'),
+        Index('idx_sessions_user_date_id', 'user_id', 'session_date', 'session_id'),
+        Index('idx_sessions_user_local_day', 'user_id', 'local_day'),
+        Index('idx_sessions_user_updated_at', 'user_id', 'updated_at', 'session_id'),
+        # Partial + covering: rebuild rollup theo user chỉ đọc index (sessions COMPLETED)
+        Index(
+            'idx_sessions_user_local_day_completed', 'user_id', 'local_day',
+            postgresql_include=['session_type', 'duration_minutes'],
+            postgresql_where=text("status = 'COMPLETED'"),
+        ),
         Index('idx_sessions_session_type', 'session_type'),
         Index('idx_sessions_status', 'status'),
+        UniqueConstraint('user_id', 'client_uuid', name='uq_sessions_user_client_uuid'),
     )
 
 
@@ -61,10 +78,15 @@ class SessionPauseEntity(TimestampMixin, Base):
     
     pause_id = Column(Integer, primary_key=True, autoincrement=True)
     session_id = Column(Integer, ForeignKey("sessions.session_id", ondelete="CASCADE"), nullable=False)
-    pause_start = Column(Float)  # timestamp
-    pause_end = Column(Float)  # timestamp
+    pause_start = Column(EpochMilliseconds)  # epoch milliseconds
+    pause_end = Column(EpochMilliseconds)  # epoch milliseconds
     pause_duration = Column(Integer, nullable=True)  # minutes
     
     # Relationships
     session = relationship("SessionEntity", back_populates="pauses")
+    
+    # Indexes
+    __table_args__ = (
+        Index('idx_session_pauses_session_updated_at', 'session_id', 'updated_at'),
+    )
 
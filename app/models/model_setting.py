@@ -18,6 +18,9 @@ class UserSettingEntity(TimestampMixin, Base):
     TYPE_BOOLEAN = "BOOLEAN"
     TYPE_JSON = "JSON"
     
+    # Các cột được phép sort_by ở API list (setting_key: uq_user_settings_user_key)
+    SORTABLE_FIELDS = ("setting_key", "updated_at")
+    
     setting_id = Column(Integer, primary_key=True, autoincrement=True)
     user_id = Column(Integer, ForeignKey("users.user_id", ondelete="CASCADE"), nullable=False)
     setting_key = Column(String, nullable=False)
@@ -30,6 +33,7 @@ class UserSettingEntity(TimestampMixin, Base):
     # Constraints
     __table_args__ = (
         UniqueConstraint('user_id', 'setting_key', name='uq_user_settings_user_key'),
+        Index('idx_user_settings_user_updated_at', 'user_id', 'updated_at', 'setting_id'),
     )
 
 
@@ -47,6 +51,8 @@ class DefaultSettingEntity(TimestampMixin, Base):
     CATEGORY_APPEARANCE = "APPEARANCE"
     CATEGORY_DATA = "DATA"
     
+    SORTABLE_FIELDS = ("setting_key", "category")
+    
     default_setting_id = Column(Integer, primary_key=True, autoincrement=True)
     setting_key = Column(String, unique=True, nullable=False)
     default_value = Column(String)
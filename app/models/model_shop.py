@@ -13,6 +13,9 @@ class ShopEntity(TimestampMixin, Base):
     
     __tablename__ = "shop"
     
+    # Các cột được phép sort_by ở API list (không chia theo user: index (cột, shop_id))
+    SORTABLE_FIELDS = ("price",)
+    
     shop_id = Column(Integer, primary_key=True, autoincrement=True)
     name = Column(String, nullable=False)
     price = Column(Float, nullable=False)
@@ -24,6 +27,7 @@ class ShopEntity(TimestampMixin, Base):
     # Indexes
     __table_args__ = (
         Index('idx_shop_type', 'type'),
+        Index('idx_shop_price', 'price', 'shop_id'),
     )
 
 
@@ -17,6 +17,9 @@ class StatisticsCacheEntity(TimestampMixin, Base):
     TYPE_MONTHLY = "MONTHLY"
     TYPE_YEARLY = "YEARLY"
     
+    # Các cột được phép sort_by ở API list (cache_date: uq_statistics_cache_user_date_type)
+    SORTABLE_FIELDS = ("cache_date",)
+    
     cache_id = Column(Integer, primary_key=True, autoincrement=True)
     user_id = Column(Integer, ForeignKey("users.user_id", ondelete="CASCADE"), nullable=False)
     cache_date = Column(Float)  # timestamp
@@ -47,13 +50,78 @@ class StreakRecordEntity(TimestampMixin, Base):
     
     __tablename__ = "streak_records"
     
+    # Các cột được phép sort_by ở API list (streak_day: uq_streak_records_user_day)
+    SORTABLE_FIELDS = ("streak_day",)
+    
     streak_id = Column(Integer, primary_key=True, autoincrement=True)
     user_id = Column(Integer, ForeignKey("users.user_id", ondelete="CASCADE"), nullable=False)
-    streak_date = Column(Float)  # timestamp
+    streak_date = Column(Float)  # timestamp (00:00:00 UTC của ngày)
+    streak_day = Column(Integer)  # số ngày kể từ 1970-01-01
     has_activity = Column(Integer, default=0)
     session_count = Column(Integer, default=0)
     focus_time = Column(Integer, default=0)  # minutes
     
     # Relationships
     user = relationship("UserEntity", back_populates="streak_records")
+    
+    # Constraints
+    __table_args__ = (
+        UniqueConstraint('user_id', 'streak_day', name='uq_streak_records_user_day'),
+    )
+
+
 
+class DailyActivityEntity(TimestampMixin, Base):
+    """
+    DailyActivityEntity - Tổng Hợp Hoạt Động Theo Ngày
+    Bảng: user_daily_activity
+    Được cập nhật trong cùng transaction với các thay đổi trên sessions, tasks, goals
+    """
+    
+    __tablename__ = "user_daily_activity"
+    
+    activity_id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = Column(Integer, ForeignKey("users.user_id", ondelete="CASCADE"), nullable=False)
+    day_key = Column(Integer, nullable=False)  # số ngày kể từ 1970-01-01
+    week_key = Column(Integer, nullable=False)  # YYYYWW (ISO week)
+    month_key = Column(Integer, nullable=False)  # YYYYMM
+    focus_minutes = Column(Integer, default=0, nullable=False)
+    break_minutes = Column(Integer, default=0, nullable=False)
+    session_count = Column(Integer, default=0, nullable=False)  # số focus sessions đã hoàn thành
+    completed_tasks = Column(Integer, default=0, nullable=False)
+    achieved_goals = Column(Integer, default=0, nullable=False)
+    
+    # Relationships
+    user = relationship("UserEntity", back_populates="daily_activity")
+    
+    # Indexes and Constraints
+    __table_args__ = (
+        UniqueConstraint('user_id', 'day_key', name='uq_user_daily_activity_user_day'),
+        Index('idx_user_daily_activity_user_week', 'user_id', 'week_key'),
+        Index('idx_user_daily_activity_user_month', 'user_id', 'month_key'),
+    )
+
+
+class UserStreakEntity(TimestampMixin, Base):
+    """
+    UserStreakEntity - Trạng Thái Chuỗi Ngày
+    Bảng: user_streaks
+    Mỗi user một row, được cập nhật khi streak_records của user thay đổi
+    """
+    
+    __tablename__ = "user_streaks"
+    
+    user_streak_id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = Column(Integer, ForeignKey("users.user_id", ondelete="CASCADE"), nullable=False)
+    current_streak = Column(Integer, default=0, nullable=False)  # độ dài chuỗi kết thúc tại last_active_day
+    best_streak = Column(Integer, default=0, nullable=False)
+    last_active_day = Column(Integer)  # số ngày kể từ 1970-01-01
+    total_active_days = Column(Integer, default=0, nullable=False)
+    
+    # Relationships
+    user = relationship("UserEntity", back_populates="streak_state")
+    
+    # Constraints
+    __table_args__ = (
+        UniqueConstraint('user_id', name='uq_user_streaks_user'),
+    )
@@ -0,0 +1,27 @@
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, Index
+from sqlalchemy.orm import relationship
+
+from app.models.model_base import Base, TimestampMixin
+
+
+class SyncTombstoneEntity(TimestampMixin, Base):
+    """
+    SyncTombstoneEntity - Dấu Xoá Cho Delta Sync
+    Bảng: sync_tombstones
+    """
+    
+    __tablename__ = "sync_tombstones"
+    
+    tombstone_id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = Column(Integer, ForeignKey("users.user_id", ondelete="CASCADE"), nullable=False)
+    entity_type = Column(String, nullable=False)  # sessions, session_pauses, tasks, task_sessions, goals, settings
+    entity_id = Column(Integer, nullable=False)
+    deleted_at = Column(Float, nullable=False)  # timestamp
+    
+    # Relationships
+    user = relationship("UserEntity", back_populates="sync_tombstones")
+    
+    # Indexes
+    __table_args__ = (
+        Index('idx_sync_tombstones_user_deleted_at', 'user_id', 'deleted_at', 'tombstone_id'),
+    )
@@ -1,7 +1,7 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, Index
+from sqlalchemy import Column, Integer, String, ForeignKey, Index, text
 from sqlalchemy.orm import relationship
 
-from app.models.model_base import Base, TimestampMixin
+from app.models.model_base import Base, EpochMilliseconds, TimestampMixin
 
 
 class TaskEntity(TimestampMixin, Base):
@@ -17,18 +17,25 @@ class TaskEntity(TimestampMixin, Base):
     PRIORITY_MEDIUM = "MEDIUM"
     PRIORITY_LOW = "LOW"
     
+    # Các cột được phép sort_by ở API list (mỗi cột có index (user_id, cột, task_id))
+    SORTABLE_FIELDS = ("task_date", "order_index", "updated_at")
+    
     task_id = Column(Integer, primary_key=True, autoincrement=True)
     user_id = Column(Integer, ForeignKey("users.user_id", ondelete="CASCADE"), nullable=False)
     title = Column(String)
     description = Column(String)
     priority = Column(String, default=PRIORITY_MEDIUM)
-    task_date = Column(Float)  # timestamp
+    task_date = Column(EpochMilliseconds)  # epoch milliseconds
     is_completed = Column(Integer, default=0)
-    completed_at = Column(Float, nullable=True)  # timestamp
+    completed_at = Column(EpochMilliseconds, nullable=True)  # epoch milliseconds
     total_time_spent = Column(Integer, default=0)  # minutes
     estimated_sessions = Column(Integer, default=1)
     actual_sessions = Column(Integer, default=0)
     order_index = Column(Integer, default=0)
+    # Ngày/tuần/tháng của task_date theo timezone của user, tính khi ghi
+    local_day = Column(Integer, nullable=True)  # số ngày kể từ 1970-01-01
+    local_week = Column(Integer, nullable=True)  # ISO week YYYYWW
+    local_month = Column(Integer, nullable=True)  # YYYYMM
     
     # Relationships
     user = relationship("UserEntity", back_populates="tasks")
@@ -38,7 +45,13 @@ class TaskEntity(TimestampMixin, Base):
     __table_args__ = (
         Index('idx_tasks_user_id', 'user_id'),
         Index('idx_tasks_task_date', 'task_date'),
-        Index('idx_tasks_user_date', 'user_id', 'task_date'),
+        Index('idx_tasks_user_date_id', 'user_id', 'task_date', 'task_id'),
+        Index('idx_tasks_user_order_index', 'user_id', 'order_index', 'task_id'),
+        Index('idx_tasks_user_local_day', 'user_id', 'local_day'),
+        Index('idx_tasks_user_updated_at', 'user_id', 'updated_at', 'task_id'),
+        Index('idx_tasks_user_local_week', 'user_id', 'local_week'),
+        Index('idx_tasks_user_local_month', 'user_id', 'local_month'),
+        Index('idx_tasks_user_completed_at', 'user_id', 'completed_at', postgresql_where=text('is_completed = 1')),
         Index('idx_tasks_priority', 'priority'),
         Index('idx_tasks_is_completed', 'is_completed'),
     )
@@ -61,4 +74,9 @@ class TaskSessionEntity(TimestampMixin, Base):
     # Relationships
     task = relationship("TaskEntity", back_populates="task_sessions")
     session = relationship("SessionEntity", back_populates="task_sessions")
+    
+    # Indexes
+    __table_args__ = (
+        Index('idx_task_sessions_task_updated_at', 'task_id', 'updated_at'),
+    )
 
@@ -0,0 +1,17 @@
+from sqlalchemy import Column, Integer, Float
+
+from app.models.model_base import Base, TimestampMixin
+
+
+class TokenRevocationEntity(TimestampMixin, Base):
+    """
+    TokenRevocationEntity - Thu Hồi Token Theo User
+    Bảng: token_revocations
+    Token của user được cấp (auth_time) trước revoked_at bị từ chối ở mọi process.
+    """
+    
+    __tablename__ = "token_revocations"
+    
+    # Không có FK tới users: row phải còn lại sau khi user bị xoá
+    user_id = Column(Integer, primary_key=True, autoincrement=False)
+    revoked_at = Column(Float, nullable=False)  # timestamp
@@ -12,6 +12,8 @@ class UserEntity(TimestampMixin, Base):
     
     __tablename__ = "users"
     
+    SORTABLE_FIELDS = ("created_at", "email")
+    
     user_id = Column(Integer, primary_key=True, autoincrement=True)
     email = Column(String, unique=True, index=True)
     display_name = Column(String)
@@ -19,6 +21,7 @@ class UserEntity(TimestampMixin, Base):
     hashed_password = Column(String(255), nullable=True)  # For authentication
     last_login = Column(Float, nullable=True)  # timestamp
     is_anonymous = Column(Integer, default=1)
+    timezone = Column(String, nullable=False, default="UTC", server_default="UTC")  # IANA timezone, vd: Asia/Ho_Chi_Minh
     # created_at and updated_at are inherited from BareBaseModel
     
     # Relationships
@@ -28,6 +31,9 @@ class UserEntity(TimestampMixin, Base):
     settings = relationship("UserSettingEntity", back_populates="user", cascade="all, delete-orphan")
     statistics_cache = relationship("StatisticsCacheEntity", back_populates="user", cascade="all, delete-orphan")
     streak_records = relationship("StreakRecordEntity", back_populates="user", cascade="all, delete-orphan")
+    daily_activity = relationship("DailyActivityEntity", back_populates="user", cascade="all, delete-orphan")
+    sync_tombstones = relationship("SyncTombstoneEntity", back_populates="user", cascade="all, delete-orphan")
+    streak_state = relationship("UserStreakEntity", back_populates="user", uselist=False, cascade="all, delete-orphan")
     shop_purchases = relationship("ShopPurchaseEntity", back_populates="user", cascade="all, delete-orphan")
     facebook_friends = relationship("FacebookFriend", back_populates="user", cascade="all, delete-orphan")
     user_coin = relationship("UserCoinEntity", back_populates="user", uselist=False, cascade="all, delete-orphan")
@@ -0,0 +1,31 @@
+"""
+Outbox consumer chạy thành process riêng:
+
+    python -m app.outbox_consumer
+
+Có thể chạy nhiều process song song (claim rows bằng FOR UPDATE SKIP LOCKED).
+"""
+import logging.config
+import signal
+
+from fastapi_sqlalchemy import DBSessionMiddleware
+
+from app.core.config import settings
+from app.models import Base  # noqa: import toàn bộ models (relationships)
+from app.services import srv_rollup, srv_sync, srv_domain_events  # noqa: đăng ký change handlers và outbox handlers
+from app.utils import event_bus
+
+
+def main() -> None:
+    logging.config.fileConfig(settings.LOGGING_CONFIG_FILE, disable_existing_loggers=False)
+    # Khởi tạo sessionmaker cho db() giống như khi chạy trong app web
+    DBSessionMiddleware(None, db_url=settings.DATABASE_URL)
+
+    consumer = event_bus.Consumer()
+    signal.signal(signal.SIGTERM, lambda *_: consumer.stop(timeout=0))
+    signal.signal(signal.SIGINT, lambda *_: consumer.stop(timeout=0))
+    consumer.run()
+
+
+if __name__ == "__main__":
+    main()
@@ -11,8 +11,13 @@ class BaseModelResponse(BaseModel):
 class PaginationParams(BaseModel):
     page_size: Optional[int] = Field(default=10, gt=0, le=100)
     page: Optional[int] = Field(default=1, gt=0)
+    # Keyset pagination: next_cursor của trang trước (khi có cursor thì bỏ qua page)
+    cursor: Optional[str] = Field(default=None, description="metadata.next_cursor của trang trước; bỏ qua page khi có cursor")
+    # exact: đếm trong cùng query (count(*) OVER ()), none: không đếm (chỉ has_more), cached: count cache theo user
+    count_mode: Optional[Literal["exact", "none", "cached"]] = Field(default="exact")
 
 
 class SortParams(BaseModel):
-    sort_by: Optional[str] = "id"
+    # None hoặc "id": sort theo primary key; các cột khác phải nằm trong SORTABLE_FIELDS của model
+    sort_by: Optional[str] = None
     order: Optional[Literal["asc", "desc"]] = "desc"
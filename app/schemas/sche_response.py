@@ -6,9 +6,12 @@ T = TypeVar("T")
 
 
 class MetadataResponse(BaseModel):
-    page: int
+    page: Optional[int] = None  # None khi phân trang bằng cursor
     page_size: int
-    total: int
+    total: Optional[int] = None  # None khi count_mode=none
+    next_cursor: Optional[str] = None  # None nếu không còn trang tiếp theo
+    has_more: Optional[bool] = None
+    count_mode: Optional[str] = None  # cách tính total: exact | none | cached
 
 
 class BaseResponse(BaseModel):
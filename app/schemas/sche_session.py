@@ -1,13 +1,13 @@
-from typing import Optional
+from typing import List, Optional
 from pydantic import BaseModel, Field
 from app.schemas.sche_base import BaseModelResponse
 
 
 class SessionCreateRequest(BaseModel):
     # user_id is now obtained from JWT token
-    session_date: float = Field(..., example=1703123456.789, description="Ngày của session (Unix timestamp - float, ví dụ: 1703123456.789)")
-    start_time: float = Field(..., example=1703123456.789, description="Thời gian bắt đầu session (Unix timestamp - float, ví dụ: 1703123456.789)")
-    end_time: Optional[float] = Field(None, example=1703127056.789, description="Thời gian kết thúc session (Unix timestamp - float, ví dụ: 1703123456.789). Null nếu chưa kết thúc")
+    session_date: float = Field(..., example=1703123456789, description="Ngày của session (Unix timestamp milliseconds; seconds là input legacy vẫn được nhận, ví dụ: 1703123456789)")
+    start_time: float = Field(..., example=1703123456789, description="Thời gian bắt đầu session (Unix timestamp milliseconds; seconds là input legacy vẫn được nhận, ví dụ: 1703123456789)")
+    end_time: Optional[float] = Field(None, example=1703127056789, description="Thời gian kết thúc session (Unix timestamp milliseconds; seconds là input legacy vẫn được nhận, ví dụ: 1703127056789). Null nếu chưa kết thúc")
     duration_minutes: int = Field(..., example=25, description="Thời lượng dự kiến của session (phút - integer)")
     actual_duration_minutes: Optional[int] = Field(None, example=23, description="Thời lượng thực tế của session (phút - integer)")
     session_type: str = Field(..., example="FOCUS_SESSION", description="Loại session: 'FOCUS_SESSION', 'SHORT_BREAK', hoặc 'LONG_BREAK' (string)")
@@ -19,9 +19,9 @@ class SessionCreateRequest(BaseModel):
 
 
 class SessionUpdateRequest(BaseModel):
-    session_date: Optional[float] = Field(None, example=1703123456.789, description="Ngày của session (Unix timestamp - float)")
-    start_time: Optional[float] = Field(None, example=1703123456.789, description="Thời gian bắt đầu session (Unix timestamp - float)")
-    end_time: Optional[float] = Field(None, example=1703127056.789, description="Thời gian kết thúc session (Unix timestamp - float)")
+    session_date: Optional[float] = Field(None, example=1703123456789, description="Ngày của session (Unix timestamp milliseconds; seconds là input legacy vẫn được nhận)")
+    start_time: Optional[float] = Field(None, example=1703123456789, description="Thời gian bắt đầu session (Unix timestamp milliseconds; seconds là input legacy vẫn được nhận)")
+    end_time: Optional[float] = Field(None, example=1703127056789, description="Thời gian kết thúc session (Unix timestamp milliseconds; seconds là input legacy vẫn được nhận)")
     duration_minutes: Optional[int] = Field(None, example=25, description="Thời lượng dự kiến của session (phút - integer)")
     actual_duration_minutes: Optional[int] = Field(None, example=23, description="Thời lượng thực tế của session (phút - integer)")
     session_type: Optional[str] = Field(None, example="FOCUS_SESSION", description="Loại session: 'FOCUS_SESSION', 'SHORT_BREAK', hoặc 'LONG_BREAK'")
@@ -35,9 +35,9 @@ class SessionUpdateRequest(BaseModel):
 class SessionBaseResponse(BaseModel):
     session_id: int = Field(..., description="ID của session (integer)")
     user_id: int = Field(..., description="ID của user sở hữu session (integer)")
-    session_date: Optional[float] = Field(None, description="Ngày của session (Unix timestamp - float)")
-    start_time: Optional[float] = Field(None, description="Thời gian bắt đầu session (Unix timestamp - float)")
-    end_time: Optional[float] = Field(None, description="Thời gian kết thúc session (Unix timestamp - float)")
+    session_date: Optional[int] = Field(None, description="Ngày của session (Unix timestamp milliseconds - integer)")
+    start_time: Optional[int] = Field(None, description="Thời gian bắt đầu session (Unix timestamp milliseconds - integer)")
+    end_time: Optional[int] = Field(None, description="Thời gian kết thúc session (Unix timestamp milliseconds - integer)")
     duration_minutes: Optional[int] = Field(None, description="Thời lượng dự kiến của session (phút - integer)")
     actual_duration_minutes: Optional[int] = Field(None, description="Thời lượng thực tế của session (phút - integer)")
     session_type: Optional[str] = Field(None, description="Loại session: 'FOCUS_SESSION', 'SHORT_BREAK', hoặc 'LONG_BREAK' (string)")
@@ -46,29 +46,85 @@ class SessionBaseResponse(BaseModel):
     is_completed: Optional[int] = Field(None, description="Đã hoàn thành hay chưa: 0 = chưa, 1 = đã hoàn thành (integer)")
     pause_count: Optional[int] = Field(None, description="Số lần tạm dừng (integer)")
     total_pause_duration: Optional[int] = Field(None, description="Tổng thời gian tạm dừng (phút - integer)")
+    client_uuid: Optional[str] = Field(None, description="ID do client sinh khi sync offline (string)")
     created_at: Optional[float] = Field(None, description="Thời gian tạo (Unix timestamp - float)")
     updated_at: Optional[float] = Field(None, description="Thời gian cập nhật lần cuối (Unix timestamp - float)")
 
 
 class SessionPauseCreateRequest(BaseModel):
     session_id: int = Field(..., example=1, description="ID của session (integer)")
-    pause_start: float = Field(..., example=1703123456.789, description="Thời gian bắt đầu tạm dừng (Unix timestamp - float, ví dụ: 1703123456.789)")
-    pause_end: Optional[float] = Field(None, example=1703123556.789, description="Thời gian kết thúc tạm dừng (Unix timestamp - float). Null nếu chưa kết thúc")
+    pause_start: float = Field(..., example=1703123456789, description="Thời gian bắt đầu tạm dừng (Unix timestamp milliseconds; seconds là input legacy vẫn được nhận, ví dụ: 1703123456789)")
+    pause_end: Optional[float] = Field(None, example=1703123556789, description="Thời gian kết thúc tạm dừng (Unix timestamp milliseconds; seconds là input legacy vẫn được nhận). Null nếu chưa kết thúc")
     pause_duration: Optional[int] = Field(None, example=2, description="Thời lượng tạm dừng (phút - integer)")
 
 
 class SessionPauseUpdateRequest(BaseModel):
-    pause_start: Optional[float] = Field(None, example=1703123456.789, description="Thời gian bắt đầu tạm dừng (Unix timestamp - float)")
-    pause_end: Optional[float] = Field(None, example=1703123556.789, description="Thời gian kết thúc tạm dừng (Unix timestamp - float)")
+    pause_start: Optional[float] = Field(None, example=1703123456789, description="Thời gian bắt đầu tạm dừng (Unix timestamp milliseconds; seconds là input legacy vẫn được nhận)")
+    pause_end: Optional[float] = Field(None, example=1703123556789, description="Thời gian kết thúc tạm dừng (Unix timestamp milliseconds; seconds là input legacy vẫn được nhận)")
     pause_duration: Optional[int] = Field(None, example=2, description="Thời lượng tạm dừng (phút - integer)")
 
 
 class SessionPauseBaseResponse(BaseModel):
     pause_id: int = Field(..., description="ID của pause (integer)")
     session_id: int = Field(..., description="ID của session (integer)")
-    pause_start: Optional[float] = Field(None, description="Thời gian bắt đầu tạm dừng (Unix timestamp - float)")
-    pause_end: Optional[float] = Field(None, description="Thời gian kết thúc tạm dừng (Unix timestamp - float)")
+    pause_start: Optional[int] = Field(None, description="Thời gian bắt đầu tạm dừng (Unix timestamp milliseconds - integer)")
+    pause_end: Optional[int] = Field(None, description="Thời gian kết thúc tạm dừng (Unix timestamp milliseconds - integer)")
     pause_duration: Optional[int] = Field(None, description="Thời lượng tạm dừng (phút - integer)")
     created_at: Optional[float] = Field(None, description="Thời gian tạo (Unix timestamp - float)")
     updated_at: Optional[float] = Field(None, description="Thời gian cập nhật lần cuối (Unix timestamp - float)")
 
+
+
+class SessionStartRequest(BaseModel):
+    duration_minutes: int = Field(..., example=25, description="Thời lượng dự kiến của session (phút - integer)")
+    session_type: str = Field(..., example="FOCUS_SESSION", description="Loại session: 'FOCUS_SESSION', 'SHORT_BREAK', hoặc 'LONG_BREAK' (string)")
+    focus_session_count: Optional[int] = Field(0, example=1, description="Số lượng focus session (integer, mặc định: 0)")
+    at: Optional[float] = Field(None, example=1703123456789, description="Thời điểm bắt đầu (Unix timestamp seconds hoặc milliseconds). Mặc định: thời điểm server nhận request")
+
+
+class SessionTransitionRequest(BaseModel):
+    at: Optional[float] = Field(None, example=1703123456789, description="Thời điểm chuyển trạng thái (Unix timestamp seconds hoặc milliseconds). Mặc định: thời điểm server nhận request")
+
+
+class SessionTransitionResponse(BaseModel):
+    session: SessionBaseResponse = Field(..., description="Session sau khi chuyển trạng thái")
+    pause: Optional[SessionPauseBaseResponse] = Field(None, description="Pause được tạo (pause) hoặc được đóng (resume/complete/cancel) trong lần chuyển này")
+
+
+MAX_SYNC_SESSIONS = 500
+
+
+class SessionSyncPauseItem(BaseModel):
+    pause_start: float = Field(..., example=1703123456789, description="Thời gian bắt đầu tạm dừng (Unix timestamp seconds hoặc milliseconds)")
+    pause_end: Optional[float] = Field(None, example=1703123556789, description="Thời gian kết thúc tạm dừng (Unix timestamp seconds hoặc milliseconds). Null nếu chưa kết thúc")
+    pause_duration: Optional[int] = Field(None, example=2, description="Thời lượng tạm dừng (phút - integer)")
+
+
+class SessionSyncTaskLinkItem(BaseModel):
+    task_id: int = Field(..., example=1, description="ID của task trên server (integer)")
+    time_spent: int = Field(..., example=25, description="Thời gian đã dùng cho task trong session này (phút - integer)")
+    notes: Optional[str] = Field(None, example="Hoàn thành task A", description="Ghi chú về task session (string)")
+
+
+class SessionSyncItem(SessionCreateRequest):
+    client_uuid: str = Field(..., min_length=1, max_length=64, example="6f1c2d4e-8a9b-4c3d-9e2f-1a2b3c4d5e6f", description="ID do client sinh cho session (idempotency key, duy nhất theo user)")
+    pauses: List[SessionSyncPauseItem] = Field(default_factory=list, description="Các lần tạm dừng của session")
+    task_links: List[SessionSyncTaskLinkItem] = Field(default_factory=list, description="Các task được làm trong session")
+
+
+class SessionSyncRequest(BaseModel):
+    sessions: List[SessionSyncItem] = Field(..., min_length=1, max_length=MAX_SYNC_SESSIONS, description=f"Các sessions cần đồng bộ (tối đa {MAX_SYNC_SESSIONS})")
+
+
+class SessionSyncResult(BaseModel):
+    client_uuid: str = Field(..., description="ID do client sinh cho session (string)")
+    session_id: int = Field(..., description="ID của session trên server (integer)")
+    created: bool = Field(..., description="True nếu session được tạo trong request này, False nếu đã được đồng bộ trước đó")
+    pause_ids: List[int] = Field(default_factory=list, description="ID của các pauses theo đúng thứ tự gửi lên")
+    task_session_ids: List[int] = Field(default_factory=list, description="ID của các task sessions theo đúng thứ tự gửi lên")
+
+
+class SessionSyncResponse(BaseModel):
+    created_count: int = Field(..., description="Số sessions được tạo mới (integer)")
+    duplicate_count: int = Field(..., description="Số sessions đã tồn tại (idempotent retry) (integer)")
+    items: List[SessionSyncResult] = Field(default_factory=list, description="Mapping client_uuid -> ID trên server, theo thứ tự request")
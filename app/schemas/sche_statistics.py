@@ -1,4 +1,5 @@
-from typing import Optional
+from enum import Enum
+from typing import List, Optional
 from pydantic import BaseModel, Field
 from app.schemas.sche_base import BaseModelResponse
 
@@ -82,6 +83,33 @@ class DailyStatisticsResponse(BaseModel):
     goal_achieved: int = Field(0, description="Số goals đã đạt được")
 
 
+class StatisticsBucket(str, Enum):
+    """Kích thước bucket cho statistics theo khoảng thời gian"""
+    DAY = "day"
+    WEEK = "week"  # ISO week, bắt đầu từ thứ 2
+    MONTH = "month"
+
+
+class StatisticsBucketResponse(BaseModel):
+    """Một bucket trong chuỗi statistics theo khoảng thời gian"""
+    bucket_start: float = Field(..., description="Timestamp ngày đầu của bucket (00:00:00 của ngày/thứ 2/ngày 1), không trước start_date")
+    bucket_end: float = Field(..., description="Timestamp ngày cuối của bucket (00:00:00), không sau end_date")
+    label: str = Field(..., description="Nhãn bucket (YYYY-MM-DD, YYYY-Www hoặc YYYY-MM)")
+    total_sessions: int = Field(0, description="Tổng số focus sessions")
+    total_focus_time: int = Field(0, description="Tổng thời gian focus (phút)")
+    total_break_time: int = Field(0, description="Tổng thời gian nghỉ (phút)")
+    completed_tasks: int = Field(0, description="Số tasks đã hoàn thành")
+    goal_achieved: int = Field(0, description="Số goals đã đạt được")
+
+
+class RangeStatisticsResponse(BaseModel):
+    """Response cho statistics theo khoảng thời gian"""
+    start_date: float = Field(..., description="Timestamp ngày bắt đầu (00:00:00)")
+    end_date: float = Field(..., description="Timestamp ngày kết thúc (00:00:00)")
+    bucket: StatisticsBucket = Field(..., description="Kích thước bucket")
+    items: List[StatisticsBucketResponse] = Field(default_factory=list, description="Các bucket theo thứ tự thời gian, kể cả bucket rỗng")
+
+
 class MonthlyStatisticsResponse(BaseModel):
     """Response cho statistics theo tháng"""
     year: int = Field(..., description="Năm")
@@ -0,0 +1,26 @@
+from typing import Generic, List, TypeVar
+from pydantic import BaseModel, Field
+from app.schemas.sche_goal import GoalBaseResponse
+from app.schemas.sche_session import SessionBaseResponse, SessionPauseBaseResponse
+from app.schemas.sche_setting import UserSettingBaseResponse
+from app.schemas.sche_task import TaskBaseResponse, TaskSessionBaseResponse
+
+T = TypeVar("T")
+
+
+class SyncChanges(BaseModel, Generic[T]):
+    upserts: List[T] = Field(default_factory=list, description="Các rows được tạo mới hoặc cập nhật (sắp xếp theo updated_at)")
+    deleted_ids: List[int] = Field(default_factory=list, description="ID các rows đã bị xoá (áp dụng sau upserts)")
+    has_more: bool = Field(False, description="Còn rows thay đổi chưa trả về cho loại entity này")
+
+
+class DeltaSyncResponse(BaseModel):
+    cursor: str = Field(..., description="Cursor dùng cho lần sync tiếp theo (opaque string)")
+    has_more: bool = Field(..., description="Còn thay đổi chưa trả về: gọi lại ngay với cursor mới")
+    server_time: float = Field(..., description="Thời điểm server bắt đầu đọc (Unix timestamp - float)")
+    sessions: SyncChanges[SessionBaseResponse]
+    session_pauses: SyncChanges[SessionPauseBaseResponse]
+    tasks: SyncChanges[TaskBaseResponse]
+    task_sessions: SyncChanges[TaskSessionBaseResponse]
+    goals: SyncChanges[GoalBaseResponse]
+    settings: SyncChanges[UserSettingBaseResponse]
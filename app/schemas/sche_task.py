@@ -8,9 +8,9 @@ class TaskCreateRequest(BaseModel):
     title: str = Field(..., example="Hoàn thành dự án ABC", description="Tiêu đề của task (string)")
     description: Optional[str] = Field(None, example="Làm xong tính năng XYZ và test", description="Mô tả chi tiết của task (string)")
     priority: Optional[str] = Field("MEDIUM", example="HIGH", description="Độ ưu tiên: 'HIGH', 'MEDIUM', hoặc 'LOW' (string, mặc định: 'MEDIUM')")
-    task_date: float = Field(..., example=1703123456.789, description="Ngày của task (Unix timestamp - float, ví dụ: 1703123456.789)")
+    task_date: float = Field(..., example=1703123456789, description="Ngày của task (Unix timestamp milliseconds; seconds là input legacy vẫn được nhận, ví dụ: 1703123456789)")
     is_completed: Optional[int] = Field(0, example=0, description="Đã hoàn thành hay chưa: 0 = chưa, 1 = đã hoàn thành (integer, mặc định: 0)")
-    completed_at: Optional[float] = Field(None, example=1703127056.789, description="Thời gian hoàn thành task (Unix timestamp - float). Null nếu chưa hoàn thành")
+    completed_at: Optional[float] = Field(None, example=1703127056789, description="Thời gian hoàn thành task (Unix timestamp milliseconds; seconds là input legacy vẫn được nhận). Null nếu chưa hoàn thành")
     total_time_spent: Optional[int] = Field(0, example=120, description="Tổng thời gian đã dùng cho task (phút - integer, mặc định: 0)")
     estimated_sessions: Optional[int] = Field(1, example=5, description="Số session dự kiến để hoàn thành task (integer, mặc định: 1)")
     actual_sessions: Optional[int] = Field(0, example=3, description="Số session thực tế đã dùng (integer, mặc định: 0)")
@@ -21,9 +21,9 @@ class TaskUpdateRequest(BaseModel):
     title: Optional[str] = Field(None, example="Tiêu đề mới", description="Tiêu đề của task (string)")
     description: Optional[str] = Field(None, example="Mô tả mới", description="Mô tả chi tiết của task (string)")
     priority: Optional[str] = Field(None, example="MEDIUM", description="Độ ưu tiên: 'HIGH', 'MEDIUM', hoặc 'LOW' (string)")
-    task_date: Optional[float] = Field(None, example=1703123456.789, description="Ngày của task (Unix timestamp - float)")
+    task_date: Optional[float] = Field(None, example=1703123456789, description="Ngày của task (Unix timestamp milliseconds; seconds là input legacy vẫn được nhận)")
     is_completed: Optional[int] = Field(None, example=1, description="Đã hoàn thành hay chưa: 0 = chưa, 1 = đã hoàn thành (integer)")
-    completed_at: Optional[float] = Field(None, example=1703127056.789, description="Thời gian hoàn thành task (Unix timestamp - float)")
+    completed_at: Optional[float] = Field(None, example=1703127056789, description="Thời gian hoàn thành task (Unix timestamp milliseconds; seconds là input legacy vẫn được nhận)")
     total_time_spent: Optional[int] = Field(None, example=120, description="Tổng thời gian đã dùng cho task (phút - integer)")
     estimated_sessions: Optional[int] = Field(None, example=5, description="Số session dự kiến để hoàn thành task (integer)")
     actual_sessions: Optional[int] = Field(None, example=3, description="Số session thực tế đã dùng (integer)")
@@ -36,9 +36,9 @@ class TaskBaseResponse(BaseModel):
     title: Optional[str] = Field(None, description="Tiêu đề của task (string)")
     description: Optional[str] = Field(None, description="Mô tả chi tiết của task (string)")
     priority: Optional[str] = Field(None, description="Độ ưu tiên: 'HIGH', 'MEDIUM', hoặc 'LOW' (string)")
-    task_date: Optional[float] = Field(None, description="Ngày của task (Unix timestamp - float)")
+    task_date: Optional[int] = Field(None, description="Ngày của task (Unix timestamp milliseconds - integer)")
     is_completed: Optional[int] = Field(None, description="Đã hoàn thành hay chưa: 0 = chưa, 1 = đã hoàn thành (integer)")
-    completed_at: Optional[float] = Field(None, description="Thời gian hoàn thành task (Unix timestamp - float)")
+    completed_at: Optional[int] = Field(None, description="Thời gian hoàn thành task (Unix timestamp milliseconds - integer)")
     total_time_spent: Optional[int] = Field(None, description="Tổng thời gian đã dùng cho task (phút - integer)")
     estimated_sessions: Optional[int] = Field(None, description="Số session dự kiến để hoàn thành task (integer)")
     actual_sessions: Optional[int] = Field(None, description="Số session thực tế đã dùng (integer)")
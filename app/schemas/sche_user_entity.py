@@ -1,6 +1,16 @@
 from typing import Optional
-from pydantic import BaseModel, EmailStr, Field
+from pydantic import BaseModel, EmailStr, Field, field_validator
 from app.schemas.sche_base import BaseModelResponse
+from app.utils import time_utils
+
+
+def _validate_timezone(value: Optional[str]) -> str:
+    # Gửi null tường minh => đặt lại timezone mặc định
+    if value is None:
+        return time_utils.DEFAULT_TIMEZONE
+    if not time_utils.is_valid_timezone(value):
+        raise ValueError("timezone must be a valid IANA timezone name (e.g. Asia/Ho_Chi_Minh)")
+    return value
 
 
 class UserEntityCreateRequest(BaseModel):
@@ -9,6 +19,12 @@ class UserEntityCreateRequest(BaseModel):
     profile_picture_url: Optional[str] = Field(default=None, example="https://example.com/avatar.jpg", max_length=1024, description="URL ảnh đại diện (string, tối đa 1024 ký tự)")
     is_anonymous: Optional[int] = Field(1, example=0, description="Là user ẩn danh hay không: 0 = không, 1 = có (integer, mặc định: 1)")
     last_login: Optional[float] = Field(None, example=1703123456.789, description="Thời gian đăng nhập lần cuối (Unix timestamp - float)")
+    timezone: Optional[str] = Field(None, example="Asia/Ho_Chi_Minh", max_length=64, description="Timezone IANA của user, dùng để xác định ngày/tuần/tháng cho thống kê và streak (string, mặc định: UTC)")
+
+    @field_validator("timezone")
+    @classmethod
+    def validate_timezone(cls, value: Optional[str]) -> str:
+        return _validate_timezone(value)
 
 
 class UserEntityUpdateRequest(BaseModel):
@@ -17,6 +33,12 @@ class UserEntityUpdateRequest(BaseModel):
     profile_picture_url: Optional[str] = Field(default=None, example="https://example.com/avatar.jpg", max_length=1024, description="URL ảnh đại diện (string, tối đa 1024 ký tự)")
     is_anonymous: Optional[int] = Field(None, example=0, description="Là user ẩn danh hay không: 0 = không, 1 = có (integer)")
     last_login: Optional[float] = Field(None, example=1703123456.789, description="Thời gian đăng nhập lần cuối (Unix timestamp - float)")
+    timezone: Optional[str] = Field(None, example="Asia/Ho_Chi_Minh", max_length=64, description="Timezone IANA của user, dùng để xác định ngày/tuần/tháng cho thống kê và streak (string, mặc định: UTC)")
+
+    @field_validator("timezone")
+    @classmethod
+    def validate_timezone(cls, value: Optional[str]) -> str:
+        return _validate_timezone(value)
 
 
 class UserEntityBaseResponse(BaseModel):
@@ -28,6 +50,7 @@ class UserEntityBaseResponse(BaseModel):
     last_login: Optional[float] = Field(None, description="Thời gian đăng nhập lần cuối (Unix timestamp - float)")
     is_anonymous: Optional[int] = Field(None, description="Là user ẩn danh hay không: 0 = không, 1 = có (integer)")
     updated_at: Optional[float] = Field(None, description="Thời gian cập nhật lần cuối (Unix timestamp - float)")
+    timezone: Optional[str] = Field(None, description="Timezone IANA của user (string)")
 
     class Config:
         from_attributes = True
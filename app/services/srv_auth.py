@@ -2,7 +2,7 @@ from fastapi_sqlalchemy import db
 from sqlalchemy import or_
 from app.models import User
 from app.core.security import (
-    verify_password, 
+    verify_and_update_password,
     create_access_token, 
     get_password_hash,
     verify_firebase_token,
@@ -39,11 +39,18 @@ class AuthService(object):
         )
         if not user:
             raise CustomException(exception=ExceptionType.UNAUTHORIZED)
-        if not verify_password(password, user.hashed_password):
+        hashed_password = user.hashed_password
+        # Trả connection về pool trong lúc chờ bcrypt (user được load lại theo primary key khi ghi last_login)
+        db.session.rollback()
+        password_valid, new_hash = verify_and_update_password(password, hashed_password)
+        if not password_valid:
             raise CustomException(exception=ExceptionType.UNAUTHORIZED)
         elif not user.is_active:
             raise CustomException(exception=ExceptionType.UNAUTHORIZED)
 
+        if new_hash:
+            # Cost bcrypt đã đổi: lưu hash mới cùng lần ghi last_login
+            user.hashed_password = new_hash
         user.last_login = time_utils.timestamp_now()
         db.session.commit()
         access_token, expire = create_access_token(
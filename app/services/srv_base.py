@@ -1,10 +1,17 @@
-from typing import Generic, TypeVar, Type, Any, Optional, List, Tuple, Dict
+from collections import defaultdict
+from typing import Generic, TypeVar, Type, Any, Callable, Optional, List, Sequence, Tuple, Dict
 
 from fastapi.encoders import jsonable_encoder
 from fastapi_sqlalchemy import db
+from sqlalchemy import and_, any_, cast, column, delete, exists, insert, literal, select, tuple_, update, values
+from sqlalchemy.dialects.postgresql import ARRAY, insert as pg_insert
 from sqlalchemy.inspection import inspect
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.util import identity_key
 
 from app.models.model_base import Base
+from app.utils import change_capture, count_cache
+from app.utils.change_capture import Change
 from app.utils.exception_handler import CustomException, ExceptionType
 from app.schemas.sche_base import PaginationParams, SortParams
 from app.utils.paging import paginate
@@ -13,6 +20,24 @@ from app.schemas.sche_response import MetadataResponse
 
 ModelType = TypeVar("ModelType", bound=Base)
 
+ON_CONFLICT_NOTHING = "nothing"
+ON_CONFLICT_UPDATE = "update"
+
+RowPreparer = Callable[[Session, Type[Any], List[Dict[str, Any]]], None]
+
+_row_preparers: Dict[Type[Any], List[Tuple[RowPreparer, Tuple[str, ...]]]] = defaultdict(list)
+
+
+def register_row_preparer(model: Type[Any], preparer: RowPreparer, fields: Sequence[str]) -> None:
+    """
+    Đăng ký hàm tính các cột dẫn xuất (vd: local_day) cho rows được ghi bằng câu lệnh INSERT/UPDATE trực tiếp:
+    các câu lệnh này không chạy mapper events before_insert/before_update.
+    preparer(session, model, rows) sửa trực tiếp rows; fields là các cột preparer đọc
+    (update chỉ gọi preparer khi có ghi vào một trong các cột này).
+    """
+    if all(registered is not preparer for registered, _ in _row_preparers[model]):
+        _row_preparers[model].append((preparer, tuple(fields)))
+
 
 class BaseService(Generic[ModelType], object):
 
@@ -21,21 +46,117 @@ class BaseService(Generic[ModelType], object):
         mapper = inspect(self.model)
         self.pk_field = mapper.primary_key[0].name if mapper.primary_key else "id"
 
-    def _commit(self) -> None:
+    def _commit(self, expire: bool = True) -> None:
+        """
+        expire=False: giữ nguyên giá trị của objects sau commit (rows vừa được RETURNING đã là giá trị mới nhất,
+        không cần query lại từng object khi đọc).
+        """
+        expire_on_commit = db.session.expire_on_commit
+        db.session.expire_on_commit = expire
         try:
             db.session.commit()
         except Exception:
             db.session.rollback()
             raise
+        finally:
+            db.session.expire_on_commit = expire_on_commit
+
+    def _prepare_rows(self, rows: List[Dict[str, Any]]) -> None:
+        for preparer, _ in _row_preparers.get(self.model, []):
+            preparer(db.session, self.model, rows)
+
+    def _prepare_update(self, values: Dict[str, Any], criteria: Any, owner_id: Optional[Any]) -> None:
+        """
+        Chạy preparers cho values của một câu UPDATE. Các cột preparer cần nhưng không có trong values
+        lấy từ owner_id (user_id) hoặc đọc từ row hiện tại (thêm một query, chỉ khi thiếu).
+        """
+        for preparer, fields in _row_preparers.get(self.model, []):
+            if not any(field in values for field in fields):
+                continue
+            row = dict(values)
+            if owner_id is not None and "user_id" in fields:
+                row.setdefault("user_id", owner_id)
+            missing = [field for field in fields if field not in row]
+            if missing:
+                table = self.model.__table__
+                current = db.session.execute(
+                    select(*[table.c[field] for field in missing]).where(criteria)
+                ).mappings().first()
+                if current is None:
+                    continue  # UPDATE không tìm thấy row, lỗi được báo theo số rows
+                row.update(current)
+            preparer(db.session, self.model, [row])
+            values.update({key: value for key, value in row.items() if key in values or key not in fields})
+
+    def _owner_criteria(self, owner_id: Any) -> Any:
+        """Điều kiện row thuộc user owner_id"""
+        table = self.model.__table__
+        if "user_id" not in table.c:
+            raise ValueError(f"{table.name} has no user_id column")
+        return table.c.user_id == owner_id
+
+    def _row_criteria(
+        self, pk_value: Any, owner_id: Optional[Any] = None, values: Optional[Dict[str, Any]] = None
+    ) -> Any:
+        """
+        WHERE pk = :id [AND <row thuộc owner_id>].
+        values: giá trị mới khi cập nhật (subclass có thể thêm điều kiện cho chúng).
+        """
+        criteria = self.model.__table__.c[self.pk_field] == pk_value
+        if owner_id is None:
+            return criteria
+        return and_(criteria, self._owner_criteria(owner_id))
+
+    def _raise_missing(self, pk_value: Any, owner_id: Optional[Any]) -> None:
+        """
+        Câu lệnh theo _row_criteria không ảnh hưởng row nào: FORBIDDEN nếu row tồn tại nhưng thuộc user khác,
+        ngược lại NOT_FOUND. Chỉ query thêm khi có owner_id (đường lỗi).
+        """
+        if owner_id is not None and db.session.scalar(
+            select(exists().where(self.model.__table__.c[self.pk_field] == pk_value))
+        ):
+            raise CustomException(exception=ExceptionType.FORBIDDEN)
+        raise CustomException(exception=ExceptionType.NOT_FOUND)
+
+    def _column_values(self, data: Dict[str, Any], skip_none: bool = False) -> Dict[str, Any]:
+        obj_data = jsonable_encoder(data)
+        keys = {attr.key for attr in inspect(self.model).column_attrs} - {self.pk_field}
+        return {
+            key: value for key, value in obj_data.items()
+            if key in keys and not (skip_none and value is None)
+        }
+
+    def _delete_dependents(self, criteria: Any) -> None:
+        """
+        Hook chạy trước DELETE của delete_by_id/delete_many (cùng transaction), criteria là điều kiện
+        chọn các rows sắp bị xoá. Subclass xoá trước các rows con cần change capture riêng thay vì
+        để ON DELETE CASCADE xoá âm thầm.
+        """
+
+    def _invalidate_cascaded(self) -> None:
+        # Rows con bị xoá theo ON DELETE CASCADE của database không đi qua change_capture
+        count_cache.invalidate(db.session, [
+            relationship.mapper.class_
+            for relationship in inspect(self.model).relationships
+            if relationship.cascade.delete
+        ])
+
+    def _pk_values_clause(self, pk_values: List[Any]) -> Any:
+        """pk = ANY(:ids) với một tham số mảng (không sinh một bind param cho mỗi giá trị như IN)."""
+        pk_column = self.model.__table__.c[self.pk_field]
+        return pk_column == any_(literal(list(pk_values), ARRAY(pk_column.type)))
 
     def _get_by_pk(self, value: Any) -> Optional[ModelType]:
         pk_column = getattr(self.model, self.pk_field)
         return db.session.query(self.model).filter(pk_column == value).first()
 
-    def get_by_id(self, pk_value: Any) -> ModelType:
-        obj = self._get_by_pk(pk_value)
+    def get_by_id(self, pk_value: Any, owner_id: Optional[Any] = None) -> ModelType:
+        """
+        owner_id: chỉ trả về row thuộc user này (FORBIDDEN nếu thuộc user khác).
+        """
+        obj = db.session.query(self.model).filter(self._row_criteria(pk_value, owner_id)).first()
         if obj is None:
-            raise CustomException(exception=ExceptionType.NOT_FOUND)
+            self._raise_missing(pk_value, owner_id)
         return obj
 
     def get_by_id_optional(self, pk_value: Any) -> Optional[ModelType]:
@@ -82,42 +203,292 @@ class BaseService(Generic[ModelType], object):
     ) -> ModelType:
         """
         Create a new record. If duplicate_check is provided, check for duplicates first.
+        Một câu INSERT ... RETURNING (object trả về đã có giá trị do database sinh, không cần refresh).
         """
         if duplicate_check:
             existing = self.check_duplicate(duplicate_check)
             if existing:
                 raise CustomException(exception=ExceptionType.DUPLICATE_ENTRY)
 
-        obj_data = jsonable_encoder(data)
-        obj = self.model(**obj_data)
-        db.session.add(obj)
-        self._commit()
-        db.session.refresh(obj)
+        return self.create_many([data])[0]
+
+    def _update_returning(self, pk_value: Any, values: Dict[str, Any], owner_id: Optional[Any]) -> ModelType:
+        """
+        Một câu UPDATE ... WHERE pk = :id [AND user_id = :owner_id] RETURNING rồi commit.
+        Model có change handlers: giá trị cũ lấy trong cùng câu lệnh
+        (UPDATE ... FROM (SELECT ... FOR UPDATE) old ... RETURNING <mới>, <cũ>).
+        Không có row nào được cập nhật => FORBIDDEN/NOT_FOUND.
+        """
+        criteria = self._row_criteria(pk_value, owner_id, values)
+        if not values:
+            obj = db.session.scalars(select(self.model).where(criteria)).first()
+            if obj is None:
+                self._raise_missing(pk_value, owner_id)
+            return obj
+
+        table = self.model.__table__
+        pk_column = table.c[self.pk_field]
+        attrs = inspect(self.model).column_attrs
+        tracked = change_capture.is_tracked(self.model)
+        try:
+            self._prepare_update(values, criteria, owner_id)
+            if tracked:
+                old = select(table).where(criteria).with_for_update().subquery("old")
+                stmt = (
+                    update(self.model)
+                    .where(pk_column == old.c[self.pk_field])
+                    .values(values)
+                    .returning(self.model, *[old.c[attr.columns[0].key] for attr in attrs])
+                )
+            else:
+                stmt = update(self.model).where(criteria).values(values).returning(self.model)
+            row = db.session.execute(
+                stmt, execution_options={"synchronize_session": False, "populate_existing": True}
+            ).first()
+        except Exception:
+            db.session.rollback()
+            raise
+        if row is None:
+            self._raise_missing(pk_value, owner_id)
+
+        obj = row[0]
+        try:
+            if tracked:
+                old_values = {attr.key: value for attr, value in zip(attrs, row[1:])}
+                change_capture.capture(db.session, [
+                    Change(self.model, old_values, change_capture.row_to_dict(obj))
+                ])
+            self._commit(expire=False)
+        except Exception:
+            db.session.rollback()
+            raise
         return obj
 
-    def update_by_id(self, pk_value: Any, data: dict[str, Any]) -> ModelType:
-        obj_data = jsonable_encoder(data)
-        exist_obj = self.get_by_id(pk_value)
-        for field in obj_data:
-            setattr(exist_obj, field, obj_data[field])
-        self._commit()
-        db.session.refresh(exist_obj)
-        return exist_obj
-
-    def partial_update_by_id(self, pk_value: Any, data: dict[str, Any]) -> ModelType:
-        obj_data = jsonable_encoder(data)
-        exist_obj = self.get_by_id(pk_value)
-        for field in obj_data:
-            if hasattr(exist_obj, field) and obj_data[field] is not None:
-                if isinstance(getattr(exist_obj, field), list) and not obj_data[field]:
-                    setattr(exist_obj, field, [])
+    def update_by_id(self, pk_value: Any, data: dict[str, Any], owner_id: Optional[Any] = None) -> ModelType:
+        """
+        Ghi đè các fields có trong data (kể cả None).
+        owner_id: chỉ cập nhật khi row thuộc user này (FORBIDDEN nếu thuộc user khác).
+        """
+        return self._update_returning(pk_value, self._column_values(data), owner_id)
+
+    def partial_update_by_id(self, pk_value: Any, data: dict[str, Any], owner_id: Optional[Any] = None) -> ModelType:
+        """
+        Chỉ cập nhật các fields có giá trị khác None trong data.
+        owner_id: chỉ cập nhật khi row thuộc user này (FORBIDDEN nếu thuộc user khác).
+        """
+        return self._update_returning(pk_value, self._column_values(data, skip_none=True), owner_id)
+
+    def delete_by_id(self, pk_value: Any, owner_id: Optional[Any] = None) -> None:
+        """
+        Một câu DELETE ... WHERE pk = :id [AND user_id = :owner_id] RETURNING rồi commit.
+        Rows con bị xoá theo ON DELETE CASCADE của database (như delete_many).
+        """
+        table = self.model.__table__
+        tracked = change_capture.is_tracked(self.model)
+        try:
+            criteria = self._row_criteria(pk_value, owner_id)
+            self._delete_dependents(criteria)
+            stmt = delete(table).where(criteria)
+            stmt = stmt.returning(*table.c) if tracked else stmt.returning(table.c[self.pk_field])
+            deleted = db.session.execute(stmt).mappings().first()
+        except Exception:
+            db.session.rollback()
+            raise
+        if deleted is None:
+            self._raise_missing(pk_value, owner_id)
+
+        try:
+            obj = db.session.identity_map.get(identity_key(self.model, (deleted[self.pk_field],)))
+            if obj is not None:
+                db.session.expunge(obj)
+            if tracked:
+                change_capture.capture(db.session, [Change(self.model, dict(deleted), None)])
+            self._invalidate_cascaded()
+            self._commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+    def create_many(
+        self,
+        items: List[Dict[str, Any]],
+        on_conflict: Optional[str] = None,
+        conflict_fields: Optional[List[str]] = None,
+        update_fields: Optional[List[str]] = None,
+        commit: bool = True,
+    ) -> List[ModelType]:
+        """
+        Tạo nhiều records bằng multi-row INSERT ... RETURNING và commit một lần.
+
+        on_conflict (cần conflict_fields là các cột của một unique constraint):
+        - "nothing": bỏ qua rows đã tồn tại (không có trong kết quả)
+        - "update": ghi đè update_fields (mặc định: các cột có trong mọi items, trừ conflict_fields)
+          của rows đã tồn tại và trả về chúng
+        Không có on_conflict thì kết quả theo đúng thứ tự items.
+        commit=False: chỉ ghi trong transaction hiện tại (caller tự commit).
+        """
+        if not items:
+            return []
+        if on_conflict not in (None, ON_CONFLICT_NOTHING, ON_CONFLICT_UPDATE):
+            raise ValueError(f"Unsupported on_conflict: {on_conflict}")
+        if on_conflict and not conflict_fields:
+            raise ValueError("conflict_fields is required with on_conflict")
+
+        table = self.model.__table__
+        rows = [jsonable_encoder(item) for item in items]
+        self._prepare_rows(rows)
+        tracked = change_capture.is_tracked(self.model)
+        try:
+            existing: Dict[Tuple[Any, ...], Dict[str, Any]] = {}
+            if on_conflict is None:
+                stmt = insert(self.model)
+            else:
+                stmt = pg_insert(self.model)
+                conflict_columns = [table.c[field] for field in conflict_fields]
+                if on_conflict == ON_CONFLICT_NOTHING:
+                    stmt = stmt.on_conflict_do_nothing(index_elements=conflict_columns)
                 else:
-                    setattr(exist_obj, field, obj_data[field])
-        self._commit()
-        db.session.refresh(exist_obj)
-        return exist_obj
-
-    def delete_by_id(self, pk_value: Any) -> None:
-        obj = self.get_by_id(pk_value)
-        db.session.delete(obj)
-        self._commit()
+                    fields = update_fields or [
+                        key for key in rows[0]
+                        if key not in conflict_fields
+                        and key not in (self.pk_field, "created_at")
+                        and all(key in row for row in rows)
+                    ]
+                    set_values = {field: stmt.excluded[field] for field in fields}
+                    if "updated_at" in table.c:
+                        set_values["updated_at"] = stmt.excluded.updated_at
+                    stmt = stmt.on_conflict_do_update(index_elements=conflict_columns, set_=set_values)
+                    if tracked:
+                        # Giá trị cũ của rows sẽ bị ghi đè (handlers cần old để tính delta)
+                        keys = {tuple(row.get(field) for field in conflict_fields) for row in rows}
+                        existing = {
+                            tuple(row[field] for field in conflict_fields): dict(row)
+                            for row in db.session.execute(
+                                select(table).where(tuple_(*conflict_columns).in_(keys)).with_for_update()
+                            ).mappings()
+                        }
+
+            # Có ON CONFLICT thì kết quả không theo thứ tự items (DO NOTHING còn bỏ bớt rows)
+            stmt = stmt.returning(self.model, sort_by_parameter_order=on_conflict is None)
+            objs = db.session.scalars(stmt, rows, execution_options={"populate_existing": True}).all()
+
+            if tracked:
+                changes = []
+                for obj in objs:
+                    new = change_capture.row_to_dict(obj)
+                    old = existing.get(tuple(new[field] for field in conflict_fields)) if existing else None
+                    changes.append(Change(self.model, old, new))
+                change_capture.capture(db.session, changes)
+            if commit:
+                self._commit(expire=False)
+        except Exception:
+            db.session.rollback()
+            raise
+        return objs
+
+    def update_many(self, items: List[Dict[str, Any]], commit: bool = True) -> List[ModelType]:
+        """
+        Cập nhật nhiều records theo primary key. Mỗi item là {<primary key>: ..., <field>: <giá trị mới>, ...},
+        các items có thể cập nhật các fields khác nhau.
+        Một câu UPDATE ... FROM (VALUES ...) RETURNING cho mỗi nhóm items có cùng tập fields, commit một lần.
+
+        Returns:
+            Các records đã cập nhật (primary key không tồn tại thì bị bỏ qua)
+        """
+        if not items:
+            return []
+        rows_by_pk: Dict[Any, Dict[str, Any]] = {}
+        for item in items:
+            row = jsonable_encoder(item)
+            if row.get(self.pk_field) is None:
+                raise ValueError(f"{self.pk_field} is required for update_many")
+            rows_by_pk.setdefault(row[self.pk_field], {}).update(row)
+
+        table = self.model.__table__
+        pk_column = table.c[self.pk_field]
+        tracked = change_capture.is_tracked(self.model)
+        try:
+            existing: Dict[Any, Dict[str, Any]] = {}
+            if tracked or _row_preparers.get(self.model):
+                existing = {
+                    row[self.pk_field]: dict(row)
+                    for row in db.session.execute(
+                        select(table).where(self._pk_values_clause(list(rows_by_pk))).with_for_update()
+                    ).mappings()
+                }
+                rows_by_pk = {pk: row for pk, row in rows_by_pk.items() if pk in existing}
+                if _row_preparers.get(self.model):
+                    full_rows = [{**existing[pk], **row} for pk, row in rows_by_pk.items()]
+                    self._prepare_rows(full_rows)
+                    for full_row in full_rows:
+                        old = existing[full_row[self.pk_field]]
+                        row = rows_by_pk[full_row[self.pk_field]]
+                        row.update({key: value for key, value in full_row.items() if value != old.get(key)})
+
+            groups: Dict[Tuple[str, ...], List[Dict[str, Any]]] = defaultdict(list)
+            for row in rows_by_pk.values():
+                groups[tuple(sorted(row))].append(row)
+
+            objs: List[ModelType] = []
+            for keys, group in groups.items():
+                fields = [key for key in keys if key != self.pk_field]
+                if not fields:
+                    continue
+                source = values(*[column(key, table.c[key].type) for key in keys], name="v").data(
+                    [tuple(row[key] for key in keys) for row in group]
+                )
+                stmt = (
+                    update(self.model)
+                    .where(pk_column == cast(source.c[self.pk_field], pk_column.type))
+                    .values({field: cast(source.c[field], table.c[field].type) for field in fields})
+                    .returning(self.model)
+                )
+                objs.extend(db.session.scalars(
+                    stmt, execution_options={"synchronize_session": False, "populate_existing": True}
+                ).all())
+
+            if tracked:
+                change_capture.capture(db.session, [
+                    Change(self.model, existing.get(getattr(obj, self.pk_field)), change_capture.row_to_dict(obj))
+                    for obj in objs
+                ])
+            if commit:
+                self._commit(expire=False)
+        except Exception:
+            db.session.rollback()
+            raise
+        return objs
+
+    def delete_many(self, pk_values: List[Any], commit: bool = True) -> List[Any]:
+        """
+        Xoá nhiều records bằng DELETE ... WHERE pk = ANY(:ids) RETURNING, commit một lần.
+        Rows con bị xoá theo ON DELETE CASCADE của database (không chạy cascade của ORM relationships).
+
+        Returns:
+            Primary keys đã xoá (giá trị không tồn tại thì bị bỏ qua)
+        """
+        if not pk_values:
+            return []
+        table = self.model.__table__
+        tracked = change_capture.is_tracked(self.model)
+        try:
+            criteria = self._pk_values_clause(pk_values)
+            self._delete_dependents(criteria)
+            stmt = delete(table).where(criteria)
+            stmt = stmt.returning(*table.c) if tracked else stmt.returning(table.c[self.pk_field])
+            deleted = [dict(row) for row in db.session.execute(stmt).mappings()]
+
+            for row in deleted:
+                obj = db.session.identity_map.get(identity_key(self.model, (row[self.pk_field],)))
+                if obj is not None:
+                    db.session.expunge(obj)
+            if tracked:
+                change_capture.capture(db.session, [Change(self.model, row, None) for row in deleted])
+            if deleted:
+                self._invalidate_cascaded()
+            if commit:
+                self._commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        return [row[self.pk_field] for row in deleted]
@@ -0,0 +1,145 @@
+from collections import defaultdict
+from typing import Any, Dict, List, Tuple
+
+from fastapi_sqlalchemy import db
+from sqlalchemy import tuple_
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.model_goal import GoalEntity
+from app.models.model_session import SessionEntity
+from app.models.model_statistics import DailyActivityEntity
+from app.models.model_task import TaskEntity
+from app.services.srv_statistics import StreakRecordService
+from app.services.srv_user_coin import UserCoinService
+from app.utils import change_capture, event_bus, time_utils
+from app.utils.change_capture import Change
+from app.utils.event_bus import DomainEvent
+
+SESSION_COMPLETED = "session.completed"
+TASK_COMPLETED = "task.completed"
+GOAL_ACHIEVED = "goal.achieved"
+
+
+def _became(change: Change, field: str, value: Any) -> bool:
+    """True nếu field của row vừa chuyển sang value (insert với value hoặc update từ giá trị khác)."""
+    if change.new is None or change.new.get(field) != value:
+        return False
+    return change.old is None or change.old.get(field) != value
+
+
+class DomainEventService:
+    """
+    Phát domain events (qua outbox, cùng transaction) khi session hoàn thành, task hoàn thành, goal đạt được
+    và chạy các side effects của chúng trong outbox consumer (sau commit, ngoài request).
+    """
+
+    @staticmethod
+    def on_changes(session: Session, changes: List[Change]) -> None:
+        for change in changes:
+            row = change.new
+            if change.model is SessionEntity and _became(change, "status", SessionEntity.STATUS_COMPLETED):
+                event_bus.publish(session, SESSION_COMPLETED, {
+                    "user_id": row["user_id"],
+                    "session_id": row["session_id"],
+                    "session_type": row.get("session_type"),
+                    "session_date": row.get("session_date"),
+                    "local_day": row.get("local_day"),
+                    "duration_minutes": row.get("duration_minutes") or 0,
+                })
+            elif change.model is TaskEntity and _became(change, "is_completed", 1):
+                event_bus.publish(session, TASK_COMPLETED, {
+                    "user_id": row["user_id"],
+                    "task_id": row["task_id"],
+                })
+            elif change.model is GoalEntity and _became(change, "is_achieved", 1):
+                event_bus.publish(session, GOAL_ACHIEVED, {
+                    "user_id": row["user_id"],
+                    "goal_id": row["goal_id"],
+                    "local_day": row.get("local_day"),
+                })
+
+    @staticmethod
+    def _focus_days(events: List[DomainEvent]) -> Dict[Tuple[int, int], Any]:
+        """(user_id, local_day) -> session_date của các focus sessions vừa hoàn thành."""
+        days = {}
+        for domain_event in events:
+            payload = domain_event.payload
+            if payload.get("session_type") != SessionEntity.TYPE_FOCUS_SESSION:
+                continue
+            if payload.get("local_day") is None or payload.get("session_date") is None:
+                continue
+            days.setdefault((payload["user_id"], payload["local_day"]), payload["session_date"])
+        return days
+
+    @staticmethod
+    def mark_streak_days(events: List[DomainEvent]) -> None:
+        """
+        Đánh dấu ngày có activity trong streak_records cho mỗi (user, ngày) có focus session hoàn thành.
+        Chỉ set has_activity (session_count/focus_time do client tự cộng dồn qua API streak nên không cộng lại),
+        gọi lại nhiều lần vẫn cho cùng kết quả.
+        """
+        days = DomainEventService._focus_days(events)
+        for (user_id, _), session_date in sorted(days.items()):
+            StreakRecordService._upsert_day(db.session, user_id, {
+                "streak_date": time_utils.epoch_ms_to_seconds(session_date),
+                "has_activity": 1,
+            })
+
+    @staticmethod
+    def update_goal_progress(events: List[DomainEvent]) -> None:
+        """
+        Cập nhật completed_sessions/completion_percentage/is_achieved của goal trong ngày
+        từ số focus sessions hoàn thành (rollup user_daily_activity, đã cập nhật trong transaction của session).
+        completed_sessions không bị giảm nếu client đã ghi giá trị lớn hơn; gọi lại nhiều lần vẫn cho cùng kết quả.
+        """
+        keys = set(DomainEventService._focus_days(events))
+        if not keys:
+            return
+        counts = dict(
+            ((row.user_id, row.day_key), row.session_count)
+            for row in db.session.query(
+                DailyActivityEntity.user_id, DailyActivityEntity.day_key, DailyActivityEntity.session_count
+            ).filter(tuple_(DailyActivityEntity.user_id, DailyActivityEntity.day_key).in_(keys))
+        )
+        goals = db.session.query(GoalEntity).filter(
+            tuple_(GoalEntity.user_id, GoalEntity.local_day).in_(keys)
+        ).all()
+        for goal in goals:
+            completed = max(goal.completed_sessions or 0, counts.get((goal.user_id, goal.local_day), 0))
+            goal.completed_sessions = completed
+            if goal.target_sessions:
+                goal.completion_percentage = min(100, completed * 100 // goal.target_sessions)
+                if completed >= goal.target_sessions and goal.is_achieved != 1:
+                    goal.is_achieved = 1
+                    goal.achieved_at = time_utils.timestamp_now_ms()
+
+    @staticmethod
+    def reward_coins(events: List[DomainEvent]) -> None:
+        """
+        Cộng coin thưởng theo cấu hình *_COIN_REWARD (0 = tắt) cho mỗi event, gộp theo user.
+        Không idempotent tự thân: dựa vào việc outbox rows bị xoá trong cùng transaction với lần cộng coin.
+        """
+        rewards = {
+            SESSION_COMPLETED: settings.SESSION_COMPLETED_COIN_REWARD,
+            TASK_COMPLETED: settings.TASK_COMPLETED_COIN_REWARD,
+            GOAL_ACHIEVED: settings.GOAL_ACHIEVED_COIN_REWARD,
+        }
+        amounts: Dict[int, int] = defaultdict(int)
+        for domain_event in events:
+            amount = rewards.get(domain_event.name) or 0
+            if domain_event.name == SESSION_COMPLETED and (
+                domain_event.payload.get("session_type") != SessionEntity.TYPE_FOCUS_SESSION
+            ):
+                amount = 0
+            if amount > 0:
+                amounts[domain_event.payload["user_id"]] += amount
+        UserCoinService.add_coins(db.session, amounts)
+
+for _model in (SessionEntity, TaskEntity, GoalEntity):
+    change_capture.register(_model, DomainEventService.on_changes)
+
+event_bus.subscribe(SESSION_COMPLETED, DomainEventService.mark_streak_days)
+event_bus.subscribe(SESSION_COMPLETED, DomainEventService.update_goal_progress)
+for _name in (SESSION_COMPLETED, TASK_COMPLETED, GOAL_ACHIEVED):
+    event_bus.subscribe(_name, DomainEventService.reward_coins)
@@ -1,11 +1,11 @@
 from fastapi_sqlalchemy import db
 from app.models.model_goal import GoalEntity
-from app.services.srv_base import BaseService
+from app.services.srv_user_scoped import UserScopedService
 from app.utils.exception_handler import CustomException, ExceptionType
 from typing import Any, Dict
 
 
-class GoalService(BaseService[GoalEntity]):
+class GoalService(UserScopedService[GoalEntity]):
 
     def __init__(self):
         super().__init__(GoalEntity)
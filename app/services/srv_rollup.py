@@ -0,0 +1,300 @@
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi_sqlalchemy import db
+from sqlalchemy import BigInteger, Integer, case, cast, delete, extract, func, insert, literal, select, union_all
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.models.model_goal import GoalEntity
+from app.models.model_session import SessionEntity
+from app.models.model_statistics import DailyActivityEntity
+from app.models.model_task import TaskEntity
+from app.models.model_user_entity import UserEntity
+from app.services.srv_user_timezone import UserTimezoneService
+from app.utils import change_capture, time_utils
+from app.utils.change_capture import Change
+
+COUNTER_FIELDS = (
+    "focus_minutes",
+    "break_minutes",
+    "session_count",
+    "completed_tasks",
+    "achieved_goals",
+)
+
+BREAK_TYPES = (SessionEntity.TYPE_SHORT_BREAK, SessionEntity.TYPE_LONG_BREAK)
+
+
+class ActivityRollupService:
+    """
+    Duy trì bảng user_daily_activity: mỗi (user_id, day_key) một row chứa tổng
+    focus/break minutes, số focus sessions, tasks hoàn thành và goals đạt được.
+    day_key là ngày lịch theo timezone của user.
+    """
+
+    @staticmethod
+    def contribution(
+        model: Any,
+        row: Optional[Dict[str, Any]],
+        tz: Optional[str] = None,
+    ) -> Optional[Tuple[int, int, Dict[str, int]]]:
+        """
+        Phần đóng góp của một row vào rollup: (user_id, day_key, counters) hoặc None.
+        Cùng điều kiện với các query thống kê trước đây.
+        Session dùng local_day đã lưu; task/goal tính ngày của completed_at/achieved_at theo tz.
+        """
+        if not row or row.get("user_id") is None:
+            return None
+
+        if model is SessionEntity:
+            if row.get("status") != SessionEntity.STATUS_COMPLETED or row.get("session_date") is None:
+                return None
+            duration = int(row.get("duration_minutes") or 0)
+            if row.get("session_type") == SessionEntity.TYPE_FOCUS_SESSION:
+                counters = {"focus_minutes": duration, "session_count": 1}
+            elif row.get("session_type") in BREAK_TYPES:
+                counters = {"break_minutes": duration}
+            else:
+                return None
+            day = row.get("local_day")
+            if day is None:
+                day = time_utils.epoch_ms_to_local_day_key(row["session_date"], tz)
+            return row["user_id"], day, counters
+
+        if model is TaskEntity:
+            if row.get("is_completed") != 1 or row.get("completed_at") is None:
+                return None
+            return row["user_id"], time_utils.epoch_ms_to_local_day_key(row["completed_at"], tz), {"completed_tasks": 1}
+
+        if model is GoalEntity:
+            if row.get("is_achieved") != 1 or row.get("achieved_at") is None:
+                return None
+            return row["user_id"], time_utils.epoch_ms_to_local_day_key(row["achieved_at"], tz), {"achieved_goals": 1}
+
+        return None
+
+    @staticmethod
+    def compute_deltas(changes: List[Change], connection: Any = None) -> Dict[Tuple[int, int], Dict[str, int]]:
+        user_ids = {
+            row["user_id"]
+            for change in changes
+            for row in (change.old, change.new)
+            if row and row.get("user_id") is not None
+        }
+        timezones = UserTimezoneService.get_timezones(user_ids, connection) if user_ids else {}
+
+        deltas: Dict[Tuple[int, int], Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        for change in changes:
+            for row, sign in ((change.old, -1), (change.new, 1)):
+                tz = timezones.get(row.get("user_id")) if row else None
+                contribution = ActivityRollupService.contribution(change.model, row, tz)
+                if contribution is None:
+                    continue
+                user_id, day, counters = contribution
+                for field, value in counters.items():
+                    deltas[(user_id, day)][field] += sign * value
+
+        return {
+            key: dict(counters)
+            for key, counters in deltas.items()
+            if any(counters.values())
+        }
+
+    @staticmethod
+    def apply_deltas(session: Session, deltas: Dict[Tuple[int, int], Dict[str, int]]) -> None:
+        """Cộng dồn deltas vào rollup bằng một câu INSERT ... ON CONFLICT DO UPDATE."""
+        if not deltas:
+            return
+
+        now = time_utils.timestamp_now()
+        rows = []
+        for (user_id, day), counters in deltas.items():
+            row = {
+                "user_id": user_id,
+                "day_key": day,
+                "week_key": time_utils.week_key(day),
+                "month_key": time_utils.month_key(day),
+                "created_at": now,
+                "updated_at": now,
+            }
+            for field in COUNTER_FIELDS:
+                row[field] = counters.get(field, 0)
+            rows.append(row)
+
+        table = DailyActivityEntity.__table__
+        stmt = pg_insert(table).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.user_id, table.c.day_key],
+            set_={
+                **{field: table.c[field] + stmt.excluded[field] for field in COUNTER_FIELDS},
+                "updated_at": stmt.excluded.updated_at,
+            },
+        )
+        session.connection().execute(stmt)
+
+    @staticmethod
+    def on_changes(session: Session, changes: List[Change]) -> None:
+        ActivityRollupService.apply_deltas(
+            session, ActivityRollupService.compute_deltas(changes, session.connection())
+        )
+
+    @staticmethod
+    def on_user_changes(session: Session, changes: List[Change]) -> None:
+        # Đổi timezone => ngày của mọi activity thay đổi, tính lại rollup của user đó
+        for user_id in UserTimezoneService.changed_user_ids(changes):
+            ActivityRollupService._rebuild(session, user_id)
+
+    @staticmethod
+    def get_totals(
+        user_ids: List[int],
+        start_day: Optional[int] = None,
+        end_day: Optional[int] = None,
+    ) -> Dict[int, Dict[str, int]]:
+        """
+        Tổng các counters trong khoảng [start_day, end_day] cho nhiều users (một query GROUP BY user_id).
+        """
+        totals = {uid: {field: 0 for field in COUNTER_FIELDS} for uid in user_ids}
+        if not user_ids:
+            return totals
+
+        query = db.session.query(
+            DailyActivityEntity.user_id,
+            *[func.sum(getattr(DailyActivityEntity, field)).label(field) for field in COUNTER_FIELDS],
+        ).filter(DailyActivityEntity.user_id.in_(user_ids))
+        if start_day is not None:
+            query = query.filter(DailyActivityEntity.day_key >= start_day)
+        if end_day is not None:
+            query = query.filter(DailyActivityEntity.day_key <= end_day)
+
+        for row in query.group_by(DailyActivityEntity.user_id).all():
+            totals[row.user_id] = {field: int(getattr(row, field) or 0) for field in COUNTER_FIELDS}
+        return totals
+
+    @staticmethod
+    def get_series(
+        user_id: int,
+        start_day: int,
+        end_day: int,
+        key_field: str = "day_key",
+    ) -> Dict[int, Dict[str, int]]:
+        """
+        Tổng các counters trong [start_day, end_day] gom theo key_field (day_key/week_key/month_key),
+        một query GROUP BY. Bucket không có hoạt động sẽ không có trong kết quả.
+        """
+        key_column = getattr(DailyActivityEntity, key_field)
+        rows = db.session.query(
+            key_column.label("bucket_key"),
+            *[func.sum(getattr(DailyActivityEntity, field)).label(field) for field in COUNTER_FIELDS],
+        ).filter(
+            DailyActivityEntity.user_id == user_id,
+            DailyActivityEntity.day_key >= start_day,
+            DailyActivityEntity.day_key <= end_day,
+        ).group_by(key_column).all()
+
+        return {
+            row.bucket_key: {field: int(getattr(row, field) or 0) for field in COUNTER_FIELDS}
+            for row in rows
+        }
+
+    @staticmethod
+    def _rebuild(session: Session, user_id: Optional[int] = None) -> None:
+        """
+        Tính lại rollup từ sessions, tasks, goals (set-wise, không commit).
+        user_id=None sẽ rebuild cho tất cả users.
+        """
+        duration = func.coalesce(SessionEntity.duration_minutes, 0)
+        is_focus = SessionEntity.session_type == SessionEntity.TYPE_FOCUS_SESSION
+        is_break = SessionEntity.session_type.in_(BREAK_TYPES)
+        task_day = UserTimezoneService.local_key_exprs(TaskEntity.completed_at, UserEntity.timezone)[0]
+        goal_day = UserTimezoneService.local_key_exprs(GoalEntity.achieved_at, UserEntity.timezone)[0]
+
+        sessions_select = select(
+            SessionEntity.user_id.label("user_id"),
+            SessionEntity.local_day.label("day_key"),
+            case((is_focus, duration), else_=0).label("focus_minutes"),
+            case((is_break, duration), else_=0).label("break_minutes"),
+            case((is_focus, 1), else_=0).label("session_count"),
+            literal(0).label("completed_tasks"),
+            literal(0).label("achieved_goals"),
+        ).where(
+            SessionEntity.status == SessionEntity.STATUS_COMPLETED,
+            SessionEntity.local_day.isnot(None),
+        )
+        tasks_select = select(
+            TaskEntity.user_id,
+            task_day,
+            literal(0), literal(0), literal(0),
+            literal(1),
+            literal(0),
+        ).join(UserEntity, UserEntity.user_id == TaskEntity.user_id).where(
+            TaskEntity.is_completed == 1,
+            TaskEntity.completed_at.isnot(None),
+        )
+        goals_select = select(
+            GoalEntity.user_id,
+            goal_day,
+            literal(0), literal(0), literal(0), literal(0),
+            literal(1),
+        ).join(UserEntity, UserEntity.user_id == GoalEntity.user_id).where(
+            GoalEntity.is_achieved == 1,
+            GoalEntity.achieved_at.isnot(None),
+        )
+        if user_id is not None:
+            sessions_select = sessions_select.where(SessionEntity.user_id == user_id)
+            tasks_select = tasks_select.where(TaskEntity.user_id == user_id)
+            goals_select = goals_select.where(GoalEntity.user_id == user_id)
+
+        activity = union_all(sessions_select, tasks_select, goals_select).subquery()
+        # local_day là INTEGER => nhân trên BIGINT để không tràn số với các ngày sau 2038
+        day_start = func.timezone(
+            "UTC", func.to_timestamp(cast(activity.c.day_key, BigInteger) * time_utils.SECONDS_PER_DAY)
+        )
+        now = time_utils.timestamp_now()
+
+        rollup_select = select(
+            activity.c.user_id,
+            cast(activity.c.day_key, Integer),
+            cast(extract("isoyear", day_start) * 100 + extract("week", day_start), Integer),
+            cast(extract("year", day_start) * 100 + extract("month", day_start), Integer),
+            *[cast(func.sum(activity.c[field]), Integer) for field in COUNTER_FIELDS],
+            literal(now),
+            literal(now),
+        ).group_by(activity.c.user_id, activity.c.day_key)
+
+        table = DailyActivityEntity.__table__
+        delete_stmt = delete(table)
+        if user_id is not None:
+            delete_stmt = delete_stmt.where(table.c.user_id == user_id)
+
+        connection = session.connection()
+        connection.execute(delete_stmt)
+        connection.execute(
+            insert(table).from_select(
+                ["user_id", "day_key", "week_key", "month_key", *COUNTER_FIELDS, "created_at", "updated_at"],
+                rollup_select,
+            )
+        )
+
+    @staticmethod
+    def rebuild(user_id: Optional[int] = None) -> int:
+        """
+        Tính lại toàn bộ rollup từ sessions, tasks, goals (set-wise, một transaction).
+        user_id=None sẽ rebuild cho tất cả users. Trả về số rows rollup sau khi rebuild.
+        """
+        try:
+            ActivityRollupService._rebuild(db.session, user_id)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        count_query = db.session.query(func.count(DailyActivityEntity.activity_id))
+        if user_id is not None:
+            count_query = count_query.filter(DailyActivityEntity.user_id == user_id)
+        return int(count_query.scalar() or 0)
+
+for _model in (SessionEntity, TaskEntity, GoalEntity):
+    change_capture.register(_model, ActivityRollupService.on_changes)
+
+change_capture.register(UserEntity, ActivityRollupService.on_user_changes)
@@ -1,16 +1,321 @@
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
 from fastapi_sqlalchemy import db
+from sqlalchemy import delete, insert, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
 from app.models.model_session import SessionEntity, SessionPauseEntity
-from app.services.srv_base import BaseService
+from app.models.model_task import TaskEntity, TaskSessionEntity
+from app.services.srv_user_scoped import UserScopedService
+from app.services.srv_user_timezone import UserTimezoneService
+from app.utils import change_capture, time_utils
+from app.utils.change_capture import Change
+from app.utils.exception_handler import CustomException, ExceptionType
+
+# Các cột của session được lấy từ request sync
+SESSION_SYNC_FIELDS = (
+    "session_date",
+    "start_time",
+    "end_time",
+    "duration_minutes",
+    "actual_duration_minutes",
+    "session_type",
+    "status",
+    "focus_session_count",
+    "is_completed",
+    "pause_count",
+    "total_pause_duration",
+)
+
+MILLISECONDS_PER_MINUTE = 60 * time_utils.MILLISECONDS_PER_SECOND
 
+# action -> (các trạng thái được phép chuyển từ, trạng thái mới)
+SESSION_TRANSITIONS = {
+    "pause": ({SessionEntity.STATUS_IN_PROGRESS}, SessionEntity.STATUS_PAUSED),
+    "resume": ({SessionEntity.STATUS_PAUSED}, SessionEntity.STATUS_IN_PROGRESS),
+    "complete": (
+        {SessionEntity.STATUS_IN_PROGRESS, SessionEntity.STATUS_PAUSED},
+        SessionEntity.STATUS_COMPLETED,
+    ),
+    "cancel": (
+        {SessionEntity.STATUS_IN_PROGRESS, SessionEntity.STATUS_PAUSED},
+        SessionEntity.STATUS_CANCELLED,
+    ),
+}
 
-class SessionService(BaseService[SessionEntity]):
+
+class SessionService(UserScopedService[SessionEntity]):
 
     def __init__(self):
         super().__init__(SessionEntity)
 
+    def _delete_dependents(self, criteria: Any) -> None:
+        """
+        task_sessions được đồng bộ theo task nhưng cũng bị xoá theo ON DELETE CASCADE của session:
+        xoá trước bằng DELETE ... RETURNING và chạy change capture để client nhận tombstones.
+        """
+        link_table = TaskSessionEntity.__table__
+        session_ids = select(self.model.__table__.c[self.pk_field]).where(criteria)
+        deleted = db.session.execute(
+            delete(link_table).where(link_table.c.session_id.in_(session_ids)).returning(*link_table.c)
+        ).mappings().all()
+        if deleted:
+            change_capture.capture(db.session, [Change(TaskSessionEntity, dict(row), None) for row in deleted])
 
-class SessionPauseService(BaseService[SessionPauseEntity]):
+    def start(self, user_id: int, data: Dict[str, Any]) -> SessionEntity:
+        """
+        Bắt đầu một session mới (IN_PROGRESS) tại thời điểm data["at"] (mặc định: thời điểm hiện tại)
+        """
+        started_at = time_utils.to_epoch_ms(data.get("at")) or time_utils.timestamp_now_ms()
+        session = SessionEntity(
+            user_id=user_id,
+            session_date=started_at,
+            start_time=started_at,
+            duration_minutes=data["duration_minutes"],
+            session_type=data["session_type"],
+            status=SessionEntity.STATUS_IN_PROGRESS,
+            focus_session_count=data.get("focus_session_count") or 0,
+            is_completed=0,
+            pause_count=0,
+            total_pause_duration=0,
+        )
+        db.session.add(session)
+        # Không expire: các giá trị trả về đã có sẵn (session_id từ INSERT ... RETURNING)
+        self._commit(expire=False)
+        return session
 
-    def __init__(self):
-        super().__init__(SessionPauseEntity)
+    def transition(
+        self, user_id: int, session_id: int, action: str, at: Optional[float] = None
+    ) -> Tuple[SessionEntity, Optional[SessionPauseEntity]]:
+        """
+        Chuyển trạng thái session (pause/resume/complete/cancel) trong một transaction
+
+        Session bị lock (SELECT ... FOR UPDATE) trong lúc chuyển trạng thái nên các request đồng thời
+        (vd: hai thiết bị cùng bấm pause) được xử lý tuần tự và request sau thấy trạng thái mới.
+        Pause đang mở được đóng khi resume/complete/cancel; pause_count, total_pause_duration,
+        end_time và actual_duration_minutes được tính ở server.
+
+        Args:
+            user_id: ID của user
+            session_id: ID của session
+            action: "pause", "resume", "complete" hoặc "cancel"
+            at: Thời điểm chuyển trạng thái (Unix timestamp seconds hoặc milliseconds, mặc định: hiện tại)
+
+        Returns:
+            (session, pause được tạo/đóng trong lần chuyển này hoặc None)
+        """
+        from_statuses, to_status = SESSION_TRANSITIONS[action]
+        now_ms = time_utils.to_epoch_ms(at) or time_utils.timestamp_now_ms()
+        try:
+            session = (
+                db.session.query(SessionEntity)
+                .filter(self._row_criteria(session_id, user_id))
+                .with_for_update()
+                .first()
+            )
+            if session is None:
+                self._raise_missing(session_id, user_id)
+            if session.status not in from_statuses:
+                raise CustomException(
+                    http_code=ExceptionType.CONFLICT.http_code,
+                    message=f"Cannot {action} a session in status {session.status}",
+                )
+
+            pause = None
+            if action == "pause":
+                pause = SessionPauseEntity(session_id=session_id, pause_start=max(now_ms, session.start_time or 0))
+                db.session.add(pause)
+                session.pause_count = (session.pause_count or 0) + 1
+            else:
+                # Pause đang mở (nếu có) kết thúc tại thời điểm chuyển trạng thái
+                pause = (
+                    db.session.query(SessionPauseEntity)
+                    .filter(SessionPauseEntity.session_id == session_id, SessionPauseEntity.pause_end.is_(None))
+                    .order_by(SessionPauseEntity.pause_id.desc())
+                    .first()
+                )
+                if pause is not None:
+                    pause.pause_end = max(now_ms, pause.pause_start or 0)
+                    pause.pause_duration = round((pause.pause_end - (pause.pause_start or pause.pause_end)) / MILLISECONDS_PER_MINUTE)
+                    session.total_pause_duration = (session.total_pause_duration or 0) + pause.pause_duration
+
+            if to_status in (SessionEntity.STATUS_COMPLETED, SessionEntity.STATUS_CANCELLED):
+                session.end_time = max(now_ms, session.start_time or 0)
+                elapsed = round((session.end_time - (session.start_time or session.end_time)) / MILLISECONDS_PER_MINUTE)
+                session.actual_duration_minutes = max(0, elapsed - (session.total_pause_duration or 0))
+                session.is_completed = 1 if to_status == SessionEntity.STATUS_COMPLETED else 0
+            session.status = to_status
+
+            # Không expire: mọi giá trị trả về đã được load khi lock hoặc vừa tính ở trên
+            self._commit(expire=False)
+        except Exception:
+            db.session.rollback()
+            raise
+
+        return session, pause
+
+    def sync_batch(self, user_id: int, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Đồng bộ nhiều sessions (kèm pauses và task links) từ client trong một transaction
+
+        Mỗi bảng chỉ tốn một câu INSERT nhiều rows ... RETURNING. client_uuid là idempotency key
+        (unique theo user): session đã được sync trước đó không bị tạo lại, pauses/task links của nó
+        cũng được bỏ qua và kết quả trả về ID đã có.
+
+        Args:
+            user_id: ID của user
+            items: Danh sách sessions (SessionSyncItem.model_dump())
 
+        Returns:
+            Danh sách {client_uuid, session_id, created, pause_ids, task_session_ids} theo thứ tự items
+        """
+        # client_uuid trùng trong cùng một request => chỉ lấy lần xuất hiện đầu tiên
+        unique_items: Dict[str, Dict[str, Any]] = {}
+        for item in items:
+            unique_items.setdefault(item["client_uuid"], item)
+
+        # Các task được link phải tồn tại và thuộc về user (một query)
+        task_ids = {link["task_id"] for item in unique_items.values() for link in item.get("task_links") or []}
+        if task_ids:
+            owners = dict(db.session.execute(
+                select(TaskEntity.task_id, TaskEntity.user_id).where(TaskEntity.task_id.in_(task_ids))
+            ).all())
+            if task_ids - owners.keys():
+                raise CustomException(exception=ExceptionType.NOT_FOUND)
+            if any(owner != user_id for owner in owners.values()):
+                raise CustomException(exception=ExceptionType.FORBIDDEN)
+
+        tz = UserTimezoneService.get_timezone(user_id)
+        now = time_utils.timestamp_now()
+        session_rows: Dict[str, Dict[str, Any]] = {}
+        for client_uuid, item in unique_items.items():
+            row = {field: item.get(field) for field in SESSION_SYNC_FIELDS}
+            for field in ("session_date", "start_time", "end_time"):
+                row[field] = time_utils.to_epoch_ms(row[field])
+            row["local_day"], row["local_week"], row["local_month"] = UserTimezoneService.local_keys(
+                row["session_date"], tz
+            )
+            row.update(user_id=user_id, client_uuid=client_uuid, created_at=now, updated_at=now)
+            session_rows[client_uuid] = row
+
+        session_table = SessionEntity.__table__
+        pause_table = SessionPauseEntity.__table__
+        link_table = TaskSessionEntity.__table__
+        try:
+            connection = db.session.connection()
+
+            # 1. Sessions: bỏ qua client_uuid đã tồn tại
+            stmt = pg_insert(session_table).values(list(session_rows.values()))
+            stmt = stmt.on_conflict_do_nothing(
+                index_elements=[session_table.c.user_id, session_table.c.client_uuid]
+            ).returning(session_table.c.session_id, session_table.c.client_uuid)
+            created_ids = {row.client_uuid: row.session_id for row in connection.execute(stmt)}
+
+            existing_ids: Dict[str, int] = {}
+            missing = [client_uuid for client_uuid in session_rows if client_uuid not in created_ids]
+            if missing:
+                existing_ids = {
+                    row.client_uuid: row.session_id
+                    for row in connection.execute(
+                        select(session_table.c.session_id, session_table.c.client_uuid).where(
+                            session_table.c.user_id == user_id,
+                            session_table.c.client_uuid.in_(missing),
+                        )
+                    )
+                }
+
+            # 2. Pauses và task links của các sessions mới (RETURNING theo đúng thứ tự rows gửi vào)
+            pause_rows, pause_owners = [], []
+            link_rows, link_owners = [], []
+            for client_uuid, session_id in created_ids.items():
+                item = unique_items[client_uuid]
+                for pause in item.get("pauses") or []:
+                    pause_rows.append({
+                        "session_id": session_id,
+                        "pause_start": time_utils.to_epoch_ms(pause.get("pause_start")),
+                        "pause_end": time_utils.to_epoch_ms(pause.get("pause_end")),
+                        "pause_duration": pause.get("pause_duration"),
+                        "created_at": now,
+                        "updated_at": now,
+                    })
+                    pause_owners.append(client_uuid)
+                for link in item.get("task_links") or []:
+                    link_rows.append({
+                        "session_id": session_id,
+                        "task_id": link["task_id"],
+                        "time_spent": link.get("time_spent"),
+                        "notes": link.get("notes"),
+                        "created_at": now,
+                        "updated_at": now,
+                    })
+                    link_owners.append(client_uuid)
+
+            pause_ids: Dict[str, List[int]] = defaultdict(list)
+            if pause_rows:
+                result = connection.execute(
+                    insert(pause_table).returning(pause_table.c.pause_id, sort_by_parameter_order=True),
+                    pause_rows,
+                )
+                for client_uuid, row, pause_id in zip(pause_owners, pause_rows, result.scalars()):
+                    row["pause_id"] = pause_id
+                    pause_ids[client_uuid].append(pause_id)
+
+            link_ids: Dict[str, List[int]] = defaultdict(list)
+            if link_rows:
+                result = connection.execute(
+                    insert(link_table).returning(link_table.c.task_session_id, sort_by_parameter_order=True),
+                    link_rows,
+                )
+                for client_uuid, row, task_session_id in zip(link_owners, link_rows, result.scalars()):
+                    row["task_session_id"] = task_session_id
+                    link_ids[client_uuid].append(task_session_id)
+
+            # 3. Sessions đã sync trước đó: trả về ID pauses/task links đã có (theo thứ tự tạo)
+            if existing_ids:
+                client_uuid_by_session = {session_id: client_uuid for client_uuid, session_id in existing_ids.items()}
+                for row in connection.execute(
+                    select(pause_table.c.session_id, pause_table.c.pause_id)
+                    .where(pause_table.c.session_id.in_(client_uuid_by_session))
+                    .order_by(pause_table.c.pause_id)
+                ):
+                    pause_ids[client_uuid_by_session[row.session_id]].append(row.pause_id)
+                for row in connection.execute(
+                    select(link_table.c.session_id, link_table.c.task_session_id)
+                    .where(link_table.c.session_id.in_(client_uuid_by_session))
+                    .order_by(link_table.c.task_session_id)
+                ):
+                    link_ids[client_uuid_by_session[row.session_id]].append(row.task_session_id)
+
+            # Core INSERT không qua ORM flush => tự chạy handlers cho sessions, pauses và task links
+            change_capture.capture(db.session, [
+                *(
+                    Change(SessionEntity, None, {**session_rows[client_uuid], "session_id": session_id})
+                    for client_uuid, session_id in created_ids.items()
+                ),
+                *(Change(SessionPauseEntity, None, row) for row in pause_rows),
+                *(Change(TaskSessionEntity, None, row) for row in link_rows),
+            ])
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        results = []
+        for item in items:
+            client_uuid = item["client_uuid"]
+            results.append({
+                "client_uuid": client_uuid,
+                "session_id": created_ids.get(client_uuid, existing_ids.get(client_uuid)),
+                # client_uuid lặp lại trong request chỉ được tính là tạo mới ở lần đầu
+                "created": client_uuid in created_ids and unique_items[client_uuid] is item,
+                "pause_ids": pause_ids.get(client_uuid, []),
+                "task_session_ids": link_ids.get(client_uuid, []),
+            })
+        return results
+
+
+class SessionPauseService(UserScopedService[SessionPauseEntity]):
+
+    def __init__(self):
+        super().__init__(SessionPauseEntity, parent=SessionEntity, parent_key="session_id")
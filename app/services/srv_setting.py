@@ -1,11 +1,12 @@
 from fastapi_sqlalchemy import db
 from app.models.model_setting import UserSettingEntity, DefaultSettingEntity
 from app.services.srv_base import BaseService
+from app.services.srv_user_scoped import UserScopedService
 from app.utils.exception_handler import CustomException, ExceptionType
 from typing import Any, Dict
 
 
-class UserSettingService(BaseService[UserSettingEntity]):
+class UserSettingService(UserScopedService[UserSettingEntity]):
 
     def __init__(self):
         super().__init__(UserSettingEntity)
@@ -1,13 +1,32 @@
 from fastapi_sqlalchemy import db
-from app.models.model_statistics import StatisticsCacheEntity, StreakRecordEntity
+from app.models.model_statistics import StatisticsCacheEntity, StreakRecordEntity, UserStreakEntity
 from app.models.model_session import SessionEntity
 from app.models.model_task import TaskEntity
 from app.models.model_goal import GoalEntity
+from app.models.model_user_entity import UserEntity
 from app.services.srv_base import BaseService
+from app.services.srv_rollup import ActivityRollupService
+from app.services.srv_user_timezone import UserTimezoneService
 from app.utils.exception_handler import CustomException, ExceptionType
-from typing import Any, Dict, Optional
-from sqlalchemy import func, and_, case
-from datetime import datetime, timezone, timedelta
+from app.utils import change_capture, metrics, time_utils
+from app.utils.change_capture import Change
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Set, Tuple
+from sqlalchemy import func, and_, or_, case, cast, delete, insert, literal, select, update, Integer
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from datetime import date as date_type
+
+MAX_RANGE_DAYS = 731
+
+CACHED_STATISTICS_FIELDS = (
+    "total_sessions",
+    "total_focus_time",
+    "total_break_time",
+    "completed_tasks",
+    "goal_achieved",
+)
 
 
 class StatisticsCacheService(BaseService[StatisticsCacheEntity]):
@@ -37,90 +56,198 @@ class StatisticsCacheService(BaseService[StatisticsCacheEntity]):
     @staticmethod
     def calculate_statistics_from_sessions(
         user_id: int,
-        start_timestamp: float,
-        end_timestamp: float
+        start_day: int,
+        end_day: int
     ) -> Dict[str, Any]:
         """
-        Tính toán statistics từ sessions, tasks, goals trong khoảng thời gian
+        Tính toán statistics từ sessions, tasks, goals trong khoảng ngày
+        
+        Đọc từ bảng rollup user_daily_activity (theo ngày lịch của user) thay vì quét toàn bộ lịch sử.
         
         Args:
             user_id: ID của user
-            start_timestamp: Timestamp bắt đầu (inclusive)
-            end_timestamp: Timestamp kết thúc (inclusive)
+            start_day: day_key ngày bắt đầu (inclusive)
+            end_day: day_key ngày kết thúc (inclusive)
             
         Returns:
             Dict chứa các metrics
         """
-        # 1. Tính sessions và focus time
-        sessions_query = db.session.query(
-            func.sum(
-                case(
-                    (SessionEntity.session_type == SessionEntity.TYPE_FOCUS_SESSION, SessionEntity.duration_minutes),
-                    else_=0
-                )
-            ).label("total_focus_time"),
-            func.sum(
-                case(
-                    (SessionEntity.session_type.in_([SessionEntity.TYPE_SHORT_BREAK, SessionEntity.TYPE_LONG_BREAK]), SessionEntity.duration_minutes),
-                    else_=0
-                )
-            ).label("total_break_time"),
-            func.count(
-                case(
-                    (SessionEntity.session_type == SessionEntity.TYPE_FOCUS_SESSION, SessionEntity.session_id),
-                    else_=None
-                )
-            ).label("total_sessions")
-        ).filter(
-            SessionEntity.user_id == user_id,
-            SessionEntity.status == SessionEntity.STATUS_COMPLETED,
-            SessionEntity.session_date >= start_timestamp,
-            SessionEntity.session_date <= end_timestamp
+        totals = ActivityRollupService.get_totals(
+            [user_id],
+            start_day=start_day,
+            end_day=end_day,
+        )[user_id]
+        
+        return {
+            "total_sessions": totals["session_count"],
+            "total_focus_time": totals["focus_minutes"],
+            "total_break_time": totals["break_minutes"],
+            "completed_tasks": totals["completed_tasks"],
+            "goal_achieved": totals["achieved_goals"]
+        }
+
+    @staticmethod
+    def get_cached_statistics(
+        user_id: int,
+        cache_type: str,
+        cache_date: float,
+        start_day: int,
+        end_day: int
+    ) -> Dict[str, Any]:
+        """
+        Read-through cache trên bảng statistics_cache (key: user_id + cache_date + cache_type)
+        
+        Row có cached_at là hợp lệ; row có cached_at = NULL đã bị invalidate bởi một lần ghi
+        sessions/tasks/goals của user trong kỳ đó (xem invalidate_changes) và phải tính lại.
+        Chỉ ghi lại cache nếu row không bị invalidate thêm lần nữa trong lúc đang tính
+        (so sánh updated_at), tránh ghi đè số liệu cũ lên một lần ghi vừa commit.
+        
+        Args:
+            user_id: ID của user
+            cache_type: StatisticsCacheEntity.TYPE_DAILY hoặc TYPE_MONTHLY
+            cache_date: day_key đầu kỳ * 86400 (00:00 UTC của ngày lịch đầu kỳ, không phụ thuộc timezone)
+            start_day: day_key ngày bắt đầu kỳ (inclusive)
+            end_day: day_key ngày kết thúc kỳ (inclusive)
+            
+        Returns:
+            Dict chứa các metrics
+        """
+        table = StatisticsCacheEntity.__table__
+        cache_key = and_(
+            table.c.user_id == user_id,
+            table.c.cache_date == cache_date,
+            table.c.cache_type == cache_type,
+        )
+        metric_name = f"statistics_cache.{cache_type.lower()}"
+        
+        cached = db.session.execute(
+            select(
+                table.c.cached_at,
+                table.c.updated_at,
+                *[table.c[field] for field in CACHED_STATISTICS_FIELDS],
+            ).where(cache_key)
         ).first()
+        if cached is not None and cached.cached_at is not None:
+            metrics.increment(f"{metric_name}.hit")
+            return {field: int(getattr(cached, field) or 0) for field in CACHED_STATISTICS_FIELDS}
         
-        # Xử lý trường hợp không có dữ liệu
-        if sessions_query is None:
-            total_focus_time = 0
-            total_break_time = 0
-            total_sessions = 0
+        metrics.increment(f"{metric_name}.miss")
+        stats = StatisticsCacheService.calculate_statistics_from_sessions(
+            user_id, start_day, end_day
+        )
+        
+        now = time_utils.timestamp_now()
+        if cached is None:
+            stmt = pg_insert(table).values(
+                user_id=user_id,
+                cache_date=cache_date,
+                cache_type=cache_type,
+                cached_at=now,
+                created_at=now,
+                updated_at=now,
+                **stats,
+            ).on_conflict_do_nothing(
+                index_elements=[table.c.user_id, table.c.cache_date, table.c.cache_type]
+            )
         else:
-            total_focus_time = int(sessions_query.total_focus_time or 0)
-            total_break_time = int(sessions_query.total_break_time or 0)
-            total_sessions = int(sessions_query.total_sessions or 0)
-        
-        # 2. Tính completed tasks (chỉ tính những task có completed_at trong khoảng thời gian)
-        tasks_query = db.session.query(
-            func.count(TaskEntity.task_id)
-        ).filter(
-            TaskEntity.user_id == user_id,
-            TaskEntity.is_completed == 1,
-            TaskEntity.completed_at.isnot(None),
-            TaskEntity.completed_at >= start_timestamp,
-            TaskEntity.completed_at <= end_timestamp
-        ).scalar()
-        
-        completed_tasks = int(tasks_query or 0)
-        
-        # 3. Tính goals achieved (chỉ tính những goal có achieved_at trong khoảng thời gian)
-        goals_query = db.session.query(
-            func.count(GoalEntity.goal_id)
-        ).filter(
-            GoalEntity.user_id == user_id,
-            GoalEntity.is_achieved == 1,
-            GoalEntity.achieved_at.isnot(None),
-            GoalEntity.achieved_at >= start_timestamp,
-            GoalEntity.achieved_at <= end_timestamp
-        ).scalar()
-        
-        goal_achieved = int(goals_query or 0)
+            stmt = update(table).where(
+                cache_key,
+                table.c.cached_at.is_(None),
+                table.c.updated_at == cached.updated_at,
+            ).values(cached_at=now, updated_at=now, **stats)
         
-        return {
-            "total_sessions": total_sessions,
-            "total_focus_time": total_focus_time,
-            "total_break_time": total_break_time,
-            "completed_tasks": completed_tasks,
-            "goal_achieved": goal_achieved
-        }
+        try:
+            db.session.execute(stmt)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        
+        return stats
+
+    @staticmethod
+    def invalidate_changes(session: Session, changes: List[Change]) -> None:
+        """
+        Đánh dấu cache DAILY/MONTHLY của các (user, kỳ) bị ảnh hưởng bởi changes là hết hạn.
+        Chạy trong cùng transaction với lần ghi; kỳ không có thay đổi số liệu giữ nguyên cache.
+        """
+        keys = set()
+        for user_id, day in ActivityRollupService.compute_deltas(changes, session.connection()):
+            keys.add((user_id, float(day * time_utils.SECONDS_PER_DAY), StatisticsCacheEntity.TYPE_DAILY))
+            keys.add((
+                user_id,
+                float(time_utils.month_start_day(day) * time_utils.SECONDS_PER_DAY),
+                StatisticsCacheEntity.TYPE_MONTHLY,
+            ))
+        if not keys:
+            return
+        
+        # Upsert theo thứ tự cố định để các transaction đồng thời lock rows cùng thứ tự
+        now = time_utils.timestamp_now()
+        table = StatisticsCacheEntity.__table__
+        stmt = pg_insert(table).values([
+            {
+                "user_id": user_id,
+                "cache_date": cache_date,
+                "cache_type": cache_type,
+                "cached_at": None,
+                "created_at": now,
+                "updated_at": now,
+            }
+            for user_id, cache_date, cache_type in sorted(keys)
+        ])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.user_id, table.c.cache_date, table.c.cache_type],
+            set_={"cached_at": None, "updated_at": stmt.excluded.updated_at},
+        )
+        session.connection().execute(stmt)
+
+    @staticmethod
+    def _invalidate_users(session: Session, user_ids: List[int]) -> None:
+        table = StatisticsCacheEntity.__table__
+        session.connection().execute(
+            update(table).where(
+                table.c.user_id.in_(user_ids),
+                table.c.cache_type.in_([StatisticsCacheEntity.TYPE_DAILY, StatisticsCacheEntity.TYPE_MONTHLY]),
+            ).values(cached_at=None, updated_at=time_utils.timestamp_now())
+        )
+
+    @staticmethod
+    def on_user_changes(session: Session, changes: List[Change]) -> None:
+        # Đổi timezone => rollup của user đã được rebuild, toàn bộ cache của user hết hạn
+        user_ids = UserTimezoneService.changed_user_ids(changes)
+        if user_ids:
+            StatisticsCacheService._invalidate_users(session, user_ids)
+
+    @staticmethod
+    def invalidate_user(user_id: int) -> None:
+        """
+        Đánh dấu toàn bộ cache DAILY/MONTHLY của user là hết hạn (vd: sau khi rebuild rollup)
+        """
+        try:
+            StatisticsCacheService._invalidate_users(db.session, [user_id])
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+    @staticmethod
+    def get_cache_metrics() -> Dict[str, Any]:
+        """
+        Số lần hit/miss của read-through cache (tính trong process hiện tại)
+        """
+        counters = metrics.get_counters("statistics_cache.")
+        result = {}
+        for cache_type in (StatisticsCacheEntity.TYPE_DAILY, StatisticsCacheEntity.TYPE_MONTHLY):
+            name = f"statistics_cache.{cache_type.lower()}"
+            hits = counters.get(f"{name}.hit", 0)
+            misses = counters.get(f"{name}.miss", 0)
+            result[cache_type.lower()] = {
+                "hits": hits,
+                "misses": misses,
+                "hit_ratio": round(hits / (hits + misses), 4) if hits + misses else 0.0,
+            }
+        return result
 
     @staticmethod
     def get_daily_statistics(user_id: int, date: float) -> Dict[str, Any]:
@@ -129,37 +256,105 @@ class StatisticsCacheService(BaseService[StatisticsCacheEntity]):
         
         Args:
             user_id: ID của user
-            date: Timestamp của ngày (bất kỳ thời điểm nào trong ngày, có thể là seconds hoặc milliseconds)
+            date: Timestamp của ngày (bất kỳ thời điểm nào trong ngày, có thể là seconds hoặc milliseconds),
+                ngày được xác định theo timezone của user
             
         Returns:
             Dict chứa statistics của ngày đó
         """
-        # Kiểm tra xem date là milliseconds hay seconds
-        # Nếu > 1e10 thì là milliseconds, cần convert về seconds
-        if date > 1e10:
-            date = date / 1000.0
+        tz = UserTimezoneService.get_timezone(user_id)
+        day = time_utils.local_day_key(date, tz)
+        
+        stats = StatisticsCacheService.get_cached_statistics(
+            user_id, StatisticsCacheEntity.TYPE_DAILY, float(day * time_utils.SECONDS_PER_DAY), day, day
+        )
+        
+        # Thêm thông tin về ngày (date là 00:00 theo giờ địa phương của user)
+        stats["date"] = time_utils.local_day_start(day, tz)
+        stats["date_string"] = time_utils.day_key_to_date(day).strftime("%Y-%m-%d")
+        
+        return stats
+
+    @staticmethod
+    def get_range_statistics(
+        user_id: int,
+        start_date: float,
+        end_date: float,
+        bucket: str = "day"
+    ) -> Dict[str, Any]:
+        """
+        Lấy chuỗi statistics trong khoảng [start_date, end_date] gom theo ngày/tuần/tháng
         
-        # Normalize về 00:00:00 của ngày đó
-        input_date = datetime.fromtimestamp(date, tz=timezone.utc)
-        start_of_day = input_date.replace(hour=0, minute=0, second=0, microsecond=0)
-        end_of_day = start_of_day + timedelta(days=1) - timedelta(seconds=1)
+        Toàn bộ chuỗi lấy từ rollup bằng một query GROUP BY; bucket không có hoạt động
+        được điền 0 để client vẽ chart trực tiếp. Bucket tuần/tháng ở hai đầu khoảng
+        chỉ tính các ngày nằm trong khoảng: bucket_start/bucket_end của chúng được giới hạn
+        trong [start_date, end_date]. Ngày được xác định theo timezone của user.
         
-        start_timestamp = start_of_day.timestamp()
-        end_timestamp = end_of_day.timestamp()
+        Args:
+            user_id: ID của user
+            start_date: Timestamp ngày bắt đầu (seconds hoặc milliseconds, inclusive)
+            end_date: Timestamp ngày kết thúc (seconds hoặc milliseconds, inclusive)
+            bucket: "day", "week" hoặc "month"
+            
+        Returns:
+            Dict chứa start_date, end_date, bucket và danh sách items
+        """
+        tz = UserTimezoneService.get_timezone(user_id)
+        start_day = time_utils.local_day_key(start_date, tz)
+        end_day = time_utils.local_day_key(end_date, tz)
+        if end_day < start_day:
+            raise CustomException(http_code=400, message="end_date must be greater than or equal to start_date")
+        if end_day - start_day + 1 > MAX_RANGE_DAYS:
+            raise CustomException(http_code=400, message=f"Date range must not exceed {MAX_RANGE_DAYS} days")
         
-        # Convert sang milliseconds để so sánh với session_date trong DB
-        start_timestamp_ms = start_timestamp * 1000
-        end_timestamp_ms = end_timestamp * 1000
+        if bucket == "week":
+            key_field, bucket_key = "week_key", time_utils.week_key
+        elif bucket == "month":
+            key_field, bucket_key = "month_key", time_utils.month_key
+        else:
+            key_field, bucket_key = "day_key", (lambda day: day)
         
-        stats = StatisticsCacheService.calculate_statistics_from_sessions(
-            user_id, start_timestamp_ms, end_timestamp_ms
-        )
+        series = ActivityRollupService.get_series(user_id, start_day, end_day, key_field)
         
-        # Thêm thông tin về ngày
-        stats["date"] = start_timestamp
-        stats["date_string"] = start_of_day.strftime("%Y-%m-%d")
+        items = []
+        seen = set()
+        for day in range(start_day, end_day + 1):
+            key = bucket_key(day)
+            if key in seen:
+                continue
+            seen.add(key)
+            
+            # day là ngày đầu tiên của bucket nằm trong khoảng
+            value = time_utils.day_key_to_date(day)
+            if bucket == "week":
+                iso_year, iso_week, _ = value.isocalendar()
+                last_day = time_utils.week_start_day(day) + 6
+                label = f"{iso_year}-W{iso_week:02d}"
+            elif bucket == "month":
+                last_day = time_utils.month_end_day(day)
+                label = value.strftime("%Y-%m")
+            else:
+                last_day = day
+                label = value.strftime("%Y-%m-%d")
+            
+            totals = series.get(key, {})
+            items.append({
+                "bucket_start": time_utils.local_day_start(day, tz),
+                "bucket_end": time_utils.local_day_start(min(last_day, end_day), tz),
+                "label": label,
+                "total_sessions": totals.get("session_count", 0),
+                "total_focus_time": totals.get("focus_minutes", 0),
+                "total_break_time": totals.get("break_minutes", 0),
+                "completed_tasks": totals.get("completed_tasks", 0),
+                "goal_achieved": totals.get("achieved_goals", 0),
+            })
         
-        return stats
+        return {
+            "start_date": time_utils.local_day_start(start_day, tz),
+            "end_date": time_utils.local_day_start(end_day, tz),
+            "bucket": bucket,
+            "items": items,
+        }
 
     @staticmethod
     def get_monthly_statistics(user_id: int, year: int, month: int) -> Dict[str, Any]:
@@ -174,22 +369,16 @@ class StatisticsCacheService(BaseService[StatisticsCacheEntity]):
         Returns:
             Dict chứa statistics của tháng đó
         """
-        # Tính start và end của tháng
-        start_of_month = datetime(year, month, 1, 0, 0, 0, tzinfo=timezone.utc)
+        # Ngày đầu và cuối tháng (ngày lịch của user, rollup đã gom theo timezone của user)
+        start_of_month = date_type(year, month, 1)
+        start_day = time_utils.date_to_day_key(start_of_month)
         if month == 12:
-            end_of_month = datetime(year + 1, 1, 1, 0, 0, 0, tzinfo=timezone.utc) - timedelta(seconds=1)
+            end_day = time_utils.date_to_day_key(date_type(year + 1, 1, 1)) - 1
         else:
-            end_of_month = datetime(year, month + 1, 1, 0, 0, 0, tzinfo=timezone.utc) - timedelta(seconds=1)
-        
-        start_timestamp = start_of_month.timestamp()
-        end_timestamp = end_of_month.timestamp()
-        
-        # Convert sang milliseconds để so sánh với session_date trong DB
-        start_timestamp_ms = start_timestamp * 1000
-        end_timestamp_ms = end_timestamp * 1000
+            end_day = time_utils.date_to_day_key(date_type(year, month + 1, 1)) - 1
         
-        stats = StatisticsCacheService.calculate_statistics_from_sessions(
-            user_id, start_timestamp_ms, end_timestamp_ms
+        stats = StatisticsCacheService.get_cached_statistics(
+            user_id, StatisticsCacheEntity.TYPE_MONTHLY, float(start_day * time_utils.SECONDS_PER_DAY), start_day, end_day
         )
         
         # Thêm thông tin về tháng
@@ -200,8 +389,366 @@ class StatisticsCacheService(BaseService[StatisticsCacheEntity]):
         return stats
 
 
+for _model in (SessionEntity, TaskEntity, GoalEntity):
+    change_capture.register(_model, StatisticsCacheService.invalidate_changes)
+change_capture.register(UserEntity, StatisticsCacheService.on_user_changes)
+
+
 class StreakRecordService(BaseService[StreakRecordEntity]):
 
     def __init__(self):
         super().__init__(StreakRecordEntity)
 
+    @staticmethod
+    def _normalize_day(data: Dict[str, Any], user_id: Optional[int]) -> Dict[str, Any]:
+        """
+        Set streak_day là ngày lịch của streak_date theo timezone của user
+        và normalize streak_date về day_key * 86400 (00:00 UTC của ngày lịch đó)
+        """
+        data = dict(data)
+        if data.get("streak_date") is not None:
+            tz = UserTimezoneService.get_timezone(user_id) if user_id is not None else None
+            day = time_utils.local_day_key(data["streak_date"], tz)
+            data["streak_day"] = day
+            data["streak_date"] = float(day * time_utils.SECONDS_PER_DAY)
+        return data
+
+    def create(self, data: Dict[str, Any]) -> StreakRecordEntity:
+        """
+        Create a new StreakRecordEntity with duplicate check for user_id + streak_day
+        """
+        data = self._normalize_day(data, data.get("user_id"))
+        if data.get("user_id") is not None and data.get("streak_day") is not None:
+            existing = self.check_duplicate({
+                "user_id": data["user_id"],
+                "streak_day": data["streak_day"]
+            })
+            if existing:
+                raise CustomException(exception=ExceptionType.DUPLICATE_ENTRY)
+        
+        return super().create(data)
+
+    def update_by_id(
+        self, pk_value: Any, data: Dict[str, Any], owner_id: Optional[int] = None
+    ) -> StreakRecordEntity:
+        try:
+            user_id = data.get("user_id") or owner_id
+            if user_id is None and data.get("streak_date") is not None:
+                user_id = self.get_by_id(pk_value).user_id
+            return super().update_by_id(pk_value, self._normalize_day(data, user_id), owner_id=owner_id)
+        except IntegrityError:
+            raise CustomException(exception=ExceptionType.DUPLICATE_ENTRY)
+
+    def partial_update_by_id(
+        self, pk_value: Any, data: Dict[str, Any], owner_id: Optional[int] = None
+    ) -> StreakRecordEntity:
+        try:
+            user_id = data.get("user_id") or owner_id
+            if user_id is None and data.get("streak_date") is not None:
+                user_id = self.get_by_id(pk_value).user_id
+            return super().partial_update_by_id(pk_value, self._normalize_day(data, user_id), owner_id=owner_id)
+        except IntegrityError:
+            raise CustomException(exception=ExceptionType.DUPLICATE_ENTRY)
+
+    def upsert_day(self, user_id: int, data: Dict[str, Any]) -> Tuple[Dict[str, Any], bool]:
+        """
+        Ghi nhận activity cho một ngày bằng một câu INSERT ... ON CONFLICT (user_id, streak_day) DO UPDATE
+        
+        Nếu ngày đã có record thì cộng dồn session_count/focus_time, has_activity giữ giá trị lớn nhất.
+        Giá trị cũ của record được đọc trong cùng câu lệnh (CTE, theo snapshot đầu câu lệnh)
+        để cập nhật user_streaks.
+        
+        Returns:
+            (record dạng dict, True nếu record mới được tạo)
+        """
+        try:
+            result = self._upsert_day(db.session, user_id, data)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        return result
+
+    @staticmethod
+    def _upsert_day(session: Session, user_id: int, data: Dict[str, Any]) -> Tuple[Dict[str, Any], bool]:
+        """
+        Như upsert_day nhưng không commit (dùng trong transaction của caller)
+        """
+        data = StreakRecordService._normalize_day(data, user_id)
+        table = StreakRecordEntity.__table__
+        now = time_utils.timestamp_now()
+        
+        previous = select(
+            table.c.streak_id,
+            table.c.has_activity,
+            table.c.session_count,
+            table.c.focus_time,
+        ).where(
+            table.c.user_id == user_id,
+            table.c.streak_day == data["streak_day"],
+        ).cte("previous")
+        
+        stmt = pg_insert(table).values(
+            user_id=user_id,
+            streak_date=data["streak_date"],
+            streak_day=data["streak_day"],
+            has_activity=data.get("has_activity") or 0,
+            session_count=data.get("session_count") or 0,
+            focus_time=data.get("focus_time") or 0,
+            created_at=now,
+            updated_at=now,
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.user_id, table.c.streak_day],
+            set_={
+                "has_activity": func.greatest(func.coalesce(table.c.has_activity, 0), stmt.excluded.has_activity),
+                "session_count": func.coalesce(table.c.session_count, 0) + stmt.excluded.session_count,
+                "focus_time": func.coalesce(table.c.focus_time, 0) + stmt.excluded.focus_time,
+                "updated_at": stmt.excluded.updated_at,
+            },
+        ).returning(
+            *table.c,
+            *[
+                select(previous.c[column]).scalar_subquery().label(f"previous_{column}")
+                for column in ("streak_id", "has_activity", "session_count", "focus_time")
+            ],
+        )
+        
+        row = session.execute(stmt).mappings().one()
+        record = {column.key: row[column.key] for column in table.c}
+        old = None
+        if row["previous_streak_id"] is not None:
+            old = {
+                **record,
+                "has_activity": row["previous_has_activity"],
+                "session_count": row["previous_session_count"],
+                "focus_time": row["previous_focus_time"],
+            }
+        change_capture.capture(session, [Change(StreakRecordEntity, old, record)])
+        return record, old is None
+
+
+
+class UserStreakService:
+    """
+    Duy trì bảng user_streaks từ streak_records.
+    Ngày có activity mới sau last_active_day được cập nhật O(1) bằng một câu upsert;
+    các thay đổi khác (xoá, sửa ngày cũ, thêm ngày trong quá khứ) tính lại streak của user đó.
+    """
+
+    @staticmethod
+    def _active_day(row: Optional[Dict[str, Any]]) -> Optional[int]:
+        if not row or row.get("user_id") is None:
+            return None
+        if row.get("has_activity") != 1 or row.get("streak_day") is None:
+            return None
+        return row["streak_day"]
+
+    @staticmethod
+    def on_changes(session: Session, changes: List[Change]) -> None:
+        added: Dict[int, Set[int]] = defaultdict(set)
+        repair_user_ids: Set[int] = set()
+        for change in changes:
+            old_day = UserStreakService._active_day(change.old)
+            new_day = UserStreakService._active_day(change.new)
+            old_key = (change.old["user_id"], old_day) if old_day is not None else None
+            new_key = (change.new["user_id"], new_day) if new_day is not None else None
+            if old_key == new_key:
+                continue
+            if old_key is not None:
+                repair_user_ids.add(old_key[0])
+            if new_key is not None:
+                added[new_key[0]].add(new_key[1])
+
+        for user_id, days in added.items():
+            if user_id in repair_user_ids:
+                continue
+            for day in sorted(days):
+                if not UserStreakService._advance(session, user_id, day):
+                    repair_user_ids.add(user_id)
+                    break
+
+        if repair_user_ids:
+            UserStreakService._repair(session, sorted(repair_user_ids))
+
+    @staticmethod
+    def _advance(session: Session, user_id: int, day: int) -> bool:
+        """
+        Ghi nhận ngày có activity mới nằm sau last_active_day (O(1)).
+        Trả về False nếu day không sau last_active_day (cần tính lại).
+        """
+        now = time_utils.timestamp_now()
+        table = UserStreakEntity.__table__
+        current_streak = case(
+            (table.c.last_active_day == day - 1, table.c.current_streak + 1),
+            else_=1,
+        )
+        stmt = pg_insert(table).values(
+            user_id=user_id,
+            current_streak=1,
+            best_streak=1,
+            last_active_day=day,
+            total_active_days=1,
+            created_at=now,
+            updated_at=now,
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.user_id],
+            set_={
+                "current_streak": current_streak,
+                "best_streak": func.greatest(table.c.best_streak, current_streak),
+                "last_active_day": day,
+                "total_active_days": table.c.total_active_days + 1,
+                "updated_at": now,
+            },
+            where=or_(table.c.last_active_day.is_(None), table.c.last_active_day < day),
+        ).returning(table.c.user_streak_id)
+        return session.connection().execute(stmt).first() is not None
+
+    @staticmethod
+    def _repair(session: Session, user_ids: Optional[List[int]] = None) -> None:
+        """
+        Tính lại user_streaks từ streak_records (gaps-and-islands, set-wise).
+        user_ids=None sẽ tính lại cho tất cả users.
+        """
+        record = StreakRecordEntity.__table__
+        days_select = select(
+            record.c.user_id.label("user_id"),
+            record.c.streak_day.label("day"),
+        ).where(
+            record.c.has_activity == 1,
+            record.c.streak_day.isnot(None),
+        )
+        if user_ids is not None:
+            days_select = days_select.where(record.c.user_id.in_(user_ids))
+        days = days_select.distinct().subquery()
+
+        # Các ngày liên tiếp có cùng (day - row_number) => mỗi nhóm là một chuỗi
+        islands = select(
+            days.c.user_id,
+            days.c.day,
+            (days.c.day - func.row_number().over(
+                partition_by=days.c.user_id,
+                order_by=days.c.day,
+            )).label("island"),
+        ).subquery()
+        runs = select(
+            islands.c.user_id,
+            func.count().label("length"),
+            func.max(islands.c.day).label("last_day"),
+        ).group_by(islands.c.user_id, islands.c.island).subquery()
+        ranked = select(
+            runs.c.user_id,
+            runs.c.length,
+            runs.c.last_day,
+            func.max(runs.c.last_day).over(partition_by=runs.c.user_id).label("last_active_day"),
+        ).subquery()
+
+        now = time_utils.timestamp_now()
+        state_select = select(
+            ranked.c.user_id,
+            cast(func.max(case((ranked.c.last_day == ranked.c.last_active_day, ranked.c.length), else_=0)), Integer),
+            cast(func.max(ranked.c.length), Integer),
+            cast(func.max(ranked.c.last_active_day), Integer),
+            cast(func.sum(ranked.c.length), Integer),
+            literal(now),
+            literal(now),
+        ).group_by(ranked.c.user_id)
+
+        table = UserStreakEntity.__table__
+        delete_stmt = delete(table)
+        if user_ids is not None:
+            delete_stmt = delete_stmt.where(table.c.user_id.in_(user_ids))
+
+        connection = session.connection()
+        connection.execute(delete_stmt)
+        connection.execute(
+            insert(table).from_select(
+                ["user_id", "current_streak", "best_streak", "last_active_day",
+                 "total_active_days", "created_at", "updated_at"],
+                state_select,
+            )
+        )
+
+    @staticmethod
+    def rebuild(user_id: Optional[int] = None) -> int:
+        """
+        Backfill/repair user_streaks từ streak_records (một transaction).
+        user_id=None sẽ rebuild cho tất cả users. Trả về số users có streak state.
+        """
+        try:
+            UserStreakService._repair(db.session, [user_id] if user_id is not None else None)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        count_query = db.session.query(func.count(UserStreakEntity.user_streak_id))
+        if user_id is not None:
+            count_query = count_query.filter(UserStreakEntity.user_id == user_id)
+        return int(count_query.scalar() or 0)
+
+    @staticmethod
+    def get_states(user_ids: List[int]) -> Dict[int, Dict[str, int]]:
+        """
+        Streak của nhiều users (một query). current_streak chỉ tính khi chuỗi kéo dài tới hôm nay
+        (theo timezone của từng user).
+        """
+        states = {
+            uid: {"current_streak": 0, "best_streak": 0, "total_active_days": 0}
+            for uid in user_ids
+        }
+        if not user_ids:
+            return states
+
+        timezones = UserTimezoneService.get_timezones(user_ids)
+        rows = db.session.query(
+            UserStreakEntity.user_id,
+            UserStreakEntity.current_streak,
+            UserStreakEntity.best_streak,
+            UserStreakEntity.last_active_day,
+            UserStreakEntity.total_active_days,
+        ).filter(UserStreakEntity.user_id.in_(user_ids)).all()
+        for row in rows:
+            states[row.user_id] = {
+                "current_streak": (
+                    row.current_streak
+                    if row.last_active_day == time_utils.local_today(timezones[row.user_id])
+                    else 0
+                ),
+                "best_streak": row.best_streak,
+                "total_active_days": row.total_active_days,
+            }
+        return states
+
+    @staticmethod
+    def get_best_streaks(user_ids: List[int], start_day: int, end_day: int) -> Dict[int, int]:
+        """
+        Chuỗi ngày có activity dài nhất trong [start_day, end_day] của nhiều users (một query).
+
+        Gaps-and-islands trên streak_records: các ngày liên tiếp của một user có cùng
+        streak_day - row_number(), mỗi nhóm là một chuỗi.
+        """
+        if not user_ids:
+            return {}
+        table = StreakRecordEntity
+        days = select(
+            table.user_id,
+            (table.streak_day - func.row_number().over(
+                partition_by=table.user_id, order_by=table.streak_day
+            )).label("island"),
+        ).where(
+            table.user_id.in_(user_ids),
+            table.has_activity == 1,
+            table.streak_day.between(start_day, end_day),
+        ).subquery()
+        islands = select(
+            days.c.user_id, func.count().label("length")
+        ).group_by(days.c.user_id, days.c.island).subquery()
+        rows = db.session.execute(
+            select(islands.c.user_id, func.max(islands.c.length)).group_by(islands.c.user_id)
+        ).all()
+        return {user_id: int(length) for user_id, length in rows}
+
+
+change_capture.register(StreakRecordEntity, UserStreakService.on_changes)
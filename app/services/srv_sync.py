@@ -0,0 +1,212 @@
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from fastapi_sqlalchemy import db
+from sqlalchemy import inspect, insert, select, tuple_
+from sqlalchemy.orm import Session
+
+from app.models.model_goal import GoalEntity
+from app.models.model_session import SessionEntity, SessionPauseEntity
+from app.models.model_setting import UserSettingEntity
+from app.models.model_sync import SyncTombstoneEntity
+from app.models.model_task import TaskEntity, TaskSessionEntity
+from app.utils import change_capture, cursor as cursor_token, time_utils
+from app.utils.change_capture import Change
+from app.utils.exception_handler import CustomException
+
+CURSOR_VERSION = 1
+DEFAULT_SYNC_LIMIT = 500
+MAX_SYNC_LIMIT = 1000
+# Khi đã đồng bộ hết, lần sau đọc lùi lại một khoảng để không bỏ sót các transaction
+# có updated_at trước thời điểm đọc nhưng commit sau đó (rows có thể bị trả về lặp lại)
+SYNC_OVERLAP_SECONDS = 30
+DELETED_STREAM = "deleted"
+
+
+class SyncEntity(NamedTuple):
+    model: Any
+    parent: Optional[Any] = None  # model chứa user_id khi bảng không có cột user_id
+    parent_key: Optional[str] = None  # cột FK trỏ tới parent
+
+
+SYNC_ENTITIES: Dict[str, SyncEntity] = {
+    "sessions": SyncEntity(SessionEntity),
+    "session_pauses": SyncEntity(SessionPauseEntity, SessionEntity, "session_id"),
+    "tasks": SyncEntity(TaskEntity),
+    "task_sessions": SyncEntity(TaskSessionEntity, TaskEntity, "task_id"),
+    "goals": SyncEntity(GoalEntity),
+    "settings": SyncEntity(UserSettingEntity),
+}
+
+SYNC_ENTITY_TYPES = {entity.model: name for name, entity in SYNC_ENTITIES.items()}
+
+Watermark = Tuple[float, Optional[int]]
+
+
+def _primary_key(model: Any) -> Any:
+    return inspect(model).primary_key[0]
+
+
+class SyncService:
+    """
+    Delta sync: các rows được tạo/sửa/xoá của user kể từ một cursor.
+
+    Mỗi loại entity (và luồng tombstones) có watermark riêng trong cursor:
+    (updated_at, id) của row cuối cùng đã trả về khi còn trang tiếp theo,
+    hoặc (thời điểm đọc, None) khi đã đồng bộ hết.
+    """
+
+    @staticmethod
+    def encode_cursor(watermarks: Dict[str, Watermark]) -> str:
+        return cursor_token.encode({"v": CURSOR_VERSION, "w": watermarks})
+
+    @staticmethod
+    def decode_cursor(cursor: str) -> Dict[str, Watermark]:
+        try:
+            payload = cursor_token.decode(cursor)
+            if payload.get("v") != CURSOR_VERSION:
+                raise ValueError("unsupported cursor version")
+            return {
+                name: (float(value[0]), int(value[1]) if value[1] is not None else None)
+                for name, value in payload["w"].items()
+            }
+        except (ValueError, TypeError, KeyError, IndexError, AttributeError):
+            raise CustomException(http_code=400, message="Invalid sync cursor")
+
+    @staticmethod
+    def _changed_rows(
+        user_id: int,
+        entity: SyncEntity,
+        watermark: Optional[Watermark],
+        limit: int,
+    ) -> Tuple[List[Any], bool]:
+        model = entity.model
+        pk = _primary_key(model)
+        query = db.session.query(model)
+        if entity.parent is not None:
+            query = query.join(
+                entity.parent, getattr(model, entity.parent_key) == _primary_key(entity.parent)
+            ).filter(entity.parent.user_id == user_id)
+        else:
+            query = query.filter(model.user_id == user_id)
+
+        if watermark is not None:
+            updated_at, last_id = watermark
+            if last_id is None:
+                query = query.filter(model.updated_at > updated_at - SYNC_OVERLAP_SECONDS)
+            else:
+                query = query.filter(tuple_(model.updated_at, pk) > tuple_(updated_at, last_id))
+
+        rows = query.order_by(model.updated_at, pk).limit(limit + 1).all()
+        return rows[:limit], len(rows) > limit
+
+    @staticmethod
+    def _tombstones(user_id: int, watermark: Watermark, limit: int) -> Tuple[List[Any], bool]:
+        table = SyncTombstoneEntity
+        deleted_at, last_id = watermark
+        query = db.session.query(table).filter(table.user_id == user_id)
+        if last_id is None:
+            query = query.filter(table.deleted_at > deleted_at - SYNC_OVERLAP_SECONDS)
+        else:
+            query = query.filter(tuple_(table.deleted_at, table.tombstone_id) > tuple_(deleted_at, last_id))
+
+        rows = query.order_by(table.deleted_at, table.tombstone_id).limit(limit + 1).all()
+        return rows[:limit], len(rows) > limit
+
+    @staticmethod
+    def get_changes(user_id: int, cursor: Optional[str] = None, limit: int = DEFAULT_SYNC_LIMIT) -> Dict[str, Any]:
+        """
+        Các rows thay đổi của user kể từ cursor (cursor=None: toàn bộ dữ liệu hiện có)
+
+        Args:
+            user_id: ID của user
+            cursor: Cursor trả về từ lần gọi trước (opaque string)
+            limit: Số rows tối đa mỗi loại entity (và số tombstones tối đa) trong một lần gọi
+
+        Returns:
+            Dict gồm cursor mới, has_more, server_time và {upserts, deleted_ids, has_more} cho từng loại entity
+        """
+        started_at = time_utils.timestamp_now()
+        watermarks = SyncService.decode_cursor(cursor) if cursor else {}
+        next_watermarks: Dict[str, Watermark] = {}
+        result: Dict[str, Any] = {}
+
+        for name, entity in SYNC_ENTITIES.items():
+            rows, has_more = SyncService._changed_rows(user_id, entity, watermarks.get(name), limit)
+            if has_more:
+                last = rows[-1]
+                next_watermarks[name] = (last.updated_at, getattr(last, _primary_key(entity.model).key))
+            else:
+                next_watermarks[name] = (started_at, None)
+            result[name] = {"upserts": rows, "deleted_ids": [], "has_more": has_more}
+
+        # Lần sync đầu tiên không cần tombstones (client chưa có dữ liệu cũ)
+        deleted_has_more = False
+        if cursor and DELETED_STREAM in watermarks:
+            tombstones, deleted_has_more = SyncService._tombstones(user_id, watermarks[DELETED_STREAM], limit)
+            for tombstone in tombstones:
+                if tombstone.entity_type in result:
+                    result[tombstone.entity_type]["deleted_ids"].append(tombstone.entity_id)
+            if deleted_has_more:
+                last = tombstones[-1]
+                next_watermarks[DELETED_STREAM] = (last.deleted_at, last.tombstone_id)
+        if DELETED_STREAM not in next_watermarks:
+            next_watermarks[DELETED_STREAM] = (started_at, None)
+
+        return {
+            "cursor": SyncService.encode_cursor(next_watermarks),
+            "has_more": deleted_has_more or any(changes["has_more"] for changes in result.values()),
+            "server_time": started_at,
+            **result,
+        }
+
+    @staticmethod
+    def on_changes(session: Session, changes: List[Change]) -> None:
+        """
+        Ghi tombstone cho các rows bị xoá (cùng transaction với lần xoá).
+        Row con bị xoá cùng lúc với parent trong SYNC_ENTITIES (cascade) không có tombstone riêng:
+        client xoá theo parent. Row con bị xoá theo parent khác (task_sessions khi xoá session) phải được
+        xoá trước parent đó qua change capture (SessionService._delete_dependents) để có tombstone.
+        """
+        deleted = [change.old for change in changes if change.new is None and change.old]
+        if not deleted:
+            return
+
+        model = changes[0].model
+        entity = SYNC_ENTITIES[SYNC_ENTITY_TYPES[model]]
+        pk_key = _primary_key(model).key
+
+        if entity.parent is None:
+            owners = [(row["user_id"], row[pk_key]) for row in deleted if row.get("user_id") is not None]
+        else:
+            parent_ids = {row[entity.parent_key] for row in deleted if row.get(entity.parent_key) is not None}
+            parent_pk = _primary_key(entity.parent)
+            user_by_parent = dict(session.connection().execute(
+                select(parent_pk, entity.parent.user_id).where(parent_pk.in_(parent_ids))
+            ).all()) if parent_ids else {}
+            owners = [
+                (user_by_parent[row[entity.parent_key]], row[pk_key])
+                for row in deleted
+                if row.get(entity.parent_key) in user_by_parent
+            ]
+        if not owners:
+            return
+
+        now = time_utils.timestamp_now()
+        session.connection().execute(
+            insert(SyncTombstoneEntity.__table__),
+            [
+                {
+                    "user_id": user_id,
+                    "entity_type": SYNC_ENTITY_TYPES[model],
+                    "entity_id": entity_id,
+                    "deleted_at": now,
+                    "created_at": now,
+                    "updated_at": now,
+                }
+                for user_id, entity_id in owners
+            ],
+        )
+
+
+for _entity in SYNC_ENTITIES.values():
+    change_capture.register(_entity.model, SyncService.on_changes)
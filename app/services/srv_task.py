@@ -1,16 +1,15 @@
 from fastapi_sqlalchemy import db
 from app.models.model_task import TaskEntity, TaskSessionEntity
-from app.services.srv_base import BaseService
+from app.services.srv_user_scoped import UserScopedService
 
 
-class TaskService(BaseService[TaskEntity]):
+class TaskService(UserScopedService[TaskEntity]):
 
     def __init__(self):
         super().__init__(TaskEntity)
 
 
-class TaskSessionService(BaseService[TaskSessionEntity]):
+class TaskSessionService(UserScopedService[TaskSessionEntity]):
 
     def __init__(self):
-        super().__init__(TaskSessionEntity)
-
+        super().__init__(TaskSessionEntity, parent=TaskEntity, parent_key="task_id")
@@ -1,14 +1,20 @@
+from typing import Any, Dict
+
 from fastapi_sqlalchemy import db
 from app.models import User
 from app.services.srv_base import BaseService
-from app.core.config import settings
-from app.core.security import decode_jwt, get_password_hash
+from app.core.config import keycloak_openid
+from app.core.id_tokens import unverified_claims
+from app.core.security import (
+    decode_jwt,
+    get_password_hash,
+    google_verifier,
+    keycloak_userinfo_cache,
+    keycloak_verifier,
+)
 from app.schemas.sche_auth import TokenRequest
 from app.schemas.sche_user import UserCreateRequest
 from app.utils.exception_handler import CustomException, ExceptionType
-from app.core.config import keycloak_openid
-from google.oauth2 import id_token
-from google.auth.transport import requests
 
 
 class UserService(BaseService[User]):
@@ -18,45 +24,47 @@ class UserService(BaseService[User]):
 
     @staticmethod
     def get_me(access_token: str) -> User:
+        """
+        User của access token Keycloak/Google (verify chữ ký tại chỗ bằng JWKS, chọn verifier theo iss)
+        hoặc access token của app. Chỉ token không phải JWT mới gọi Keycloak userinfo (cache ngắn).
+        """
+        claims = unverified_claims(access_token)
+        issuer = claims.get("iss") if claims else None
         try:
-            try:
-                user_info = keycloak_openid.userinfo(access_token)
-                print("============ KEYCLOAK USER ============", user_info)
-                if not user_info:
-                    raise
+            if keycloak_verifier and keycloak_verifier.accepts(issuer):
+                user_info = keycloak_verifier.verify(access_token)
+                print("============ KEYCLOAK USER ============", user_info.get("preferred_username"))
+                return UserService._keycloak_user(user_info)
+            if google_verifier.accepts(issuer):
+                user_info = google_verifier.verify(access_token)
+                print("============ GOOGLE USER ============", user_info["sub"])
                 return User(
-                    username=user_info["preferred_username"],
+                    username=user_info["sub"],
                     email=user_info.get("email"),
                     full_name=user_info.get("name"),
                 )
-            except:
-                try:
-                    user_info = id_token.verify_oauth2_token(
-                        access_token,
-                        requests.Request(),
-                        settings.GOOGLE_CLIENT_ID,
-                    )
-                    print("============ GOOGLE USER ============", user_info)
-                    if not user_info:
-                        raise
-                    return User(
-                        username=user_info["sub"],
-                        email=user_info.get("email"),
-                        full_name=user_info.get("name"),
-                    )
-                except:
-                    try:
-                        payload = decode_jwt(access_token)
-                        token_data = TokenRequest(**payload)
-                        user = db.session.query(User).get(token_data.sub)
-                        print("============ BASIC USER ============")
-                        if not user:
-                            raise CustomException(exception=ExceptionType.UNAUTHORIZED)
-                        return user
-                    except:
-                        raise CustomException(exception=ExceptionType.UNAUTHORIZED)
-        except Exception as e:
-            raise CustomException(exception=ExceptionType.UNAUTHORIZED)
+            payload = decode_jwt(access_token)
+            if payload:
+                token_data = TokenRequest(**payload)
+                user = db.session.query(User).get(token_data.sub)
+                print("============ BASIC USER ============")
+                if user:
+                    return user
+            elif keycloak_openid and claims is None:
+                user_info = keycloak_userinfo_cache.get_or_verify(access_token, keycloak_openid.userinfo)
+                print("============ KEYCLOAK USER (userinfo) ============", user_info.get("preferred_username"))
+                return UserService._keycloak_user(user_info)
+        except Exception:
+            pass
+        raise CustomException(exception=ExceptionType.UNAUTHORIZED)
+
+    @staticmethod
+    def _keycloak_user(user_info: Dict[str, Any]) -> User:
+        return User(
+            username=user_info["preferred_username"],
+            email=user_info.get("email"),
+            full_name=user_info.get("name"),
+        )
 
     def create(self, data: UserCreateRequest) -> User:
         try:
@@ -66,5 +74,7 @@ class UserService(BaseService[User]):
             del processed_data["password"]
             processed_data["hashed_password"] = hashed_password
             return super().create(processed_data)
+        except CustomException:
+            raise
         except Exception as e:
             raise CustomException(exception=ExceptionType.INTERNAL_SERVER_ERROR)
@@ -1,6 +1,9 @@
 from fastapi_sqlalchemy import db
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
 from app.models.model_user_coin import UserCoinEntity
 from app.services.srv_base import BaseService
+from app.utils import time_utils
 from app.utils.exception_handler import CustomException, ExceptionType
 from typing import Any, Dict, Optional
 
@@ -42,6 +45,25 @@ class UserCoinService(BaseService[UserCoinEntity]):
         db.session.refresh(coin)
         return coin
 
+    @staticmethod
+    def add_coins(session: Session, amounts: Dict[int, int]) -> None:
+        """
+        Cộng coin cho nhiều users bằng một câu INSERT ... ON CONFLICT (user_id) DO UPDATE (không commit)
+        """
+        if not amounts:
+            return
+        table = UserCoinEntity.__table__
+        now = time_utils.timestamp_now()
+        stmt = pg_insert(table).values([
+            {"user_id": user_id, "coin": max(0, amount), "created_at": now, "updated_at": now}
+            for user_id, amount in sorted(amounts.items())
+        ])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.user_id],
+            set_={"coin": table.c.coin + stmt.excluded.coin, "updated_at": stmt.excluded.updated_at},
+        )
+        session.execute(stmt)
+
     def subtract_coin(self, user_id: int, amount: int) -> UserCoinEntity:
         """
         Trừ coin của user (kiểm tra đủ coin trước khi trừ)
@@ -1,10 +1,26 @@
+import threading
+from typing import Any, Dict, Iterable, List, Optional
+
+from cachetools import TTLCache
 from fastapi_sqlalchemy import db
+from sqlalchemy import event
+from sqlalchemy.orm import Session, make_transient_to_detached
+
 from app.models.model_user_entity import UserEntity
 from app.services.srv_base import BaseService
+from app.utils import change_capture, metrics, pg_notify
+from app.utils.change_capture import Change
 from app.utils.exception_handler import CustomException, ExceptionType
-from app.core.security import decode_jwt
+from app.core.security import TokenRevocations, decode_jwt
 from app.schemas.sche_auth import TokenRequest
-from typing import Any, Dict
+
+PRINCIPAL_CACHE_SIZE = 10000
+PRINCIPAL_CACHE_TTL_SECONDS = 60
+PRINCIPAL_PENDING_KEY = "principal_cache_user_ids"
+PRINCIPAL_CHANNEL = "principal_invalidations"  # NOTIFY user_ids khi row users thay đổi (mọi process xoá cache)
+REVOKED_PENDING_KEY = "revoked_user_ids"
+# Không giữ password hash trong cache (được load khi truy cập)
+PRINCIPAL_EXCLUDED_FIELDS = ("hashed_password",)
 
 
 class UserEntityService(BaseService[UserEntity]):
@@ -27,20 +43,26 @@ class UserEntityService(BaseService[UserEntity]):
         
         return super().create(data, duplicate_check={"email": data.get("email")} if data.get("email") else None)
 
+    # user_id -> giá trị các cột của user
+    _principals: TTLCache = TTLCache(maxsize=PRINCIPAL_CACHE_SIZE, ttl=PRINCIPAL_CACHE_TTL_SECONDS)
+    _generation = 0
+    _lock = threading.Lock()
+
     @staticmethod
-    def get_me(access_token: str) -> UserEntity:
+    def get_me(access_token: str, claims: Optional[Dict[str, Any]] = None) -> UserEntity:
         """
         Get current UserEntity from JWT access token.
+        claims: payload đã được verify trong request (JWTBearer) thì không decode lại token.
         """
         try:
-            payload = decode_jwt(access_token)
+            payload = claims or decode_jwt(access_token)
             if not payload:
                 raise CustomException(exception=ExceptionType.UNAUTHORIZED)
             
             token_data = TokenRequest(**payload)
             user_id = int(token_data.sub)
             
-            user = db.session.query(UserEntity).filter(UserEntity.user_id == user_id).first()
+            user = UserEntityService.get_principal(user_id)
             if not user:
                 raise CustomException(exception=ExceptionType.UNAUTHORIZED)
             
@@ -48,3 +70,93 @@ class UserEntityService(BaseService[UserEntity]):
         except Exception as e:
             raise CustomException(exception=ExceptionType.UNAUTHORIZED)
 
+    @staticmethod
+    def get_principal(user_id: int) -> Optional[UserEntity]:
+        """
+        UserEntity của user đang đăng nhập, gắn vào db.session hiện tại.
+
+        Giá trị các cột được cache trong process (LRU có TTL) nên request đã có cache không query users.
+        Cache bị xoá khi row của user được ghi qua ORM/change_capture: ngay khi ghi và sau commit trong
+        process ghi, qua NOTIFY PRINCIPAL_CHANNEL (gửi khi commit) ở các process khác.
+        Khi listener của process không chạy hoặc đang mất kết nối thì không dùng cache
+        (is_active, user bị xoá... luôn đọc từ database).
+        """
+        use_cache = pg_notify.listener.healthy
+        with UserEntityService._lock:
+            generation = UserEntityService._generation
+            cached = UserEntityService._principals.get(user_id) if use_cache else None
+        if cached is not None:
+            metrics.increment("auth.principal_cache.hit")
+            user = UserEntity(**cached)
+            make_transient_to_detached(user)
+            return db.session.merge(user, load=False)
+
+        metrics.increment("auth.principal_cache.miss")
+        user = db.session.query(UserEntity).filter(UserEntity.user_id == user_id).first()
+        if user is None or not use_cache:
+            return user
+        snapshot = {
+            key: value
+            for key, value in change_capture.row_to_dict(user).items()
+            if key not in PRINCIPAL_EXCLUDED_FIELDS
+        }
+        with UserEntityService._lock:
+            # Có ghi vào users trong lúc đang query thì không cache (giá trị có thể đã cũ)
+            if UserEntityService._generation == generation:
+                UserEntityService._principals[user_id] = snapshot
+        return user
+
+    @staticmethod
+    def invalidate_principals(user_ids: Iterable[int]) -> None:
+        with UserEntityService._lock:
+            UserEntityService._generation += 1
+            for user_id in user_ids:
+                UserEntityService._principals.pop(user_id, None)
+
+    @staticmethod
+    def clear_principals() -> None:
+        with UserEntityService._lock:
+            UserEntityService._generation += 1
+            UserEntityService._principals.clear()
+
+    @staticmethod
+    def on_principal_notify(payload: str) -> None:
+        UserEntityService.invalidate_principals(pg_notify.parse_ids(payload))
+
+    @staticmethod
+    def on_user_changes(session: Session, changes: List[Change]) -> None:
+        user_ids = {
+            row["user_id"]
+            for change in changes
+            for row in (change.old, change.new)
+            if row is not None and row.get("user_id") is not None
+        }
+        UserEntityService.invalidate_principals(user_ids)
+        session.info.setdefault(PRINCIPAL_PENDING_KEY, set()).update(user_ids)
+        pg_notify.notify_ids(session, PRINCIPAL_CHANNEL, user_ids)
+        # Token của user đã xoá không còn được chấp nhận bởi AuthenticatePrincipalRequired (sau commit, mọi process)
+        deleted_ids = [change.old["user_id"] for change in changes if change.new is None and change.old is not None]
+        if deleted_ids:
+            revoked_at = TokenRevocations.record(session, deleted_ids)
+            session.info.setdefault(REVOKED_PENDING_KEY, {}).update(dict.fromkeys(deleted_ids, revoked_at))
+
+
+change_capture.register(UserEntity, UserEntityService.on_user_changes)
+pg_notify.listener.subscribe(PRINCIPAL_CHANNEL, UserEntityService.on_principal_notify, UserEntityService.clear_principals)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed_principals(session: Session) -> None:
+    # Request khác có thể đã cache giá trị cũ giữa lúc ghi và lúc commit
+    user_ids = session.info.pop(PRINCIPAL_PENDING_KEY, None)
+    if user_ids:
+        UserEntityService.invalidate_principals(user_ids)
+    # Process ghi không cần chờ notification của chính nó
+    for user_id, revoked_at in (session.info.pop(REVOKED_PENDING_KEY, None) or {}).items():
+        TokenRevocations.revoke_user(user_id, revoked_at)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending_principals(session: Session) -> None:
+    session.info.pop(PRINCIPAL_PENDING_KEY, None)
+    session.info.pop(REVOKED_PENDING_KEY, None)
@@ -2,7 +2,7 @@ from fastapi_sqlalchemy import db
 from sqlalchemy import or_
 from app.models.model_user_entity import UserEntity
 from app.core.security import (
-    verify_password, 
+    verify_and_update_password,
     create_access_token, 
     get_password_hash,
     verify_firebase_token,
@@ -58,7 +58,11 @@ class UserEntityAuthService(object):
                 message="Tài khoản này chưa được thiết lập mật khẩu. Vui lòng đăng nhập bằng phương thức khác hoặc đặt lại mật khẩu."
             )
         
-        if not verify_password(password, user.hashed_password):
+        hashed_password = user.hashed_password
+        # Trả connection về pool trong lúc chờ bcrypt (user được load lại theo primary key khi ghi last_login)
+        db.session.rollback()
+        password_valid, new_hash = verify_and_update_password(password, hashed_password)
+        if not password_valid:
             print("Password verification failed", flush=True)
             raise CustomException(
                 exception=ExceptionType.UNAUTHORIZED,
@@ -67,6 +71,9 @@ class UserEntityAuthService(object):
         
         print("Password verified successfully", flush=True)
 
+        if new_hash:
+            # Cost bcrypt đã đổi: lưu hash mới cùng lần ghi last_login
+            user.hashed_password = new_hash
         user.last_login = time_utils.timestamp_now()
         db.session.commit()
         
@@ -180,12 +187,6 @@ class UserEntityAuthService(object):
                     message=error_message or "Firebase ID Token không hợp lệ hoặc đã hết hạn"
                 )
         
-        # Log toàn bộ decoded_token để xem có gì
-        import json
-        print("========== FIREBASE TOKEN FULL CONTENT ==========", flush=True)
-        print(json.dumps(decoded_token, indent=2, default=str), flush=True)
-        print("=================================================", flush=True)
-        
         # Extract user info from Firebase token - trích xuất tất cả các trường có thể
         firebase_uid = decoded_token.get("uid")
         
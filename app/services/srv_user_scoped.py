@@ -0,0 +1,96 @@
+from typing import Any, Dict, Optional, Type
+
+from fastapi_sqlalchemy import db
+from sqlalchemy import and_, exists, insert, literal, select
+from sqlalchemy.inspection import inspect
+from sqlalchemy.orm import Query
+
+from app.services.srv_base import BaseService, ModelType
+from app.utils import change_capture
+from app.utils.change_capture import Change
+from app.utils.exception_handler import CustomException, ExceptionType
+
+
+class UserScopedService(BaseService[ModelType]):
+    """
+    BaseService cho các bảng dữ liệu của user: điều kiện owner luôn nằm trong câu query thay vì
+    load row rồi so sánh user_id trong Python.
+
+    Bảng có cột user_id lọc theo user_id. Bảng con không có user_id (session_pauses, task_sessions)
+    lọc theo user_id của row cha: EXISTS (SELECT 1 FROM <cha> WHERE <cha>.pk = <con>.parent_key
+    AND <cha>.user_id = :owner_id), dùng primary key của bảng cha.
+
+    Mỗi lần đọc/ghi một row có kiểm tra owner là một query; khi không có row nào khớp mới query thêm
+    để phân biệt FORBIDDEN (row của user khác) với NOT_FOUND.
+    """
+
+    def __init__(
+        self,
+        model: Type[ModelType],
+        parent: Optional[Type[Any]] = None,
+        parent_key: Optional[str] = None,
+    ):
+        """
+        parent: model chứa user_id khi bảng không có cột user_id
+        parent_key: cột FK trỏ tới parent
+        """
+        super().__init__(model)
+        self.parent = parent
+        self.parent_key = parent_key
+
+    def _parent_owned(self, parent_value: Any, owner_id: Any) -> Any:
+        parent_pk = inspect(self.parent).primary_key[0]
+        return exists().where(parent_pk == parent_value, self.parent.__table__.c.user_id == owner_id)
+
+    def _owner_criteria(self, owner_id: Any) -> Any:
+        if self.parent is None:
+            return super()._owner_criteria(owner_id)
+        return self._parent_owned(self.model.__table__.c[self.parent_key], owner_id)
+
+    def _row_criteria(
+        self, pk_value: Any, owner_id: Optional[Any] = None, values: Optional[Dict[str, Any]] = None
+    ) -> Any:
+        criteria = super()._row_criteria(pk_value, owner_id, values)
+        # Chuyển row con sang row cha khác: row cha mới cũng phải thuộc owner
+        if owner_id is not None and self.parent is not None and values and self.parent_key in values:
+            criteria = and_(criteria, self._parent_owned(values[self.parent_key], owner_id))
+        return criteria
+
+    def owned_query(self, owner_id: Any) -> Query:
+        """Query các rows của user owner_id (dùng cho list/paginate)."""
+        return db.session.query(self.model).filter(self._owner_criteria(owner_id))
+
+    def create_owned(self, data: Dict[str, Any], owner_id: Any) -> ModelType:
+        """
+        Tạo row thuộc user owner_id.
+        Bảng con: INSERT ... SELECT ... WHERE <row cha thuộc owner> RETURNING trong một câu lệnh,
+        FORBIDDEN/NOT_FOUND nếu row cha thuộc user khác/không tồn tại.
+        """
+        if self.parent is None:
+            return self.create({**data, "user_id": owner_id})
+
+        table = self.model.__table__
+        values = self._column_values(data)
+        source = select(*[literal(value, table.c[key].type) for key, value in values.items()]).where(
+            self._parent_owned(values.get(self.parent_key), owner_id)
+        )
+        stmt = insert(self.model).from_select(list(values), source).returning(self.model)
+        try:
+            obj = db.session.scalars(stmt, execution_options={"populate_existing": True}).first()
+        except Exception:
+            db.session.rollback()
+            raise
+        if obj is None:
+            parent_pk = inspect(self.parent).primary_key[0]
+            if db.session.scalar(select(exists().where(parent_pk == values.get(self.parent_key)))):
+                raise CustomException(exception=ExceptionType.FORBIDDEN)
+            raise CustomException(exception=ExceptionType.NOT_FOUND)
+
+        try:
+            if change_capture.is_tracked(self.model):
+                change_capture.capture(db.session, [Change(self.model, None, change_capture.row_to_dict(obj))])
+            self._commit(expire=False)
+        except Exception:
+            db.session.rollback()
+            raise
+        return obj
@@ -0,0 +1,169 @@
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from cachetools import TTLCache
+from fastapi_sqlalchemy import db
+from sqlalchemy import Float, Integer, cast, event, extract, func, inspect, select, update
+from sqlalchemy.orm import Session
+
+from app.models.model_goal import GoalEntity
+from app.models.model_session import SessionEntity
+from app.models.model_task import TaskEntity
+from app.models.model_user_entity import UserEntity
+from app.services.srv_base import register_row_preparer
+from app.utils import change_capture, time_utils
+from app.utils.change_capture import Change
+
+# Cột thời gian (epoch milliseconds) dùng để tính local_day/local_week/local_month của mỗi bảng
+LOCAL_KEY_SOURCES = {
+    SessionEntity: "session_date",
+    TaskEntity: "task_date",
+    GoalEntity: "goal_date",
+}
+
+TIMEZONE_CACHE_SIZE = 10000
+TIMEZONE_CACHE_TTL_SECONDS = 60
+
+
+class UserTimezoneService:
+    """
+    Timezone của user (users.timezone) và các key ngày/tuần/tháng theo giờ địa phương.
+
+    Timezone được cache trong process (TTL ngắn) vì mọi lần ghi sessions/tasks/goals đều cần nó.
+    Process ghi nhận thay đổi timezone sẽ xoá cache ngay; các process khác có thể dùng giá trị cũ
+    tối đa TIMEZONE_CACHE_TTL_SECONDS giây.
+    """
+
+    _cache: TTLCache = TTLCache(maxsize=TIMEZONE_CACHE_SIZE, ttl=TIMEZONE_CACHE_TTL_SECONDS)
+    _lock = threading.Lock()
+
+    @staticmethod
+    def get_timezones(user_ids: Iterable[int], connection: Any = None) -> Dict[int, str]:
+        """
+        Timezone của nhiều users (một query cho các users chưa có trong cache).
+        connection: connection của flush hiện tại (trong mapper events/handlers), mặc định db.session.
+        """
+        result: Dict[int, str] = {}
+        missing: List[int] = []
+        with UserTimezoneService._lock:
+            for user_id in set(user_ids):
+                if user_id in UserTimezoneService._cache:
+                    result[user_id] = UserTimezoneService._cache[user_id]
+                else:
+                    missing.append(user_id)
+        if not missing:
+            return result
+
+        table = UserEntity.__table__
+        executor = connection if connection is not None else db.session
+        rows = executor.execute(
+            select(table.c.user_id, table.c.timezone).where(table.c.user_id.in_(missing))
+        ).all()
+        fetched = {row.user_id: row.timezone or time_utils.DEFAULT_TIMEZONE for row in rows}
+        with UserTimezoneService._lock:
+            UserTimezoneService._cache.update(fetched)
+
+        for user_id in missing:
+            result[user_id] = fetched.get(user_id, time_utils.DEFAULT_TIMEZONE)
+        return result
+
+    @staticmethod
+    def get_timezone(user_id: int, connection: Any = None) -> str:
+        return UserTimezoneService.get_timezones([user_id], connection)[user_id]
+
+    @staticmethod
+    def invalidate(user_ids: Iterable[int]) -> None:
+        with UserTimezoneService._lock:
+            for user_id in user_ids:
+                UserTimezoneService._cache.pop(user_id, None)
+
+    @staticmethod
+    def local_keys(value: Optional[int], tz: Optional[str]) -> Tuple[Optional[int], Optional[int], Optional[int]]:
+        """(local_day, local_week, local_month) của giá trị epoch milliseconds theo timezone tz."""
+        if value is None:
+            return None, None, None
+        day = time_utils.epoch_ms_to_local_day_key(value, tz)
+        return day, time_utils.week_key(day), time_utils.month_key(day)
+
+    @staticmethod
+    def local_key_exprs(column: Any, tz_column: Any) -> Tuple[Any, Any, Any]:
+        """
+        Biểu thức SQL (local_day, local_week, local_month) cho cột epoch milliseconds
+        theo timezone lưu ở tz_column (dùng cho các câu lệnh set-wise).
+        """
+        local = func.timezone(tz_column, func.to_timestamp(cast(column, Float) / time_utils.MILLISECONDS_PER_SECOND))
+        return (
+            cast(func.floor(extract("epoch", local) / time_utils.SECONDS_PER_DAY), Integer),
+            cast(extract("isoyear", local) * 100 + extract("week", local), Integer),
+            cast(extract("year", local) * 100 + extract("month", local), Integer),
+        )
+
+    @staticmethod
+    def changed_user_ids(changes: List[Change]) -> List[int]:
+        """user_id của các users bị đổi timezone trong changes."""
+        return sorted({
+            change.new["user_id"]
+            for change in changes
+            if change.old is not None
+            and change.new is not None
+            and change.old.get("timezone") != change.new.get("timezone")
+        })
+
+    @staticmethod
+    def recompute_local_keys(session: Session, user_ids: List[int]) -> None:
+        """Tính lại local keys của sessions/tasks/goals của users theo timezone hiện tại (set-wise)."""
+        users = UserEntity.__table__
+        connection = session.connection()
+        for model, source in LOCAL_KEY_SOURCES.items():
+            table = model.__table__
+            local_day, local_week, local_month = UserTimezoneService.local_key_exprs(
+                table.c[source], users.c.timezone
+            )
+            connection.execute(
+                update(table)
+                .where(table.c.user_id == users.c.user_id, table.c.user_id.in_(user_ids))
+                .values(local_day=local_day, local_week=local_week, local_month=local_month)
+            )
+
+    @staticmethod
+    def on_user_changes(session: Session, changes: List[Change]) -> None:
+        user_ids = UserTimezoneService.changed_user_ids(changes)
+        if not user_ids:
+            return
+        UserTimezoneService.invalidate(user_ids)
+        UserTimezoneService.recompute_local_keys(session, user_ids)
+
+
+def _set_local_keys(mapper: Any, connection: Any, target: Any) -> None:
+    # Chỉ tính lại khi insert hoặc khi cột nguồn/user_id thay đổi
+    source = LOCAL_KEY_SOURCES[mapper.class_]
+    state = inspect(target)
+    if state.key is not None and not (
+        state.attrs[source].history.has_changes() or state.attrs.user_id.history.has_changes()
+    ):
+        return
+
+    value = getattr(target, source)
+    tz = UserTimezoneService.get_timezone(target.user_id, connection) if value is not None else None
+    target.local_day, target.local_week, target.local_month = UserTimezoneService.local_keys(value, tz)
+
+
+def _set_bulk_local_keys(session: Session, model: Any, rows: List[Dict[str, Any]]) -> None:
+    # Tương tự _set_local_keys cho rows được ghi bằng câu lệnh trực tiếp của BaseService
+    source = LOCAL_KEY_SOURCES[model]
+    user_ids = [row["user_id"] for row in rows if row.get(source) is not None and row.get("user_id") is not None]
+    timezones = UserTimezoneService.get_timezones(user_ids, session.connection()) if user_ids else {}
+    for row in rows:
+        value = time_utils.to_epoch_ms(row.get(source))
+        tz = timezones.get(row.get("user_id")) if value is not None else None
+        row["local_day"], row["local_week"], row["local_month"] = UserTimezoneService.local_keys(value, tz)
+
+
+for _model in LOCAL_KEY_SOURCES:
+    event.listen(_model, "before_insert", _set_local_keys)
+    event.listen(_model, "before_update", _set_local_keys)
+    register_row_preparer(_model, _set_bulk_local_keys, (LOCAL_KEY_SOURCES[_model], "user_id"))
+
+# Đăng ký trước handlers của rollup/statistics (các module đó import module này)
+# để local keys được tính lại trước khi rollup được rebuild
+change_capture.register(UserEntity, UserTimezoneService.on_user_changes)
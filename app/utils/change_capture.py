@@ -0,0 +1,99 @@
+from collections import defaultdict
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Type
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+
+class Change(NamedTuple):
+    """
+    Một thay đổi trên một row: old=None là INSERT, new=None là DELETE.
+    old/new là dict {column_key: value}.
+    """
+    model: Type[Any]
+    old: Optional[Dict[str, Any]]
+    new: Optional[Dict[str, Any]]
+
+
+ChangeHandler = Callable[[Session, List[Change]], None]
+
+_handlers: Dict[Type[Any], List[ChangeHandler]] = defaultdict(list)
+
+
+def _keep_old_value(target: Any, value: Any, oldvalue: Any, initiator: Any) -> None:
+    pass
+
+
+def _track_old_values(model: Type[Any]) -> None:
+    """
+    active_history cho các cột của model: gán attribute chưa được load (vd: object đã expire sau commit)
+    sẽ load giá trị đã commit trước khi ghi đè, để Change.old luôn là giá trị cũ thật.
+    """
+    for key in inspect(model).columns.keys():
+        event.listen(getattr(model, key), "set", _keep_old_value, active_history=True)
+
+
+def register(model: Type[Any], handler: ChangeHandler) -> None:
+    """
+    Đăng ký handler chạy trong cùng transaction mỗi khi có row của model bị insert/update/delete.
+    Handler phải dùng session.connection() để ghi (không được trigger flush).
+    """
+    if model not in _handlers:
+        _track_old_values(model)
+    if handler not in _handlers[model]:
+        _handlers[model].append(handler)
+
+
+def is_tracked(model: Type[Any]) -> bool:
+    return bool(_handlers.get(model))
+
+
+def row_to_dict(obj: Any) -> Dict[str, Any]:
+    mapper = inspect(obj).mapper
+    return {attr.key: getattr(obj, attr.key) for attr in mapper.column_attrs}
+
+
+def _old_values(obj: Any) -> Dict[str, Any]:
+    state = inspect(obj)
+    values = {}
+    for attr in state.mapper.column_attrs:
+        history = state.attrs[attr.key].history
+        if history.deleted:
+            values[attr.key] = history.deleted[0]
+        elif history.added:
+            values[attr.key] = None
+        else:
+            values[attr.key] = state.dict.get(attr.key)
+    return values
+
+
+def capture(session: Session, changes: List[Change]) -> None:
+    """
+    Chạy handlers cho các thay đổi được ghi bằng Core statement (không qua ORM flush).
+    """
+    by_model: Dict[Type[Any], List[Change]] = defaultdict(list)
+    for change in changes:
+        if is_tracked(change.model):
+            by_model[change.model].append(change)
+
+    for model, model_changes in by_model.items():
+        for handler in _handlers[model]:
+            handler(session, model_changes)
+
+
+@event.listens_for(Session, "after_flush")
+def _after_flush(session: Session, flush_context: Any) -> None:
+    # Trong after_flush, new/dirty/deleted và attribute history vẫn là trạng thái trước flush
+    changes: List[Change] = []
+    for obj in session.new:
+        if is_tracked(type(obj)):
+            changes.append(Change(type(obj), None, row_to_dict(obj)))
+    for obj in session.dirty:
+        if is_tracked(type(obj)) and session.is_modified(obj, include_collections=False):
+            changes.append(Change(type(obj), _old_values(obj), row_to_dict(obj)))
+    for obj in session.deleted:
+        if is_tracked(type(obj)):
+            changes.append(Change(type(obj), _old_values(obj), None))
+
+    if changes:
+        capture(session, changes)
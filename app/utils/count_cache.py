@@ -0,0 +1,130 @@
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Query, Session
+from sqlalchemy.sql import operators, visitors
+from sqlalchemy.sql.elements import BinaryExpression, BindParameter
+
+from app.utils import change_capture, metrics
+from app.utils.change_capture import Change
+
+# Cache trong process: ghi từ process khác (worker khác, outbox consumer) hoặc bằng Core statement
+# không qua change_capture chỉ được thấy sau tối đa TTL_SECONDS
+TTL_SECONDS = 60
+MAX_ENTRIES = 10000
+PENDING_KEY = "count_cache_scopes"
+
+Scope = Tuple[str, Optional[Any]]  # (tên bảng, user_id); user_id=None: query không lọc theo user
+ALL_ROWS = "*"  # scope (bảng, ALL_ROWS): invalidate mọi counts của bảng
+
+_lock = threading.Lock()
+# (scope, sql) -> (generation, total, expires_at)
+_entries: Dict[Tuple[Scope, str], Tuple[Tuple[int, int], int, float]] = {}
+_generations: Dict[Scope, int] = defaultdict(int)
+_tracked: Set[Any] = set()
+
+
+def _user_scope(model: Any, query: Query) -> Optional[Any]:
+    """Giá trị của điều kiện model.user_id == X trong WHERE của query (None nếu không có)."""
+    column = getattr(model.__table__.c, "user_id", None)
+    criteria = query.whereclause
+    if column is None or criteria is None:
+        return None
+    for element in visitors.iterate(criteria):
+        if (
+            isinstance(element, BinaryExpression)
+            and element.operator is operators.eq
+            and element.left.compare(column)
+            and isinstance(element.right, BindParameter)
+        ):
+            return element.right.effective_value
+    return None
+
+
+def _generation(scope: Scope) -> Tuple[int, int]:
+    return _generations[scope], _generations[(scope[0], ALL_ROWS)]
+
+
+def _bump(scopes: Set[Scope]) -> None:
+    with _lock:
+        for scope in scopes:
+            _generations[scope] += 1
+            if scope[1] != ALL_ROWS:
+                _generations[(scope[0], None)] += 1
+
+
+def count(model: Any, query: Query) -> int:
+    """
+    Tổng số rows của query, cache theo (bảng, user_id, SQL + params).
+    Bị invalidate khi có ghi (qua ORM flush hoặc change_capture.capture) vào rows của user đó trong bảng,
+    query không lọc theo user bị invalidate bởi mọi lần ghi vào bảng.
+    """
+    if model not in _tracked:
+        _tracked.add(model)
+        change_capture.register(model, on_changes)
+
+    scope = (model.__table__.name, _user_scope(model, query))
+    compiled = query.statement.compile()
+    key = (scope, f"{compiled} {sorted(compiled.params.items())!r}")
+    now = time.monotonic()
+    with _lock:
+        generation = _generation(scope)
+        entry = _entries.get(key)
+    if entry is not None and entry[0] == generation and entry[2] > now:
+        metrics.increment("paginate.count_cache.hit")
+        return entry[1]
+
+    metrics.increment("paginate.count_cache.miss")
+    total = query.count()
+    with _lock:
+        if len(_entries) >= MAX_ENTRIES:
+            _entries.clear()
+        # Có ghi trong lúc đang đếm thì không cache (kết quả có thể đã cũ)
+        if _generation(scope) == generation:
+            _entries[key] = (generation, total, now + TTL_SECONDS)
+    return total
+
+
+def on_changes(session: Session, changes: List[Change]) -> None:
+    """
+    Invalidate counts của các (bảng, user) bị ghi. Invalidate ngay (chặn cache giá trị cũ trong transaction)
+    và một lần nữa sau commit (các lần đếm chạy trước commit không thấy thay đổi).
+    """
+    scopes: Set[Scope] = set()
+    for change in changes:
+        table = change.model.__table__.name
+        for row in (change.old, change.new):
+            if row is not None:
+                scopes.add((table, row.get("user_id")))
+    _bump(scopes)
+    session.info.setdefault(PENDING_KEY, set()).update(scopes)
+
+
+def invalidate(session: Session, models: List[Any]) -> None:
+    """
+    Invalidate mọi counts của các bảng, dùng cho các thay đổi không đi qua change_capture
+    (vd: rows con bị xoá theo ON DELETE CASCADE của database).
+    """
+    scopes = {(model.__table__.name, ALL_ROWS) for model in models}
+    _bump(scopes)
+    session.info.setdefault(PENDING_KEY, set()).update(scopes)
+
+
+def clear() -> None:
+    with _lock:
+        _entries.clear()
+
+
+@event.listens_for(Session, "after_commit")
+def _after_commit(session: Session) -> None:
+    scopes = session.info.pop(PENDING_KEY, None)
+    if scopes:
+        _bump(scopes)
+
+
+@event.listens_for(Session, "after_rollback")
+def _after_rollback(session: Session) -> None:
+    session.info.pop(PENDING_KEY, None)
@@ -0,0 +1,21 @@
+import base64
+import binascii
+import json
+from typing import Any, Dict
+
+
+def encode(payload: Dict[str, Any]) -> str:
+    """Encode dict thành cursor opaque (base64url JSON, không padding)."""
+    data = json.dumps(payload, separators=(",", ":"))
+    return base64.urlsafe_b64encode(data.encode()).decode().rstrip("=")
+
+
+def decode(token: str) -> Dict[str, Any]:
+    """Decode cursor do encode() tạo ra; ValueError nếu cursor không hợp lệ."""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+    except (binascii.Error, UnicodeDecodeError, ValueError) as e:
+        raise ValueError("invalid cursor") from e
+    if not isinstance(payload, dict):
+        raise ValueError("invalid cursor")
+    return payload
@@ -0,0 +1,244 @@
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+from fastapi_sqlalchemy import db
+from sqlalchemy import event, func, insert
+from sqlalchemy.orm import Session
+
+from app.models.model_outbox import OutboxEventEntity
+from app.utils import metrics, time_utils
+from app.utils.logging_utils import logger
+
+BATCH_SIZE = 200
+POLL_INTERVAL_SECONDS = 1.0
+MAX_ATTEMPTS = 10
+RETRY_BASE_SECONDS = 5  # backoff: 5s, 10s, 20s, ... tối đa RETRY_MAX_SECONDS
+RETRY_MAX_SECONDS = 60 * 60
+PENDING_KEY = "outbox_events_written"
+
+
+class DomainEvent(NamedTuple):
+    """
+    Một sự kiện nghiệp vụ đã được commit (vd: session.completed).
+    """
+    name: str
+    payload: Dict[str, Any]
+    occurred_at: float
+
+
+EventHandler = Callable[[List[DomainEvent]], None]
+
+_subscribers: Dict[str, List[EventHandler]] = defaultdict(list)
+_handlers: Dict[str, EventHandler] = {}
+
+
+def _handler_name(handler: EventHandler) -> str:
+    return getattr(handler, "__qualname__", repr(handler))
+
+
+def subscribe(name: str, handler: EventHandler) -> None:
+    """
+    Đăng ký handler cho event name.
+
+    Handler nhận một batch events và chạy trong transaction của consumer (db.session, không được commit):
+    side effects và việc xoá outbox rows được commit cùng nhau. Delivery là at-least-once
+    (handler lỗi sẽ được gọi lại) nên handler phải idempotent.
+    """
+    _handlers[_handler_name(handler)] = handler
+    if handler not in _subscribers[name]:
+        _subscribers[name].append(handler)
+
+
+def publish(session: Session, name: str, payload: Dict[str, Any]) -> None:
+    """
+    Ghi event vào outbox_events (một row cho mỗi handler) trong transaction hiện tại của session.
+    Rollback thì event cũng bị bỏ; commit xong thì consumer mới thấy event.
+    """
+    handlers = _subscribers.get(name)
+    if not handlers:
+        return
+    now = time_utils.timestamp_now()
+    session.connection().execute(
+        insert(OutboxEventEntity.__table__),
+        [
+            {
+                "event_name": name,
+                "handler": _handler_name(handler),
+                "payload": payload,
+                "available_at": now,
+                "attempts": 0,
+                "created_at": now,
+                "updated_at": now,
+            }
+            for handler in handlers
+        ],
+    )
+    session.info[PENDING_KEY] = True
+
+
+def _retry_delay(attempts: int) -> float:
+    return min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * 2 ** (attempts - 1))
+
+
+def process_batch(batch_size: int = BATCH_SIZE) -> int:
+    """
+    Claim tối đa batch_size outbox rows (FOR UPDATE SKIP LOCKED: nhiều consumers chạy song song
+    không lấy trùng rows), gọi handlers theo nhóm và commit một lần.
+
+    Handler thành công: rows bị xoá cùng transaction với side effects.
+    Handler lỗi: side effects của nó bị rollback (savepoint), rows được retry sau backoff,
+    quá MAX_ATTEMPTS thì đánh dấu failed_at.
+
+    Returns:
+        Số rows đã claim
+    """
+    with db():
+        now = time_utils.timestamp_now()
+        rows = (
+            db.session.query(OutboxEventEntity)
+            .filter(OutboxEventEntity.failed_at.is_(None), OutboxEventEntity.available_at <= now)
+            .order_by(OutboxEventEntity.available_at, OutboxEventEntity.outbox_id)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+            .all()
+        )
+        if not rows:
+            db.session.rollback()
+            return 0
+
+        by_handler: Dict[str, List[OutboxEventEntity]] = defaultdict(list)
+        for row in rows:
+            by_handler[row.handler].append(row)
+
+        for name, handler_rows in by_handler.items():
+            metric_name = f"outbox.handler.{name}"
+            events = [DomainEvent(row.event_name, row.payload, row.created_at) for row in handler_rows]
+            started = time.perf_counter()
+            try:
+                handler = _handlers.get(name)
+                if handler is None:
+                    raise LookupError(f"No handler registered for {name}")
+                with db.session.begin_nested():
+                    handler(events)
+            except Exception as e:
+                metrics.increment(f"{metric_name}.errors")
+                logger.exception("Outbox handler %s failed", name)
+                for row in handler_rows:
+                    row.attempts = (row.attempts or 0) + 1
+                    row.last_error = str(e)[:1000]
+                    if row.attempts >= MAX_ATTEMPTS:
+                        row.failed_at = now
+                        metrics.increment("outbox.failed")
+                    else:
+                        row.available_at = now + _retry_delay(row.attempts)
+            else:
+                for row in handler_rows:
+                    metrics.observe("outbox.lag", max(0.0, now - row.created_at))
+                    db.session.delete(row)
+                metrics.increment("outbox.processed", len(handler_rows))
+            finally:
+                metrics.observe(metric_name, time.perf_counter() - started)
+
+        try:
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        return len(rows)
+
+
+def drain(timeout: float = 5.0) -> bool:
+    """
+    Xử lý outbox cho tới khi không còn row nào sẵn sàng. Trả về False nếu hết timeout.
+    """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process_batch() == 0:
+            return True
+    return False
+
+
+class Consumer:
+    """
+    Vòng lặp poll outbox: xử lý liên tục khi còn rows, nghỉ POLL_INTERVAL_SECONDS khi rỗng.
+    Commit có ghi outbox trong cùng process đánh thức consumer ngay (không chờ hết poll interval).
+    """
+
+    def __init__(self, poll_interval: float = POLL_INTERVAL_SECONDS, batch_size: int = BATCH_SIZE):
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def wake(self) -> None:
+        self._wakeup.set()
+
+    def run(self) -> None:
+        while not self._stopped.is_set():
+            try:
+                claimed = process_batch(self.batch_size)
+            except Exception:
+                logger.exception("Outbox consumer batch failed")
+                claimed = 0
+            if claimed < self.batch_size:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self.run, name="outbox-consumer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+
+consumer = Consumer()
+
+
+def get_metrics() -> Dict[str, Any]:
+    """
+    Backlog và lag của outbox (toàn hệ thống, đọc từ DB) cùng counters/latency của handlers
+    trong process hiện tại
+    """
+    now = time_utils.timestamp_now()
+    pending = {
+        row.handler: {"pending": row.pending, "lag_seconds": round(max(0.0, now - row.oldest), 3)}
+        for row in db.session.query(
+            OutboxEventEntity.handler,
+            func.count().label("pending"),
+            func.min(OutboxEventEntity.created_at).label("oldest"),
+        )
+        .filter(OutboxEventEntity.failed_at.is_(None))
+        .group_by(OutboxEventEntity.handler)
+    }
+    failed = db.session.query(func.count()).select_from(OutboxEventEntity).filter(
+        OutboxEventEntity.failed_at.isnot(None)
+    ).scalar()
+    return {
+        "pending": sum(item["pending"] for item in pending.values()),
+        "lag_seconds": max((item["lag_seconds"] for item in pending.values()), default=0.0),
+        "failed": failed,
+        "by_handler": pending,
+        "counters": metrics.get_counters("outbox."),
+        "timings": metrics.get_timings("outbox."),
+    }
+
+
+@event.listens_for(Session, "after_commit")
+def _after_commit(session: Session) -> None:
+    if session.info.pop(PENDING_KEY, None):
+        consumer.wake()
+
+
+@event.listens_for(Session, "after_rollback")
+def _after_rollback(session: Session) -> None:
+    session.info.pop(PENDING_KEY, None)
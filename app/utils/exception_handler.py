@@ -19,6 +19,7 @@ class ExceptionType(enum.Enum):
     CONFLICT = 409, "Resource already exists"
     DUPLICATE_ENTRY = 409, "Duplicate entry: Resource already exists"
     INTERNAL_SERVER_ERROR = 500, "Something went wrong"
+    SERVICE_UNAVAILABLE = 503, "Service temporarily unavailable, please try again later"
 
     def __new__(cls, *args, **kwds):
         value = len(cls.__members__) + 1
@@ -1,11 +1,15 @@
-from fastapi import Depends
+import hmac
+from typing import Optional
+
+from fastapi import Depends, Header, Request
 
 from app.models import User
 from app.models.model_user_entity import UserEntity
 from app.services.srv_user import UserService
 from app.services.srv_user_entity import UserEntityService
 from app.utils.exception_handler import CustomException, ExceptionType
-from app.core.security import JWTBearer
+from app.core.config import settings
+from app.core.security import JWTBearer, Principal, TokenRevocations, decode_jwt
 
 
 class AuthenticateRequired:
@@ -25,11 +29,13 @@ class AuthenticateUserEntityRequired:
     def __init__(self):
         pass
 
-    def __call__(self, http_authorization_credentials=Depends(JWTBearer())):
+    def __call__(self, request: Request, http_authorization_credentials=Depends(JWTBearer())):
         print("========== AuthenticateUserEntityRequired ==========", flush=True)
         print(f"Token received: {bool(http_authorization_credentials)}", flush=True)
         try:
-            user = UserEntityService.get_me(http_authorization_credentials)
+            user = UserEntityService.get_me(
+                http_authorization_credentials, claims=getattr(request.state, "token_claims", None)
+            )
             print(f"User authenticated: {user.user_id}", flush=True)
             return user
         except Exception as e:
@@ -37,6 +43,26 @@ class AuthenticateUserEntityRequired:
             raise
 
 
+class AuthenticatePrincipalRequired:
+    """
+    Dependency to get a claims-only Principal (user_id, email, expires_at) from JWT access token.
+    Không query database: dùng cho endpoints chỉ cần current_user.user_id.
+    Token của user đã bị xoá bị từ chối (TokenRevocations, dùng chung giữa các processes).
+    """
+    def __init__(self):
+        pass
+
+    def __call__(self, request: Request, http_authorization_credentials=Depends(JWTBearer())) -> Principal:
+        claims = getattr(request.state, "token_claims", None) or decode_jwt(http_authorization_credentials)
+        try:
+            principal = Principal.from_claims(claims or {})
+        except (KeyError, TypeError, ValueError):
+            raise CustomException(exception=ExceptionType.UNAUTHORIZED)
+        if TokenRevocations.is_revoked(principal.user_id, claims.get("auth_time")):
+            raise CustomException(exception=ExceptionType.UNAUTHORIZED)
+        return principal
+
+
 class PermissionRequired:
     def __init__(self, *args):
         self.user = None
@@ -46,3 +72,15 @@ class PermissionRequired:
         self.user = user
         if self.user.role not in self.permissions and self.permissions:
             raise CustomException(exception=ExceptionType.FORBIDDEN)
+
+
+class MetricsTokenRequired:
+    """
+    Dependency cho các endpoints vận hành (metrics): header X-Metrics-Token phải khớp METRICS_TOKEN.
+    Không dùng token của user (kể cả admin); không cấu hình METRICS_TOKEN thì trả về 404.
+    """
+    def __call__(self, x_metrics_token: Optional[str] = Header(default=None)) -> None:
+        if not settings.METRICS_TOKEN:
+            raise CustomException(exception=ExceptionType.NOT_FOUND)
+        if not x_metrics_token or not hmac.compare_digest(x_metrics_token.encode(), settings.METRICS_TOKEN.encode()):
+            raise CustomException(exception=ExceptionType.FORBIDDEN)
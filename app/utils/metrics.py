@@ -0,0 +1,50 @@
+import threading
+from collections import defaultdict
+from typing import Dict, List
+
+_lock = threading.Lock()
+_counters: Dict[str, int] = defaultdict(int)
+_timings: Dict[str, List[float]] = {}  # name -> [count, tổng seconds, max seconds]
+
+
+def increment(name: str, value: int = 1) -> None:
+    """Cộng dồn một counter trong process (thread-safe)."""
+    with _lock:
+        _counters[name] += value
+
+
+def observe(name: str, seconds: float) -> None:
+    """Ghi nhận một lần đo thời gian chạy (thread-safe)."""
+    with _lock:
+        timing = _timings.setdefault(name, [0, 0.0, 0.0])
+        timing[0] += 1
+        timing[1] += seconds
+        timing[2] = max(timing[2], seconds)
+
+
+def get_counters(prefix: str = "") -> Dict[str, int]:
+    """Snapshot các counters có tên bắt đầu bằng prefix."""
+    with _lock:
+        return {name: value for name, value in _counters.items() if name.startswith(prefix)}
+
+
+def get_timings(prefix: str = "") -> Dict[str, Dict[str, float]]:
+    """Snapshot {count, avg_ms, max_ms} của các timings có tên bắt đầu bằng prefix."""
+    with _lock:
+        return {
+            name: {
+                "count": count,
+                "avg_ms": round(total / count * 1000, 3) if count else 0.0,
+                "max_ms": round(max_seconds * 1000, 3),
+            }
+            for name, (count, total, max_seconds) in _timings.items()
+            if name.startswith(prefix)
+        }
+
+
+def reset(prefix: str = "") -> None:
+    with _lock:
+        for name in [name for name in _counters if name.startswith(prefix)]:
+            del _counters[name]
+        for name in [name for name in _timings if name.startswith(prefix)]:
+            del _timings[name]
@@ -1,56 +1,168 @@
-from typing import Optional, List, Any
-from sqlalchemy import asc, desc
+from typing import Optional, List, Any, Sequence, Tuple
+from sqlalchemy import and_, asc, desc, func, or_, tuple_
 from sqlalchemy.orm import Query
 from app.schemas.sche_response import MetadataResponse
+from app.utils import count_cache, cursor as cursor_token
 from app.utils.exception_handler import CustomException
+from app.utils.logging_utils import logger
 from app.schemas.sche_base import PaginationParams, SortParams
 
+COUNT_EXACT = "exact"
+COUNT_NONE = "none"
+COUNT_CACHED = "cached"
+PK_SORT_ALIAS = "id"  # sort_by=id: sort theo primary key của model
+
+
+def _sort_columns(
+    model, sort_params: Optional[SortParams], sortable_fields: Optional[Sequence[str]] = None
+) -> Tuple[Optional[str], Any, str]:
+    """
+    (tên cột sort, cột primary key, order). Không có sort_by (hoặc "id"/tên primary key) => sort theo primary key,
+    tên cột sort là None.
+
+    Chỉ cho phép sort theo sortable_fields (mặc định model.SORTABLE_FIELDS): mỗi cột đều có index
+    (owner, cột[, primary key]) nên ORDER BY ... LIMIT đọc thẳng theo index thay vì sort toàn bộ rows.
+    """
+    pk = getattr(model, model.__table__.primary_key.columns.values()[0].key)
+    order = sort_params.order if sort_params and sort_params.order else "desc"
+    sort_by = sort_params.sort_by if sort_params else None
+    if not sort_by or sort_by in (PK_SORT_ALIAS, pk.key):
+        return None, pk, order
+    if sortable_fields is None:
+        sortable_fields = getattr(model, "SORTABLE_FIELDS", ())
+    if sort_by not in sortable_fields:
+        allowed = ", ".join([pk.key, *sortable_fields])
+        raise CustomException(http_code=400, message=f"Invalid sort_by '{sort_by}'. Allowed: {allowed}")
+    return sort_by, pk, order
+
+
+def _seek_condition(column, pk, order: str, value: Any, last_id: Any):
+    """
+    Điều kiện "sau (value, last_id)" theo thứ tự ORDER BY column, pk (PostgreSQL: NULLS LAST khi asc,
+    NULLS FIRST khi desc). Phần không NULL là so sánh row-value để dùng được index (column, pk).
+    """
+    nullable = getattr(column.expression, "nullable", True)
+    if order == "desc":
+        if value is None:
+            return or_(and_(column.is_(None), pk < last_id), column.isnot(None))
+        return tuple_(column, pk) < tuple_(value, last_id)
+    if value is None:
+        return and_(column.is_(None), pk > last_id)
+    condition = tuple_(column, pk) > tuple_(value, last_id)
+    return or_(condition, column.is_(None)) if nullable else condition
+
 
 def paginate(
     model,
     query: Query,
     pagination_params: Optional[PaginationParams] = None,
     sort_params: Optional[SortParams] = None,
+    sortable_fields: Optional[Sequence[str]] = None,
 ):
+    """
+    Phân trang query.
+
+    - Mặc định LIMIT/OFFSET theo page/page_size.
+    - Khi có pagination_params.cursor (metadata.next_cursor của trang trước): keyset pagination,
+      WHERE (cột sort, primary key) > giá trị của row cuối trang trước => trang thứ N tốn như trang đầu
+      và không bị lệch/trùng khi có rows mới được insert.
+    Thứ tự luôn có primary key làm tie-breaker nên ổn định giữa các trang.
+
+    Total theo pagination_params.count_mode:
+    - exact: count(*) OVER () trong cùng query lấy trang (trang cursor cần thêm một query count riêng)
+    - none: không đếm (total=None), dùng has_more
+    - cached: count cache theo (bảng, user), invalidate khi có ghi
+    """
     try:
-        total = query.count()
+        count_query = query
+        count_mode = COUNT_EXACT
+        if pagination_params and pagination_params.count_mode:
+            count_mode = pagination_params.count_mode
+        limit = pagination_params.page_size if pagination_params and pagination_params.page_size else None
+        use_cursor = bool(pagination_params and pagination_params.cursor)
 
         # Default metadata
         page = 1
-        page_size = total
-
-        # Sorting
-        if sort_params and sort_params.sort_by:
-            # fallback nếu thuộc tính không tồn tại
-            if hasattr(model, sort_params.sort_by):
-                direction_func = desc if sort_params.order == "desc" else asc
-                query = query.order_by(direction_func(getattr(model, sort_params.sort_by)))
-            else:
-                # fallback về khóa chính (nếu model có user_id, id, etc.)
-                primary_keys = [key.name for key in model.__table__.primary_key]
-                if primary_keys:
-                    direction_func = desc if sort_params.order == "desc" else asc
-                    query = query.order_by(direction_func(getattr(model, primary_keys[0])))
-        
+        total = None
+        next_cursor = None
+        has_more = False
+
+        # Sorting (primary key làm tie-breaker)
+        sort_by, pk, order = _sort_columns(model, sort_params, sortable_fields)
+        direction_func = desc if order == "desc" else asc
+        column = getattr(model, sort_by) if sort_by else None
+        if column is not None:
+            query = query.order_by(direction_func(column), direction_func(pk))
+        else:
+            query = query.order_by(direction_func(pk))
+
         # Pagination
-        if pagination_params:
-            if pagination_params.page_size:
-                page_size = pagination_params.page_size
-                query = query.limit(page_size)
-            if pagination_params.page:
+        if use_cursor:
+            try:
+                position = cursor_token.decode(pagination_params.cursor)
+                value, last_id = position["k"]
+                if position.get("s") != sort_by or position.get("o") != order:
+                    raise ValueError("cursor does not match sort params")
+            except (ValueError, TypeError, KeyError):
+                raise CustomException(http_code=400, message="Invalid pagination cursor")
+            if column is not None:
+                query = query.filter(_seek_condition(column, pk, order, value, last_id))
+            else:
+                query = query.filter(pk < last_id if order == "desc" else pk > last_id)
+            page = None
+
+        offset = 0
+        if limit:
+            query = query.limit(limit + 1)
+            if pagination_params.page and not use_cursor:
                 page = pagination_params.page
-                query = query.offset(page_size * (page - 1))
+                offset = limit * (page - 1)
+                query = query.offset(offset)
+
+        # count(*) OVER () được tính trên toàn bộ rows thoả WHERE, trước LIMIT/OFFSET
+        window_count = limit is not None and count_mode == COUNT_EXACT and not use_cursor
+        if window_count:
+            rows = query.add_columns(func.count().over().label("total_count")).all()
+            data = [row[0] for row in rows]
+            if rows:
+                total = rows[0][1]
+            elif offset == 0:
+                total = 0
+        else:
+            data = query.all()
+
+        if limit is None:
+            total = len(data)
+        elif len(data) > limit:
+            has_more = True
+            data = data[:limit]
+            last = data[-1]
+            key_value = getattr(last, sort_by) if sort_by else getattr(last, pk.key)
+            next_cursor = cursor_token.encode({
+                "s": sort_by,
+                "o": order,
+                "k": [key_value, getattr(last, pk.key)],
+            })
+
+        if total is None:
+            if count_mode == COUNT_CACHED:
+                total = count_cache.count(model, count_query)
+            elif count_mode == COUNT_EXACT:
+                # Trang cursor hoặc trang nằm ngoài phạm vi (không có row nào để mang count)
+                total = count_query.count()
 
         metadata = MetadataResponse(
             page=page,
-            page_size=page_size,
+            page_size=limit if limit is not None else total,
             total=total,
+            next_cursor=next_cursor,
+            has_more=has_more,
+            count_mode=count_mode,
         )
 
-        data = query.all()
-        print("============ PAGINATE ============", data, metadata, flush=True)
+        logger.debug("Paginated %s: %s", model.__tablename__, metadata)
 
     except Exception as e:
         raise CustomException(exception=e)
 
-    return data, metadata
\ No newline at end of file
+    return data, metadata
@@ -0,0 +1,135 @@
+import select
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from sqlalchemy import func
+from sqlalchemy import select as sql_select
+from sqlalchemy.orm import Session
+
+from app.core.database import engine
+from app.utils import metrics
+from app.utils.logging_utils import logger
+
+POLL_TIMEOUT_SECONDS = 1.0
+KEEPALIVE_SECONDS = 30.0  # chạy SELECT 1 khi không có notification để phát hiện connection đã chết
+RECONNECT_DELAY_SECONDS = 1.0
+MAX_IDS_PER_NOTIFY = 500  # payload NOTIFY tối đa 8000 bytes
+
+NotifyHandler = Callable[[str], None]
+ResetHandler = Callable[[], None]
+
+
+def notify(session: Session, channel: str, payload: str) -> None:
+    """
+    Gửi NOTIFY trong transaction hiện tại của session: listeners chỉ nhận được sau commit,
+    rollback thì notification cũng bị bỏ.
+    """
+    session.connection().execute(sql_select(func.pg_notify(channel, payload)))
+
+
+def notify_ids(session: Session, channel: str, ids: Iterable[Any]) -> None:
+    """notify() với payload là danh sách ids cách nhau bởi dấu phẩy (chia nhiều notifications nếu dài)."""
+    ids = sorted({str(value) for value in ids})
+    for start in range(0, len(ids), MAX_IDS_PER_NOTIFY):
+        notify(session, channel, ",".join(ids[start:start + MAX_IDS_PER_NOTIFY]))
+
+
+def parse_ids(payload: str) -> List[int]:
+    return [int(value) for value in payload.split(",") if value]
+
+
+class Listener:
+    """
+    Một connection LISTEN cho mỗi process, nhận notifications từ mọi process (gunicorn workers)
+    và gọi handlers của channel tương ứng trong thread nền.
+
+    Notifications gửi trong lúc mất kết nối bị mất: sau mỗi lần (re)connect và LISTEN xong,
+    các reset handlers được gọi (vd: xoá toàn bộ cache) trước khi listener được coi là healthy.
+    Cache trong process chỉ nên dùng khi healthy (listener đang chạy và đang nghe).
+    """
+
+    def __init__(self, poll_timeout: float = POLL_TIMEOUT_SECONDS, reconnect_delay: float = RECONNECT_DELAY_SECONDS):
+        self.poll_timeout = poll_timeout
+        self.reconnect_delay = reconnect_delay
+        self._handlers: Dict[str, List[NotifyHandler]] = defaultdict(list)
+        self._reset_handlers: List[ResetHandler] = []
+        self._healthy = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def healthy(self) -> bool:
+        return self._healthy.is_set()
+
+    def subscribe(self, channel: str, on_notify: NotifyHandler, on_reset: Optional[ResetHandler] = None) -> None:
+        """Đăng ký handler (trước khi start, thường lúc import module)."""
+        self._handlers[channel].append(on_notify)
+        if on_reset is not None and on_reset not in self._reset_handlers:
+            self._reset_handlers.append(on_reset)
+
+    def wait_healthy(self, timeout: float) -> bool:
+        return self._healthy.wait(timeout)
+
+    def _dispatch(self, channel: str, payload: str) -> None:
+        metrics.increment(f"pg_notify.{channel}.received")
+        for handler in self._handlers.get(channel, ()):
+            try:
+                handler(payload)
+            except Exception:
+                logger.exception("Notification handler for %s failed", channel)
+
+    def _listen(self) -> None:
+        connection = engine.raw_connection()
+        driver_connection = connection.driver_connection
+        connection.detach()  # connection riêng của listener, không trả về pool
+        try:
+            driver_connection.autocommit = True
+            with driver_connection.cursor() as cursor:
+                for channel in self._handlers:
+                    cursor.execute(f'LISTEN "{channel}"')
+            for on_reset in self._reset_handlers:
+                on_reset()
+            self._healthy.set()
+
+            last_activity = time.monotonic()
+            while not self._stopped.is_set():
+                readable, _, _ = select.select([driver_connection], [], [], self.poll_timeout)
+                if readable:
+                    driver_connection.poll()
+                    last_activity = time.monotonic()
+                elif time.monotonic() - last_activity >= KEEPALIVE_SECONDS:
+                    with driver_connection.cursor() as cursor:
+                        cursor.execute("SELECT 1")
+                    last_activity = time.monotonic()
+                while driver_connection.notifies:
+                    notification = driver_connection.notifies.pop(0)
+                    self._dispatch(notification.channel, notification.payload)
+        finally:
+            self._healthy.clear()
+            driver_connection.close()
+
+    def run(self) -> None:
+        while not self._stopped.is_set():
+            try:
+                self._listen()
+            except Exception:
+                metrics.increment("pg_notify.reconnects")
+                logger.exception("Notification listener connection failed, reconnecting")
+                self._stopped.wait(self.reconnect_delay)
+
+    def start(self) -> None:
+        if not self._handlers or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self.run, name="pg-notify-listener", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+
+listener = Listener()
@@ -1,4 +1,15 @@
-from datetime import datetime, timedelta, timezone
+import calendar
+from datetime import date, datetime, timedelta, timezone
+from functools import lru_cache
+from typing import Optional, Union
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+SECONDS_PER_DAY = 24 * 60 * 60
+MILLISECONDS_PER_SECOND = 1000
+MILLISECONDS_PER_DAY = SECONDS_PER_DAY * MILLISECONDS_PER_SECOND
+EPOCH_DATE = date(1970, 1, 1)
+EPOCH_DATETIME = datetime(1970, 1, 1, tzinfo=timezone.utc)
+DEFAULT_TIMEZONE = "UTC"
 
 
 def timestamp_now() -> float:
@@ -71,3 +82,125 @@ def timestamp_before_now(
     )
     new_datetime = datetime_now_tmp - delta
     return datetime_to_timestamp(new_datetime)
+
+
+def timestamp_now_ms() -> int:
+    return int(datetime.now(timezone.utc).timestamp() * MILLISECONDS_PER_SECOND)
+
+
+def timestamp_to_seconds(timestamp: float) -> float:
+    # Timestamp từ client có thể là seconds hoặc milliseconds; chỉ dùng ở biên API
+    if timestamp > 1e10:
+        return timestamp / 1000.0
+    return timestamp
+
+
+def to_epoch_ms(value: Optional[Union[int, float, datetime]]) -> Optional[int]:
+    """
+    Chuẩn hoá timestamp (seconds, milliseconds hoặc datetime) về epoch milliseconds (int),
+    đơn vị chuẩn của các cột thời gian sessions/session_pauses/tasks/goals.
+    """
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return (value - EPOCH_DATETIME) // timedelta(milliseconds=1)
+    return int(round(timestamp_to_seconds(float(value)) * MILLISECONDS_PER_SECOND))
+
+
+def epoch_ms_to_seconds(value: int) -> float:
+    return value / MILLISECONDS_PER_SECOND
+
+
+def epoch_ms_to_day_key(value: int) -> int:
+    """Số ngày (UTC) kể từ 1970-01-01 của giá trị epoch milliseconds."""
+    return int(value // MILLISECONDS_PER_DAY)
+
+
+def day_key_to_epoch_ms(day: int) -> int:
+    """Epoch milliseconds của 00:00:00 UTC ngày day."""
+    return day * MILLISECONDS_PER_DAY
+
+
+def day_key(timestamp: float) -> int:
+    """Số ngày (UTC) kể từ 1970-01-01 của timestamp."""
+    return int(timestamp_to_seconds(timestamp) // SECONDS_PER_DAY)
+
+
+def day_key_to_date(day: int) -> date:
+    return EPOCH_DATE + timedelta(days=day)
+
+
+def date_to_day_key(value: date) -> int:
+    return (value - EPOCH_DATE).days
+
+
+def week_key(day: int) -> int:
+    """ISO week của ngày dạng YYYYWW (tuần bắt đầu từ thứ 2)."""
+    iso_year, iso_week, _ = day_key_to_date(day).isocalendar()
+    return iso_year * 100 + iso_week
+
+
+def month_key(day: int) -> int:
+    """Tháng của ngày dạng YYYYMM."""
+    value = day_key_to_date(day)
+    return value.year * 100 + value.month
+
+
+def month_start_day(day: int) -> int:
+    """day_key của ngày đầu tháng chứa ngày day."""
+    return date_to_day_key(day_key_to_date(day).replace(day=1))
+
+
+def month_end_day(day: int) -> int:
+    """day_key của ngày cuối tháng chứa ngày day."""
+    value = day_key_to_date(day)
+    return date_to_day_key(value.replace(day=calendar.monthrange(value.year, value.month)[1]))
+
+
+@lru_cache(maxsize=512)
+def get_zone(name: Optional[str]) -> ZoneInfo:
+    """ZoneInfo theo tên IANA (vd: Asia/Ho_Chi_Minh); tên rỗng là UTC."""
+    return ZoneInfo(name or DEFAULT_TIMEZONE)
+
+
+def is_valid_timezone(name: str) -> bool:
+    try:
+        get_zone(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        return False
+    return True
+
+
+def local_date(timestamp: float, tz: Optional[str]) -> date:
+    """Ngày lịch theo timezone tz của timestamp (seconds hoặc milliseconds)."""
+    return datetime.fromtimestamp(timestamp_to_seconds(timestamp), tz=get_zone(tz)).date()
+
+
+def local_day_key(timestamp: float, tz: Optional[str]) -> int:
+    """Số ngày kể từ 1970-01-01 của ngày lịch theo timezone tz (seconds hoặc milliseconds)."""
+    return date_to_day_key(local_date(timestamp, tz))
+
+
+def epoch_ms_to_local_day_key(value: int, tz: Optional[str]) -> int:
+    """Như local_day_key nhưng cho giá trị epoch milliseconds (không dùng heuristic seconds/ms)."""
+    return date_to_day_key(
+        datetime.fromtimestamp(value / MILLISECONDS_PER_SECOND, tz=get_zone(tz)).date()
+    )
+
+
+def local_today(tz: Optional[str]) -> int:
+    """day_key của hôm nay theo timezone tz."""
+    return date_to_day_key(datetime.now(get_zone(tz)).date())
+
+
+def local_day_start(day: int, tz: Optional[str]) -> float:
+    """Timestamp (seconds) của 00:00 ngày day theo timezone tz."""
+    value = day_key_to_date(day)
+    return datetime(value.year, value.month, value.day, tzinfo=get_zone(tz)).timestamp()
+
+
+def week_start_day(day: int) -> int:
+    """day_key của thứ 2 đầu ISO week chứa ngày day."""
+    return day - day_key_to_date(day).weekday()
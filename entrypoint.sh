@@ -5,5 +5,7 @@ if [ "$DEBUG" = "true" ]; then
     exec uvicorn app.main:app --host 0.0.0.0 --port 8000 --reload
 else
     pip install -r requirements-local.txt
-    exec gunicorn app.main:app --workers 17 --worker-class uvicorn.workers.UvicornWorker --threads 8 --timeout 120 --keep-alive 5 --bind 0.0.0.0:8000
+    # Số workers cũng dùng để chia CPUs cho process pool bcrypt của từng worker (app/core/config.py)
+    export WEB_CONCURRENCY="${WEB_CONCURRENCY:-17}"
+    exec gunicorn app.main:app --workers "$WEB_CONCURRENCY" --worker-class uvicorn.workers.UvicornWorker --threads 8 --timeout 120 --keep-alive 5 --bind 0.0.0.0:8000
 fi
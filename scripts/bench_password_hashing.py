@@ -0,0 +1,164 @@
+"""
+Benchmark login (bcrypt) throughput và latency của API khác chạy đồng thời.
+
+Chạy app bằng uvicorn trong process con cho từng chế độ:
+    inline: bcrypt chạy trong threadpool của request (PASSWORD_HASH_WORKERS=0, không giới hạn hàng đợi)
+    pool:   bcrypt chạy trong process pool giới hạn (PASSWORD_HASH_WORKERS / PASSWORD_HASH_MAX_QUEUE hiện tại)
+rồi gửi liên tục POST /auth/user-entity/login từ --login-concurrency threads cùng lúc với
+GET /v1/tasks/all từ --api-concurrency threads trong --duration seconds. --api-rate giới hạn số
+API requests mỗi giây của mỗi thread (cùng một tải API ở cả hai chế độ), mặc định gửi liên tục.
+
+Chạy từ thư mục gốc của repo (cần các biến môi trường POSTGRES_* như khi chạy app):
+    python -m scripts.bench_password_hashing [--duration 20] [--login-concurrency 64] [--api-concurrency 4] [--api-rate 0]
+
+Tạo một user tạm để login và xoá user đó khi kết thúc.
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from typing import Any, Dict, List
+
+import requests
+
+MODES = {
+    "inline": {"PASSWORD_HASH_WORKERS": "0", "PASSWORD_HASH_MAX_QUEUE": "100000"},
+    "pool": {},
+}
+PASSWORD = "bench-password"
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def run_load(base_url: str, email: str, args: argparse.Namespace) -> Dict[str, Any]:
+    """Gửi login và API requests đồng thời, trả về số liệu tổng hợp."""
+    login_url = f"{base_url}/auth/user-entity/login"
+    credentials = {"email": email, "password": PASSWORD}
+    access_token = requests.post(login_url, json=credentials).json()["data"]["access_token"]
+    api_url = f"{base_url}/v1/tasks/all"
+    headers = {"Authorization": f"Bearer {access_token}"}
+
+    deadline = time.monotonic() + args.duration
+    lock = threading.Lock()
+    login_statuses: Dict[int, int] = {}
+    api_latencies: List[float] = []
+    api_errors = [0]
+
+    def login_loop() -> None:
+        with requests.Session() as session:
+            while time.monotonic() < deadline:
+                status = session.post(login_url, json=credentials).status_code
+                with lock:
+                    login_statuses[status] = login_statuses.get(status, 0) + 1
+                if status == 503:
+                    time.sleep(args.retry_delay)
+
+    def api_loop() -> None:
+        interval = 1 / args.api_rate if args.api_rate else 0
+        next_request = time.monotonic()
+        with requests.Session() as session:
+            while time.monotonic() < deadline:
+                started = time.perf_counter()
+                ok = session.get(api_url, headers=headers).status_code == 200
+                elapsed = time.perf_counter() - started
+                with lock:
+                    api_latencies.append(elapsed)
+                    api_errors[0] += not ok
+                next_request += interval
+                time.sleep(max(0.0, min(next_request, deadline) - time.monotonic()))
+
+    threads = [threading.Thread(target=login_loop) for _ in range(args.login_concurrency)]
+    threads += [threading.Thread(target=api_loop) for _ in range(args.api_concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return {
+        "login_ok_per_s": login_statuses.get(200, 0) / args.duration,
+        "login_rejected": login_statuses.get(503, 0),
+        "login_other": sum(count for status, count in login_statuses.items() if status not in (200, 503)),
+        "api_per_s": len(api_latencies) / args.duration,
+        "api_errors": api_errors[0],
+        "api_p50_ms": percentile(api_latencies, 0.50) * 1000,
+        "api_p95_ms": percentile(api_latencies, 0.95) * 1000,
+        "api_p99_ms": percentile(api_latencies, 0.99) * 1000,
+    }
+
+
+def run_mode(args: argparse.Namespace) -> None:
+    """Process con: chạy app với cấu hình hashing hiện tại, in kết quả (JSON) ở dòng cuối."""
+    import uvicorn
+    from sqlalchemy import delete
+
+    from app.core.config import settings
+    from app.core.database import engine
+    import app.main
+    from app.models.model_user_entity import UserEntity
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app.main.app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+
+    base_url = f"http://127.0.0.1:{port}{settings.API_PREFIX}"
+    email = f"bench-{time.time_ns()}@example.com"
+    try:
+        requests.post(
+            f"{base_url}/auth/user-entity/register", json={"email": email, "password": PASSWORD}
+        ).raise_for_status()
+        result = run_load(base_url, email, args)
+    finally:
+        with engine.begin() as connection:
+            connection.execute(delete(UserEntity).where(UserEntity.email == email))
+        server.should_exit = True
+        thread.join(10)
+    print(json.dumps(result), flush=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--login-concurrency", type=int, default=64)
+    parser.add_argument("--api-concurrency", type=int, default=4)
+    parser.add_argument("--api-rate", type=float, default=0, help="API requests/s của mỗi thread (0 = gửi liên tục)")
+    parser.add_argument("--retry-delay", type=float, default=0.1, help="login client chờ trước khi thử lại khi bị 503")
+    parser.add_argument("--mode", choices=sorted(MODES), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        run_mode(args)
+        return
+
+    results = {}
+    for mode, env in MODES.items():
+        output = subprocess.run(
+            [sys.executable, "-m", "scripts.bench_password_hashing", "--mode", mode,
+             "--duration", str(args.duration), "--login-concurrency", str(args.login_concurrency),
+             "--api-concurrency", str(args.api_concurrency), "--api-rate", str(args.api_rate),
+             "--retry-delay", str(args.retry_delay)],
+            env={**os.environ, **env}, stdout=subprocess.PIPE, text=True, check=True,
+        ).stdout
+        results[mode] = json.loads(output.strip().splitlines()[-1])
+
+    columns = list(next(iter(results.values())))
+    print(f"{'metric':<18}" + "".join(f"{mode:>12}" for mode in results))
+    for column in columns:
+        print(f"{column:<18}" + "".join(f"{results[mode][column]:>12.1f}" for mode in results))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Benchmark số round trips tới database cho mỗi lần ghi một row của BaseService.
+
+So sánh cách ghi cũ (load object, set attributes, commit, refresh) với đường ghi mới
+(một câu INSERT/UPDATE/DELETE ... RETURNING rồi commit) trên bảng tasks.
+
+Chạy từ thư mục gốc của repo (cần các biến môi trường POSTGRES_* như khi chạy app):
+    python -m scripts.bench_write_round_trips [--iterations 200]
+
+Tạo một user tạm để ghi và xoá user đó khi kết thúc.
+"""
+import argparse
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+from fastapi import FastAPI
+from fastapi_sqlalchemy import DBSessionMiddleware, db
+from sqlalchemy import event
+
+from app.core.config import settings
+import app.main  # noqa: F401 (đăng ký change handlers như khi chạy app)
+from app.models.model_task import TaskEntity
+from app.models.model_user_entity import UserEntity
+from app.services.srv_task import TaskService
+
+
+class RoundTripCounter:
+    """Đếm statements và COMMIT/ROLLBACK gửi tới database."""
+
+    def __init__(self, engine: Any):
+        self.count = 0
+        event.listen(engine, "before_cursor_execute", self._on_statement)
+        event.listen(engine, "commit", self._on_statement)
+        event.listen(engine, "rollback", self._on_statement)
+
+    def _on_statement(self, *args: Any) -> None:
+        self.count += 1
+
+
+def legacy_create(data: Dict[str, Any]) -> TaskEntity:
+    obj = TaskEntity(**data)
+    db.session.add(obj)
+    db.session.commit()
+    db.session.refresh(obj)
+    return obj
+
+
+def legacy_update(task_id: int, user_id: int, data: Dict[str, Any]) -> TaskEntity:
+    obj = db.session.query(TaskEntity).filter(TaskEntity.task_id == task_id).first()
+    if obj is None or obj.user_id != user_id:
+        raise LookupError(task_id)
+    for field, value in data.items():
+        setattr(obj, field, value)
+    db.session.commit()
+    db.session.refresh(obj)
+    return obj
+
+
+def legacy_delete(task_id: int, user_id: int) -> None:
+    obj = db.session.query(TaskEntity).filter(TaskEntity.task_id == task_id).first()
+    if obj is None or obj.user_id != user_id:
+        raise LookupError(task_id)
+    db.session.delete(obj)
+    db.session.commit()
+
+
+def measure(counter: RoundTripCounter, iterations: int, call: Callable[[int], Any]) -> Tuple[float, float]:
+    """(round trips trung bình, milliseconds trung bình) mỗi lần gọi"""
+    counter.count = 0
+    started = time.perf_counter()
+    for i in range(iterations):
+        call(i)
+    elapsed = time.perf_counter() - started
+    return counter.count / iterations, elapsed * 1000 / iterations
+
+
+def run(iterations: int) -> List[Tuple[str, float, float, float, float]]:
+    service = TaskService()
+    with db():
+        counter = RoundTripCounter(db.session.get_bind())
+        user = UserEntity(email=f"bench-{time.time_ns()}@example.com", timezone="UTC")
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.user_id
+        now_ms = int(time.time() * 1000)
+
+        def task_data(i: int) -> Dict[str, Any]:
+            return {"user_id": user_id, "title": f"bench {i}", "task_date": now_ms}
+
+        try:
+            results = []
+            legacy_ids: List[int] = []
+            new_ids: List[int] = []
+            create_old = measure(counter, iterations, lambda i: legacy_ids.append(legacy_create(task_data(i)).task_id))
+            create_new = measure(counter, iterations, lambda i: new_ids.append(service.create(task_data(i)).task_id))
+            results.append(("create", *create_old, *create_new))
+
+            update_old = measure(
+                counter, iterations, lambda i: legacy_update(legacy_ids[i], user_id, {"title": f"updated {i}"})
+            )
+            update_new = measure(
+                counter, iterations,
+                lambda i: service.partial_update_by_id(new_ids[i], {"title": f"updated {i}"}, owner_id=user_id),
+            )
+            results.append(("update", *update_old, *update_new))
+
+            delete_old = measure(counter, iterations, lambda i: legacy_delete(legacy_ids[i], user_id))
+            delete_new = measure(counter, iterations, lambda i: service.delete_by_id(new_ids[i], owner_id=user_id))
+            results.append(("delete", *delete_old, *delete_new))
+            return results
+        finally:
+            db.session.rollback()
+            db.session.delete(db.session.get(UserEntity, user_id))
+            db.session.commit()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    DBSessionMiddleware(FastAPI(), db_url=settings.DATABASE_URL)
+    results = run(args.iterations)
+
+    print(f"{'operation':<10}{'before trips':>14}{'after trips':>14}{'before ms':>12}{'after ms':>12}")
+    for name, old_trips, old_ms, new_trips, new_ms in results:
+        print(f"{name:<10}{old_trips:>14.2f}{new_trips:>14.2f}{old_ms:>12.2f}{new_ms:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Stub JWKS server cho test/load test verify token Keycloak/Google offline.
+
+Tự sinh RSA keys, phục vụ JWKS và ký tokens bằng key hiện tại:
+    GET  /certs, /realms/<realm>/protocol/openid-connect/certs   JWKS (Cache-Control max-age)
+    GET  /token?sub=...&iss=...&aud=...&ttl=...&<claim>=...       token ký bằng key hiện tại
+    POST /rotate                                                  thêm key mới làm key ký (giữ key cũ)
+    GET  /stats                                                   số lần JWKS bị fetch
+
+Chạy từ thư mục gốc của repo rồi trỏ app vào stub:
+    python -m scripts.stub_jwks_server [--port 8089] [--realm test] [--max-age 300]
+    KEYCLOAK_SERVER_URL=http://127.0.0.1:8089 KEYCLOAK_REALM=test  (iss: http://127.0.0.1:8089/realms/test)
+    GOOGLE_JWKS_URL=http://127.0.0.1:8089/certs                   (iss: https://accounts.google.com)
+
+Dùng trong process: server = StubJwksServer().start(); server.issue({...}); server.rotate(); server.stop()
+"""
+import argparse
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlparse
+
+import jwt
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+
+class StubJwksServer:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, realm: str = "test", max_age: int = 300):
+        self.realm = realm
+        self.max_age = max_age
+        self.jwks_fetches = 0
+        self._keys: List[Tuple[str, Any]] = []  # (kid, private key), key cuối dùng để ký
+        self._lock = threading.Lock()
+        self.rotate()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def keycloak_issuer(self) -> str:
+        return f"{self.url}/realms/{self.realm}"
+
+    def rotate(self) -> str:
+        """Thêm key mới làm key ký, trả về kid."""
+        kid = uuid.uuid4().hex
+        with self._lock:
+            self._keys.append((kid, rsa.generate_private_key(public_exponent=65537, key_size=2048)))
+        return kid
+
+    def jwks(self) -> Dict[str, Any]:
+        with self._lock:
+            keys = list(self._keys)
+        return {
+            "keys": [
+                {**json.loads(jwt.algorithms.RSAAlgorithm.to_jwk(key.public_key())), "kid": kid, "use": "sig", "alg": "RS256"}
+                for kid, key in keys
+            ]
+        }
+
+    def issue(self, claims: Dict[str, Any], ttl: int = 300) -> str:
+        """Token RS256 ký bằng key hiện tại (iat/exp mặc định theo thời điểm hiện tại)."""
+        with self._lock:
+            kid, key = self._keys[-1]
+        now = int(time.time())
+        payload = {"iss": self.keycloak_issuer, "sub": "stub-user", "iat": now, "exp": now + ttl, **claims}
+        return jwt.encode(payload, key, algorithm="RS256", headers={"kid": kid})
+
+    def _handler(self) -> type:
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _send(self, body: Any, headers: Optional[Dict[str, str]] = None) -> None:
+                data = json.dumps(body).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self) -> None:
+                url = urlparse(self.path)
+                if url.path == "/certs" or url.path == f"/realms/{stub.realm}/protocol/openid-connect/certs":
+                    with stub._lock:
+                        stub.jwks_fetches += 1
+                    self._send(stub.jwks(), {"Cache-Control": f"public, max-age={stub.max_age}"})
+                elif url.path == "/token":
+                    claims: Dict[str, Any] = dict(parse_qsl(url.query))
+                    ttl = int(claims.pop("ttl", 300))
+                    self._send({"access_token": stub.issue(claims, ttl)})
+                elif url.path == "/stats":
+                    self._send({"jwks_fetches": stub.jwks_fetches, "keys": len(stub.jwks()["keys"])})
+                else:
+                    self.send_error(404)
+
+            def do_POST(self) -> None:
+                if urlparse(self.path).path == "/rotate":
+                    self._send({"kid": stub.rotate()})
+                else:
+                    self.send_error(404)
+
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+        return Handler
+
+    def serve_forever(self) -> None:
+        self._server.serve_forever()
+
+    def start(self) -> "StubJwksServer":
+        self._thread = threading.Thread(target=self.serve_forever, name="stub-jwks", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--realm", default="test")
+    parser.add_argument("--max-age", type=int, default=300)
+    args = parser.parse_args()
+
+    server = StubJwksServer(args.host, args.port, args.realm, args.max_age)
+    print(f"Stub JWKS server: {server.url} (Keycloak issuer: {server.keycloak_issuer})", flush=True)
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+from sqlalchemy import inspect, select
+
+from app.models import DailyActivityEntity, SessionEntity, UserEntity
+
+SESSION_DATE = 1703123456789
+
+
+def daily_activity(session, user_id: int):
+    return session.execute(
+        select(DailyActivityEntity.focus_minutes, DailyActivityEntity.session_count)
+        .where(DailyActivityEntity.user_id == user_id)
+    ).one()
+
+
+def test_updating_expired_session_replaces_its_contribution(session):
+    user = UserEntity(email="rollup@example.com", timezone="UTC")
+    session.add(user)
+    session.flush()
+    focus_session = SessionEntity(
+        user_id=user.user_id,
+        session_date=SESSION_DATE,
+        start_time=SESSION_DATE,
+        duration_minutes=25,
+        session_type=SessionEntity.TYPE_FOCUS_SESSION,
+        status=SessionEntity.STATUS_COMPLETED,
+    )
+    session.add(focus_session)
+    session.commit()
+    assert daily_activity(session, user.user_id) == (25, 1)
+
+    # Sau commit các attributes đã expire: giá trị cũ chưa được load khi gán
+    session.expire(focus_session)
+    assert "duration_minutes" not in inspect(focus_session).dict
+    focus_session.duration_minutes = 50
+    session.commit()
+    assert daily_activity(session, user.user_id) == (50, 1)
+
+    session.expire(focus_session)
+    focus_session.status = SessionEntity.STATUS_CANCELLED
+    session.commit()
+    assert daily_activity(session, user.user_id) == (0, 0)
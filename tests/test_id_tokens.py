@@ -0,0 +1,31 @@
+import pytest
+
+from app.core.id_tokens import InvalidIdTokenError, KeycloakTokenVerifier
+from scripts.stub_jwks_server import StubJwksServer
+
+PUBLIC_ISSUER = "https://auth.example.com/realms/test"
+
+
+@pytest.fixture
+def stub():
+    server = StubJwksServer().start()
+    yield server
+    server.stop()
+
+
+def test_keycloak_issuer_can_differ_from_internal_server_url(stub):
+    token = stub.issue({"iss": PUBLIC_ISSUER, "sub": "keycloak-user"})
+    verifier = KeycloakTokenVerifier(stub.url, stub.realm, issuer=PUBLIC_ISSUER)
+
+    assert verifier.accepts(PUBLIC_ISSUER)
+    assert verifier.verify(token)["sub"] == "keycloak-user"
+    # JWKS vẫn được tải từ URL nội bộ
+    assert stub.jwks_fetches == 1
+
+
+def test_keycloak_issuer_defaults_to_server_url(stub):
+    verifier = KeycloakTokenVerifier(stub.url, stub.realm)
+
+    assert verifier.verify(stub.issue({"sub": "keycloak-user"}))["sub"] == "keycloak-user"
+    with pytest.raises(InvalidIdTokenError):
+        verifier.verify(stub.issue({"iss": PUBLIC_ISSUER}))
@@ -0,0 +1,65 @@
+import pytest
+
+from app.models import ExternalAccount, FacebookFriend, StreakRecordEntity, UserEntity
+from app.schemas.sche_leaderboard import LeaderboardMetric, LeaderboardPeriod
+from app.services.srv_leaderboard import LeaderboardService
+
+
+def seed_user_with_friends(session, name: str, friend_count: int) -> int:
+    """User (đã link Facebook) có friend_count bạn bè Facebook cũng dùng app, trả về user_id."""
+    owner = UserEntity(email=f"{name}@example.com", display_name=name)
+    session.add(owner)
+    session.flush()
+    session.add(ExternalAccount(user_id=owner.user_id, provider="facebook", provider_user_id=f"fb-{name}"))
+    for i in range(friend_count):
+        friend = UserEntity(email=f"{name}-friend-{i}@example.com", display_name=f"{name} friend {i}")
+        session.add(friend)
+        session.flush()
+        facebook_user_id = f"fb-{name}-friend-{i}"
+        session.add(ExternalAccount(user_id=friend.user_id, provider="facebook", provider_user_id=facebook_user_id))
+        session.add(FacebookFriend(
+            user_id=owner.user_id,
+            facebook_user_id=facebook_user_id,
+            name=friend.display_name,
+            picture_url=f"https://example.com/{facebook_user_id}.png",
+        ))
+    session.commit()
+    return owner.user_id
+
+
+@pytest.mark.parametrize("period", list(LeaderboardPeriod))
+def test_leaderboard_statement_count_does_not_grow_with_friends(session, statements, period):
+    # Hai owners khác nhau để cache timezone đều chưa có (cùng số queries)
+    one_friend_owner = seed_user_with_friends(session, f"one-{period.value}", 1)
+    many_friends_owner = seed_user_with_friends(session, f"many-{period.value}", 25)
+
+    with statements.record():
+        one = LeaderboardService.get_leaderboard_data(one_friend_owner, period, LeaderboardMetric.FOCUS_TIME)
+    one_friend_count = statements.count
+
+    with statements.record():
+        many = LeaderboardService.get_leaderboard_data(many_friends_owner, period, LeaderboardMetric.FOCUS_TIME)
+
+    assert one.total_participants == 2
+    assert many.total_participants == 26
+    assert statements.count == one_friend_count
+
+
+def test_period_best_streak_counts_only_days_in_period(session):
+    user = UserEntity(email="streaks@example.com", display_name="Streaks", timezone="UTC")
+    session.add(user)
+    session.flush()
+    start_day = 20000
+    # 5 ngày liên tiếp trước period, trong period: chuỗi 2 ngày rồi 1 ngày
+    active_days = list(range(start_day - 10, start_day - 5)) + [start_day + 1, start_day + 2, start_day + 4]
+    session.add_all([
+        StreakRecordEntity(user_id=user.user_id, streak_day=day, streak_date=day * 86400.0, has_activity=1)
+        for day in active_days
+    ])
+    session.commit()
+
+    period = LeaderboardService.calculate_users_metrics([user.user_id], start_day, start_day + 6)
+    all_time = LeaderboardService.calculate_users_metrics([user.user_id])
+
+    assert period[user.user_id]["best_streak"] == 2
+    assert all_time[user.user_id]["best_streak"] == 5
@@ -0,0 +1,38 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+
+
+@pytest.fixture
+def client(database, monkeypatch):
+    import app.main
+
+    monkeypatch.setattr(settings, "METRICS_TOKEN", "metrics-secret")
+    return TestClient(app.main.app)
+
+
+def metrics_url(path: str) -> str:
+    return f"{settings.API_PREFIX}/metrics/{path}"
+
+
+@pytest.mark.parametrize("path", ["statistics-cache", "events"])
+def test_metrics_require_metrics_token(client, path):
+    assert client.get(metrics_url(path)).status_code == 403
+    assert client.get(metrics_url(path), headers={"X-Metrics-Token": "wrong"}).status_code == 403
+    assert client.get(metrics_url(path), headers={"Authorization": "Bearer user-token"}).status_code == 403
+    assert client.get(metrics_url(path), headers={"X-Metrics-Token": "metrics-secret"}).status_code == 200
+
+
+@pytest.mark.parametrize("path", ["statistics-cache", "events"])
+def test_metrics_disabled_without_metrics_token(client, monkeypatch, path):
+    monkeypatch.setattr(settings, "METRICS_TOKEN", None)
+    assert client.get(metrics_url(path), headers={"X-Metrics-Token": "metrics-secret"}).status_code == 404
+
+
+@pytest.mark.parametrize("path", ["cache/metrics", "events/metrics"])
+def test_metrics_not_on_user_api(client, path):
+    response = client.get(
+        f"{settings.API_PREFIX}/v1/statistics/{path}", headers={"X-Metrics-Token": "metrics-secret"}
+    )
+    assert response.status_code != 200
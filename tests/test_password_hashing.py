@@ -0,0 +1,79 @@
+import runpy
+import threading
+from pathlib import Path
+
+import anyio
+import anyio.to_thread
+import pytest
+import uvicorn
+
+from app.core.password_hashing import PasswordHasher
+from app.utils.exception_handler import CustomException, ExceptionType
+
+ROOT = Path(__file__).resolve().parent.parent
+# Các module chạy được như __main__ (uvicorn/gunicorn CLI import app.main theo tên)
+ENTRY_POINTS = ["app/main.py", "app/outbox_consumer.py"] + sorted(
+    str(path.relative_to(ROOT)) for path in (ROOT / "scripts").glob("*.py")
+)
+
+
+def test_pool_hashes_and_verifies_in_spawned_worker():
+    hasher = PasswordHasher(workers=1, max_queue=1)
+    try:
+        hashed_password = hasher.hash("secret")
+        assert hasher.verify("secret", hashed_password)
+        assert not hasher.verify("wrong", hashed_password)
+        assert hasher.verify_and_update("secret", hashed_password) == (True, None)
+    finally:
+        hasher.shutdown()
+
+
+def test_rejects_with_503_when_all_slots_are_busy():
+    hasher = PasswordHasher(workers=0, max_queue=1)
+    started, release = threading.Barrier(hasher.slots + 1), threading.Event()
+
+    def busy() -> None:
+        started.wait()
+        release.wait(5)
+
+    threads = [threading.Thread(target=hasher.run, args=(busy,)) for _ in range(hasher.slots)]
+    for thread in threads:
+        thread.start()
+    started.wait()
+    try:
+        with pytest.raises(CustomException) as error:
+            hasher.hash("secret")
+        assert error.value.http_code == ExceptionType.SERVICE_UNAVAILABLE.http_code
+    finally:
+        release.set()
+        for thread in threads:
+            thread.join()
+    assert hasher.verify("secret", hasher.hash("secret"))
+
+
+def test_start_reserves_threadpool_for_waiting_calls():
+    hasher = PasswordHasher(workers=1, max_queue=3)
+
+    async def start_twice() -> float:
+        limiter = anyio.to_thread.current_default_thread_limiter()
+        before = limiter.total_tokens
+        hasher.start()
+        hasher.start()
+        return limiter.total_tokens - before
+
+    try:
+        assert anyio.run(start_twice) == hasher.slots == 4
+    finally:
+        hasher.shutdown()
+
+
+@pytest.mark.parametrize("path", ENTRY_POINTS)
+def test_entry_point_is_safe_to_import_in_spawned_worker(database, monkeypatch, path):
+    # Worker process (spawn) chạy lại module __main__ của parent với tên __mp_main__:
+    # không được khởi động server/consumer/benchmark
+    def fail(*args, **kwargs):
+        raise AssertionError(f"{path} starts work when imported by a spawned worker")
+
+    monkeypatch.setattr(uvicorn, "run", fail)
+    monkeypatch.setattr("sys.argv", [path])
+    runpy.run_path(str(ROOT / path), run_name="__mp_main__")
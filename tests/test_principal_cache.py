@@ -0,0 +1,92 @@
+import select
+
+import pytest
+from sqlalchemy import text
+
+from app.models import UserEntity
+from app.services.srv_user_entity import PRINCIPAL_CHANNEL, UserEntityService
+from app.utils import pg_notify
+
+from tests.conftest import wait_until
+
+
+@pytest.fixture
+def other_process_listener(database):
+    """Connection LISTEN riêng, đóng vai một process khác."""
+    connection = database.raw_connection()
+    driver_connection = connection.driver_connection
+    driver_connection.autocommit = True
+    with driver_connection.cursor() as cursor:
+        cursor.execute(f'LISTEN "{PRINCIPAL_CHANNEL}"')
+    yield driver_connection
+    connection.close()
+
+
+def received_payloads(driver_connection, timeout: float = 0.5):
+    select.select([driver_connection], [], [], timeout)
+    driver_connection.poll()
+    payloads = [notification.payload for notification in driver_connection.notifies]
+    driver_connection.notifies.clear()
+    return payloads
+
+
+def create_user(session, email: str) -> int:
+    user = UserEntity(email=email, display_name="Before")
+    session.add(user)
+    session.commit()
+    return user.user_id
+
+
+def test_principal_evicted_by_notification_from_other_process(session, database, notify_listener):
+    user_id = create_user(session, "cached@example.com")
+    assert UserEntityService.get_principal(user_id).display_name == "Before"
+    assert user_id in UserEntityService._principals
+
+    # Process khác ghi users và NOTIFY trong cùng transaction
+    with database.begin() as conn:
+        conn.execute(text("UPDATE users SET display_name = 'After' WHERE user_id = :user_id"), {"user_id": user_id})
+        conn.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": PRINCIPAL_CHANNEL, "payload": str(user_id)})
+
+    assert wait_until(lambda: user_id not in UserEntityService._principals)
+    session.expire_all()
+    assert UserEntityService.get_principal(user_id).display_name == "After"
+
+
+def test_user_write_notifies_other_processes_on_commit_only(session, other_process_listener):
+    user_id = create_user(session, "notify@example.com")
+    assert received_payloads(other_process_listener) == [str(user_id)]
+
+    user = session.get(UserEntity, user_id)
+    user.display_name = "Rolled back"
+    session.flush()
+    session.rollback()
+    assert received_payloads(other_process_listener) == []
+
+    user = session.get(UserEntity, user_id)
+    user.display_name = "Committed"
+    session.commit()
+    assert received_payloads(other_process_listener) == [str(user_id)]
+
+
+def test_principal_not_cached_without_listener(session):
+    assert not pg_notify.listener.healthy
+    user_id = create_user(session, "uncached@example.com")
+    UserEntityService.get_principal(user_id)
+    assert user_id not in UserEntityService._principals
+
+
+def test_lost_listener_connection_clears_principal_cache(session, database, notify_listener):
+    user_id = create_user(session, "reconnect@example.com")
+    UserEntityService.get_principal(user_id)
+    assert user_id in UserEntityService._principals
+
+    # Notifications trong lúc mất kết nối bị mất => cache bị xoá khi listener kết nối lại
+    with database.begin() as conn:
+        terminated = conn.execute(text(
+            "SELECT pg_terminate_backend(pid) FROM pg_stat_activity "
+            "WHERE query LIKE 'LISTEN %' AND pid <> pg_backend_pid()"
+        )).scalars().all()
+    assert terminated == [True]
+    assert wait_until(lambda: not notify_listener.healthy)
+    assert notify_listener.wait_healthy(5)
+    assert user_id not in UserEntityService._principals
@@ -0,0 +1,202 @@
+"""
+Các query nóng phải dùng index (không có node Seq Scan trong EXPLAIN) trên dữ liệu nhiều users.
+
+Mỗi test chạy code path thật, ghi lại các câu SQL được gửi đi rồi EXPLAIN từng câu
+với đúng parameters đã dùng. Với bảng nhỏ như dữ liệu test, Postgres có thể chọn Seq Scan
+dù có index phù hợp, nên EXPLAIN chạy với enable_seqscan = off: plan vẫn còn Seq Scan
+nghĩa là không có index nào dùng được cho query.
+"""
+from typing import Any, Dict, Iterator, List
+
+import pytest
+from sqlalchemy import text
+
+from app.api.v1.api_statistics import get_streak_record_by_date
+from app.models import SessionEntity, UserEntity
+from app.schemas.sche_base import PaginationParams, SortParams
+from app.services.srv_rollup import ActivityRollupService
+from app.services.srv_session import SessionService
+from app.services.srv_statistics import StatisticsCacheService, UserStreakService
+from app.services.srv_sync import SyncService
+from app.utils import time_utils
+from app.utils.paging import paginate
+
+from tests.conftest import StatementRecorder, truncate_all
+
+USERS = 2000
+ACTIVE_USERS = 200
+DAYS = 120
+FIRST_DAY = 20000  # 2024-10-04
+USER_ID = 42
+
+SEED_STATEMENTS = [
+    """
+    INSERT INTO users (email, display_name, timezone, created_at, updated_at)
+    SELECT 'user' || u || '@example.com', 'User ' || u, 'UTC', 0, 0
+    FROM generate_series(1, :users) AS u
+    """,
+    """
+    INSERT INTO sessions (user_id, session_date, start_time, end_time, duration_minutes, session_type, status,
+                          local_day, local_week, local_month, created_at, updated_at)
+    SELECT u, d::bigint * 86400000, d::bigint * 86400000, d::bigint * 86400000 + 1500000, 25,
+           CASE WHEN s = 1 THEN 'FOCUS_SESSION' ELSE 'SHORT_BREAK' END,
+           CASE WHEN d % 10 = 0 THEN 'CANCELLED' ELSE 'COMPLETED' END,
+           d, 0, 0, d * 86400.0 + s, d * 86400.0 + s
+    FROM generate_series(1, :active_users) AS u, generate_series(:first_day, :last_day) AS d,
+         generate_series(1, 2) AS s
+    """,
+    """
+    INSERT INTO session_pauses (session_id, pause_start, pause_end, pause_duration, created_at, updated_at)
+    SELECT session_id, start_time, start_time + 60000, 1, updated_at, updated_at
+    FROM sessions WHERE session_id % 4 = 0
+    """,
+    """
+    INSERT INTO tasks (user_id, title, task_date, is_completed, completed_at, order_index,
+                       local_day, created_at, updated_at)
+    SELECT u, 'Task ' || d, d::bigint * 86400000, (d % 2), CASE WHEN d % 2 = 1 THEN d::bigint * 86400000 END,
+           d, d, d * 86400.0, d * 86400.0
+    FROM generate_series(1, :active_users) AS u, generate_series(:first_day, :last_day) AS d
+    """,
+    """
+    INSERT INTO task_sessions (task_id, session_id, time_spent, created_at, updated_at)
+    SELECT t.task_id, s.session_id, 25, s.updated_at, s.updated_at
+    FROM tasks t JOIN sessions s ON s.user_id = t.user_id AND s.local_day = t.local_day
+    WHERE s.session_type = 'FOCUS_SESSION'
+    """,
+    """
+    INSERT INTO goals (user_id, goal_date, target_sessions, completed_sessions, is_achieved, achieved_at,
+                       local_day, created_at, updated_at)
+    SELECT u, d::bigint * 86400000, 4, 4, (d % 3 = 0)::int, CASE WHEN d % 3 = 0 THEN d::bigint * 86400000 END,
+           d, d * 86400.0, d * 86400.0
+    FROM generate_series(1, :active_users) AS u, generate_series(:first_day, :last_day) AS d
+    """,
+    """
+    INSERT INTO user_daily_activity (user_id, day_key, week_key, month_key, focus_minutes, break_minutes,
+                                     session_count, completed_tasks, achieved_goals, created_at, updated_at)
+    SELECT u, d, 202401 + d % 52, 202401 + d % 12, 25, 5, 1, 1, 0, 0, 0
+    FROM generate_series(1, :active_users) AS u, generate_series(:first_day, :last_day) AS d
+    """,
+    """
+    INSERT INTO streak_records (user_id, streak_date, streak_day, has_activity, session_count, focus_time,
+                                created_at, updated_at)
+    SELECT u, d * 86400.0, d, 1, 1, 25, 0, 0
+    FROM generate_series(1, :active_users) AS u, generate_series(:first_day, :last_day) AS d
+    """,
+    """
+    INSERT INTO user_streaks (user_id, current_streak, best_streak, last_active_day, total_active_days,
+                              created_at, updated_at)
+    SELECT u, 1, 1, :last_day, 1, 0, 0 FROM generate_series(1, :users) AS u
+    """,
+    """
+    INSERT INTO user_settings (user_id, setting_key, setting_value, data_type, created_at, updated_at)
+    SELECT u, 'key_' || k, 'value', 'string', k, k
+    FROM generate_series(1, :users) AS u, generate_series(1, 5) AS k
+    """,
+    """
+    INSERT INTO sync_tombstones (user_id, entity_type, entity_id, deleted_at, created_at, updated_at)
+    SELECT u, 'tasks', d, d * 86400.0, d * 86400.0, d * 86400.0
+    FROM generate_series(1, :active_users) AS u, generate_series(:first_day, :last_day) AS d
+    """,
+]
+
+
+def plan_node_types(plan: Dict[str, Any]) -> Iterator[str]:
+    yield plan["Node Type"]
+    for child in plan.get("Plans", []):
+        yield from plan_node_types(child)
+
+
+def seq_scans(session, recorder: StatementRecorder) -> List[str]:
+    """Các câu SQL đã ghi lại có node Seq Scan trong plan."""
+    found = []
+    connection = session.connection()
+    connection.exec_driver_sql("SET LOCAL enable_seqscan = off")
+    for statement, parameters in recorder.statements:
+        if statement.lstrip().split(None, 1)[0].upper() not in ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE"):
+            continue
+        plan = connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters).scalar()[0]["Plan"]
+        if "Seq Scan" in plan_node_types(plan):
+            found.append(statement)
+    return found
+
+
+@pytest.fixture(scope="module")
+def activity_data(database):
+    params = {
+        "users": USERS,
+        "active_users": ACTIVE_USERS,
+        "first_day": FIRST_DAY,
+        "last_day": FIRST_DAY + DAYS - 1,
+    }
+    with database.begin() as conn:
+        for statement in SEED_STATEMENTS:
+            conn.execute(text(statement), params)
+    with database.connect() as conn:
+        conn.execution_options(isolation_level="AUTOCOMMIT").execute(text("ANALYZE"))
+    yield
+    truncate_all(database)
+
+
+@pytest.fixture
+def plan_session(activity_data):
+    from fastapi_sqlalchemy import db
+
+    with db():
+        yield db.session
+        db.session.rollback()
+
+
+def test_streak_by_date_uses_index(plan_session, statements):
+    user = plan_session.get(UserEntity, USER_ID)
+    with statements.record():
+        get_streak_record_by_date(date=(FIRST_DAY + 10) * time_utils.SECONDS_PER_DAY, current_user=user)
+    assert statements.count
+    assert seq_scans(plan_session, statements) == []
+
+
+@pytest.mark.parametrize("bucket", ["day", "week", "month"])
+def test_rollup_range_uses_index(plan_session, statements, bucket):
+    start = FIRST_DAY * time_utils.SECONDS_PER_DAY
+    end = (FIRST_DAY + DAYS - 1) * time_utils.SECONDS_PER_DAY
+    with statements.record():
+        StatisticsCacheService.get_range_statistics(USER_ID, start, end, bucket)
+        ActivityRollupService.get_totals(list(range(1, 51)), FIRST_DAY + 30, FIRST_DAY + 60)
+        UserStreakService.get_states(list(range(1, 51)))
+        UserStreakService.get_best_streaks(list(range(1, 51)), FIRST_DAY + 30, FIRST_DAY + 60)
+    assert seq_scans(plan_session, statements) == []
+
+
+def test_rollup_rebuild_for_user_uses_index(plan_session, statements):
+    with statements.record():
+        ActivityRollupService._rebuild(plan_session, USER_ID)
+    assert seq_scans(plan_session, statements) == []
+
+
+@pytest.mark.parametrize("sort_by", [None, "session_date", "updated_at"])
+def test_sessions_list_uses_index(plan_session, statements, sort_by):
+    service = SessionService()
+    sort_params = SortParams(sort_by=sort_by)
+    with statements.record():
+        _, metadata = paginate(
+            model=SessionEntity,
+            query=service.owned_query(USER_ID),
+            pagination_params=PaginationParams(page_size=20),
+            sort_params=sort_params,
+        )
+        paginate(
+            model=SessionEntity,
+            query=service.owned_query(USER_ID),
+            pagination_params=PaginationParams(page_size=20, cursor=metadata.next_cursor),
+            sort_params=sort_params,
+        )
+    assert seq_scans(plan_session, statements) == []
+
+
+def test_sync_changes_uses_index(plan_session, statements):
+    with statements.record():
+        first = SyncService.get_changes(USER_ID, limit=50)
+        SyncService.get_changes(USER_ID, first["cursor"], limit=50)
+        SyncService.get_changes(USER_ID, SyncService.encode_cursor({
+            name: (FIRST_DAY * 86400.0, None) for name in ("sessions", "tasks", "deleted")
+        }), limit=50)
+    assert seq_scans(plan_session, statements) == []
@@ -0,0 +1,59 @@
+from datetime import date
+
+import pytest
+
+from app.models import SessionEntity, UserEntity
+from app.services.srv_statistics import StatisticsCacheService
+from app.utils import time_utils
+
+TIMEZONE = "Asia/Ho_Chi_Minh"
+
+
+def day_start(value: date) -> float:
+    return time_utils.local_day_start(time_utils.date_to_day_key(value), TIMEZONE)
+
+
+def add_focus_session(session, user_id: int, value: date) -> None:
+    session_date = int(day_start(value) * 1000) + 3600 * 1000
+    session.add(SessionEntity(
+        user_id=user_id,
+        session_date=session_date,
+        start_time=session_date,
+        duration_minutes=25,
+        session_type=SessionEntity.TYPE_FOCUS_SESSION,
+        status=SessionEntity.STATUS_COMPLETED,
+    ))
+
+
+@pytest.mark.parametrize("bucket, expected", [
+    ("week", [
+        (date(2026, 10, 7), date(2026, 10, 11), 1),  # thứ 4 -> chủ nhật
+        (date(2026, 10, 12), date(2026, 10, 18), 0),
+        (date(2026, 10, 19), date(2026, 10, 25), 0),
+        (date(2026, 10, 26), date(2026, 11, 1), 0),
+        (date(2026, 11, 2), date(2026, 11, 8), 0),
+        (date(2026, 11, 9), date(2026, 11, 10), 1),  # thứ 2 -> thứ 3
+    ]),
+    ("month", [
+        (date(2026, 10, 7), date(2026, 10, 31), 1),
+        (date(2026, 11, 1), date(2026, 11, 10), 1),
+    ]),
+])
+def test_partial_buckets_are_clamped_to_range(session, bucket, expected):
+    user = UserEntity(email=f"range-{bucket}@example.com", timezone=TIMEZONE)
+    session.add(user)
+    session.flush()
+    # Cùng tuần/tháng với hai đầu khoảng nhưng nằm ngoài khoảng: không được tính
+    for value in (date(2026, 10, 5), date(2026, 10, 8), date(2026, 11, 10), date(2026, 11, 12)):
+        add_focus_session(session, user.user_id, value)
+    session.commit()
+
+    result = StatisticsCacheService.get_range_statistics(
+        user.user_id, day_start(date(2026, 10, 7)), day_start(date(2026, 11, 10)), bucket
+    )
+
+    assert result["start_date"] == result["items"][0]["bucket_start"]
+    assert result["end_date"] == result["items"][-1]["bucket_end"]
+    assert [
+        (item["bucket_start"], item["bucket_end"], item["total_sessions"]) for item in result["items"]
+    ] == [(day_start(first), day_start(last), sessions) for first, last, sessions in expected]
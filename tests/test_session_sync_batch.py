@@ -0,0 +1,56 @@
+from collections import defaultdict
+
+import pytest
+
+from app.models import SessionPauseEntity, TaskEntity, TaskSessionEntity, UserEntity
+from app.schemas.sche_session import SessionSyncItem
+from app.services.srv_session import SessionService
+from app.utils import change_capture
+
+
+@pytest.fixture
+def captured(monkeypatch):
+    """Ghi lại các Change mà handlers của pauses/task links nhận được."""
+    received = defaultdict(list)
+    handlers = defaultdict(list, {model: list(model_handlers) for model, model_handlers in change_capture._handlers.items()})
+    monkeypatch.setattr(change_capture, "_handlers", handlers)
+    for model in (SessionPauseEntity, TaskSessionEntity):
+        change_capture.register(model, lambda session, changes: received[changes[0].model].extend(changes))
+    return received
+
+
+def test_sync_batch_captures_inserted_pauses_and_task_links(session, captured):
+    user = UserEntity(email="sync@example.com", timezone="UTC")
+    session.add(user)
+    session.flush()
+    task = TaskEntity(user_id=user.user_id, title="Task")
+    session.add(task)
+    session.commit()
+    item = SessionSyncItem(
+        client_uuid="client-1",
+        session_date=1703123456789,
+        start_time=1703123456789,
+        end_time=1703124956789,
+        duration_minutes=25,
+        session_type="FOCUS_SESSION",
+        status="COMPLETED",
+        pauses=[{"pause_start": 1703123556789, "pause_end": 1703123656789, "pause_duration": 2}],
+        task_links=[{"task_id": task.task_id, "time_spent": 25}],
+    ).model_dump()
+
+    [result] = SessionService().sync_batch(user.user_id, [item])
+
+    [pause] = captured[SessionPauseEntity]
+    assert pause.old is None
+    assert pause.new["pause_id"] == result["pause_ids"][0]
+    assert pause.new["session_id"] == result["session_id"]
+    assert pause.new["pause_duration"] == 2
+    [link] = captured[TaskSessionEntity]
+    assert link.old is None
+    assert link.new["task_session_id"] == result["task_session_ids"][0]
+    assert link.new["task_id"] == task.task_id
+
+    # Retry idempotent: không có row mới nên không có thay đổi nào
+    captured.clear()
+    SessionService().sync_batch(user.user_id, [item])
+    assert captured == {}
@@ -0,0 +1,51 @@
+from app.models import UserEntity
+from app.schemas.sche_session import SessionBaseResponse, SessionTransitionResponse
+from app.services.srv_session import SessionService
+
+STARTED_AT = 1703123456789
+
+
+def statement_kinds(statements):
+    return [statement.split(None, 3)[:3] for statement, _ in statements.statements]
+
+
+def selects_after_first_write(statements):
+    kinds = [statement.lstrip().split(None, 1)[0].upper() for statement, _ in statements.statements]
+    first_write = next((index for index, kind in enumerate(kinds) if kind != "SELECT"), len(kinds))
+    return [kind for kind in kinds[first_write:] if kind == "SELECT"]
+
+
+def test_start_and_transitions_do_not_reload_rows(session, statements):
+    user = UserEntity(email="transitions@example.com", timezone="UTC")
+    session.add(user)
+    session.commit()
+    user_id = user.user_id
+    service = SessionService()
+
+    with statements.record():
+        started = service.start(user_id, {
+            "duration_minutes": 25, "session_type": "FOCUS_SESSION", "at": STARTED_AT,
+        })
+        SessionBaseResponse.model_validate(started, from_attributes=True)
+    # SELECT timezone của user (cache chưa có) + INSERT ... RETURNING
+    assert statements.count == 2, statement_kinds(statements)
+    assert selects_after_first_write(statements) == []
+
+    # action -> số câu lệnh: lock session (+ tìm pause đang mở) rồi ghi, không SELECT lại sau commit
+    for action, at, expected_count in (
+        ("pause", STARTED_AT + 60000, 3),
+        ("resume", STARTED_AT + 120000, 4),
+        ("pause", STARTED_AT + 180000, 3),
+        ("cancel", STARTED_AT + 240000, 4),
+    ):
+        with statements.record():
+            result, pause = service.transition(user_id, started.session_id, action, at)
+            response = SessionTransitionResponse.model_validate({"session": result, "pause": pause}, from_attributes=True)
+        assert statements.count == expected_count, (action, statement_kinds(statements))
+        assert selects_after_first_write(statements) == []
+
+    assert response.session.status == "CANCELLED"
+    assert response.session.pause_count == 2
+    assert response.session.total_pause_duration == 2
+    assert response.session.actual_duration_minutes == 2
+    assert response.pause.pause_end == STARTED_AT + 240000
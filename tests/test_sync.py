@@ -0,0 +1,46 @@
+from app.models import SessionEntity, TaskEntity, TaskSessionEntity, UserEntity
+from app.services.srv_session import SessionService
+from app.services.srv_sync import SyncService
+
+SESSION_DATE = 1703123456789
+
+
+def seed_linked_session(session):
+    user = UserEntity(email="sync-delete@example.com", timezone="UTC")
+    session.add(user)
+    session.flush()
+    task = TaskEntity(user_id=user.user_id, title="Task")
+    focus_session = SessionEntity(
+        user_id=user.user_id,
+        session_date=SESSION_DATE,
+        start_time=SESSION_DATE,
+        duration_minutes=25,
+        session_type=SessionEntity.TYPE_FOCUS_SESSION,
+    )
+    session.add_all([task, focus_session])
+    session.flush()
+    link = TaskSessionEntity(task_id=task.task_id, session_id=focus_session.session_id, time_spent=25)
+    session.add(link)
+    session.commit()
+    return user.user_id, task.task_id, focus_session.session_id, link.task_session_id
+
+
+def test_deleting_session_tombstones_its_task_links(session):
+    user_id, task_id, session_id, task_session_id = seed_linked_session(session)
+    cursor = SyncService.get_changes(user_id)["cursor"]
+
+    SessionService().delete_by_id(session_id, owner_id=user_id)
+
+    changes = SyncService.get_changes(user_id, cursor)
+    assert changes["sessions"]["deleted_ids"] == [session_id]
+    assert changes["task_sessions"]["deleted_ids"] == [task_session_id]
+    assert session.get(TaskEntity, task_id) is not None
+
+
+def test_deleting_many_sessions_tombstones_their_task_links(session):
+    user_id, _, session_id, task_session_id = seed_linked_session(session)
+    cursor = SyncService.get_changes(user_id)["cursor"]
+
+    assert SessionService().delete_many([session_id]) == [session_id]
+
+    assert SyncService.get_changes(user_id, cursor)["task_sessions"]["deleted_ids"] == [task_session_id]
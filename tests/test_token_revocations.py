@@ -0,0 +1,86 @@
+import pytest
+from sqlalchemy import text
+
+from app.core.database import SessionLocal
+from app.core.security import TokenRevocations
+from app.models import TokenRevocationEntity, UserEntity
+from app.services.srv_user_entity import UserEntityService
+from app.utils import pg_notify, time_utils
+
+from tests.conftest import truncate_all, wait_until
+
+
+@pytest.fixture(autouse=True)
+def forget_revocations(database):
+    yield
+    TokenRevocations._revoked = {}
+    truncate_all(database)
+
+
+def create_user(session, email: str) -> int:
+    user = UserEntity(email=email)
+    session.add(user)
+    session.commit()
+    return user.user_id
+
+
+def test_deleting_user_records_shared_revocation(session):
+    user_id = create_user(session, "deleted@example.com")
+    issued_at = time_utils.timestamp_now() - 1
+
+    UserEntityService().delete_by_id(user_id)
+
+    row = session.get(TokenRevocationEntity, user_id)
+    assert row is not None and row.revoked_at >= issued_at
+    assert TokenRevocations.is_revoked(user_id, issued_at)
+    assert not TokenRevocations.is_revoked(user_id, row.revoked_at + 1)
+
+
+def test_revocation_from_other_process_arrives_by_notification(notify_listener):
+    issued_at = time_utils.timestamp_now() - 1
+    with SessionLocal() as other_process:
+        TokenRevocations.record(other_process, [1001, 1002])
+        assert not TokenRevocations.is_revoked(1001, issued_at)
+        other_process.commit()
+
+    assert wait_until(lambda: TokenRevocations.is_revoked(1001, issued_at))
+    assert TokenRevocations.is_revoked(1002, issued_at)
+    assert not TokenRevocations.is_revoked(1003, issued_at)
+
+
+def test_rolled_back_revocation_is_not_applied(notify_listener):
+    with SessionLocal() as other_process:
+        TokenRevocations.record(other_process, [1004])
+        other_process.rollback()
+    with SessionLocal() as other_process:
+        TokenRevocations.record(other_process, [1005])
+        other_process.commit()
+
+    assert wait_until(lambda: TokenRevocations.is_revoked(1005, None))
+    assert not TokenRevocations.is_revoked(1004, None)
+
+
+def test_listener_loads_revocations_missed_while_disconnected(database, notify_listener):
+    notify_listener.stop()
+    now = time_utils.timestamp_now()
+    with database.begin() as conn:
+        conn.execute(
+            text("INSERT INTO token_revocations VALUES (1006, :now, :now, :now), (1007, :old, :old, :old)"),
+            {"now": now, "old": now - 2 * time_utils.SECONDS_PER_DAY * 365},
+        )
+
+    notify_listener.start()
+    assert notify_listener.wait_healthy(5)
+    assert TokenRevocations.is_revoked(1006, now - 1)
+    assert 1007 not in TokenRevocations._revoked
+
+
+def test_revocations_read_from_database_without_listener(session, database):
+    assert not pg_notify.listener.healthy
+    now = time_utils.timestamp_now()
+    with database.begin() as conn:
+        conn.execute(text("INSERT INTO token_revocations VALUES (1008, :now, :now, :now)"), {"now": now})
+
+    assert TokenRevocations._revoked == {}
+    assert TokenRevocations.is_revoked(1008, now - 1)
+    assert not TokenRevocations.is_revoked(1009, now - 1)